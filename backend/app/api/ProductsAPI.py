@@ -1,93 +1,129 @@
 from fastapi import APIRouter, HTTPException
 import asyncio
-import httpx
 import logging
-from pinecone import Pinecone, ServerlessSpec
-from openai import AsyncOpenAI
 import re
-import os
+
+from app.lazy import once
+from app import clients
+from app.pipeline import Pipeline, EMBED_WORKERS
+from app.ratelimit import governor, estimate_tokens, INGEST
+from app.embeddings import embedder, index_name_for
+from app.upsert import UpsertWriter, prune_stale
+from app.shopify import fetch_products, product_text, PRODUCT_COLLECTIONS
+from app.checkpoint import Checkpoint
+from app.timing import span
+from app.lexical import LexicalCorpus, LOOKUPS, confident, rrf
+from app.catalog import ProductCatalog, variant_label
 
 router = APIRouter()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("ProductsAPI")
 
-# --- API Keys ---
-OPENAI_KEY = os.getenv("OPENAI_API_KEY")
-PINECONE_KEY = os.getenv("PINECONE_API_KEY")
+# --- Clients (shared pools from app.clients, created on first use) ---
+index_name = index_name_for("zuscoffee-products")
 
-# --- Clients ---
-openai_client = AsyncOpenAI(api_key=OPENAI_KEY)
-pc = Pinecone(api_key=PINECONE_KEY)
 
-index_name = "zuscoffee-products"
-if index_name not in pc.list_indexes().names():
-    pc.create_index(
-        name=index_name,
-        dimension=1536,
-        metric="cosine",
-        spec=ServerlessSpec(cloud="aws", region="us-east-1")
-    )
-index = pc.Index(index_name)
+@once
+def get_index():
+    return clients.pinecone_index(index_name, embedder.dimension)
 
 
-# --- INGEST PRODUCTS ---
-async def ingest_products(
-    product_url: str = "https://shop.zuscoffee.com/collections/drinkware/products.json"
-):
-    try:
-        logger.info("Fetching product JSON...")
+# Attribute store for filter/sort/aggregate questions, rebuilt with the lexical index
+catalog: ProductCatalog | None = None
 
-        async with httpx.AsyncClient(timeout=30) as client:
-            response = await client.get(product_url)
 
-        response.raise_for_status()
-        data = response.json()
-        products = data.get("products", [])
+def _replace_catalog(docs):
+    global catalog
+    catalog = ProductCatalog([metadata for _, _, metadata in docs])
 
-        if not products:
-            logger.warning("No products found in source JSON.")
-            return []
 
-        logger.info(f"Fetched {len(products)} products. Generating embeddings...")
+lexical = LexicalCorpus("products", "product-", on_replace=_replace_catalog)
 
-        semaphore = asyncio.Semaphore(5)
 
-        async def embed_product(prod):
-            async with semaphore:
-                title = prod.get("title", "Unknown")
-                description = prod.get("body_html", "")
-                price = prod.get("variants", [{}])[0].get("price", "N/A")
-                text = f"Product: {title}\nDescription: {description}\nPrice: RM{price}"
+# --- INGEST PRODUCTS ---
+def count_products():
+    """Vectors currently served from the products index."""
+    return get_index().describe_index_stats().get("total_vector_count", 0)
 
-                # Get embedding
-                emb = await openai_client.embeddings.create(
-                    model="text-embedding-3-small",
-                    input=text
-                )
 
-                return {
-                    "id": f"product-{prod['id']}",
-                    "values": emb.data[0].embedding,
-                    "metadata": {
-                        "name": title,
-                        "description": description,
-                        "price": price,
-                        "type": "product"
-                    }
-                }
+async def ingest_products(collections: list[str] | None = None, checkpoint: Checkpoint | None = None):
+    """
+    With a ``checkpoint``, the fetched catalogue and every stored batch are
+    recorded, so an interrupted run resumes without refetching or
+    re-embedding products that are already in the index unchanged.
+    """
+    try:
+        logger.info("Fetching product JSON...")
 
-        # Parallel embeddings
-        vectors = await asyncio.gather(*[embed_product(p) for p in products])
-        vectors = [v for v in vectors if v]
+        page_key = "collections:" + ",".join(collections or PRODUCT_COLLECTIONS)
+        products = checkpoint.page(page_key) if checkpoint else None
+        if products is None:
+            products = await fetch_products(collections)
+            if checkpoint and products:
+                checkpoint.save_page(page_key, products)
 
-        # Upload in batches of 50
-        for i in range(0, len(vectors), 50):
-            batch = vectors[i:i + 50]
-            index.upsert(batch)
-            logger.info(f"Uploaded batch {i//50 + 1}: {len(batch)} vectors")
+        if not products:
+            logger.warning("No products found in source JSON.")
+            return []
 
-        logger.info(f"✅ Successfully ingested {len(vectors)} products.")
-        return vectors
+        logger.info(f"Fetched {len(products)} products. Streaming through embed/upsert...")
+        index = await get_index.aget()
+
+        async def source():
+            for prod in products:
+                yield prod
+
+        skipped = set()
+        docs = []
+
+        def clean(prod):
+            text = product_text(prod)
+            rec = {
+                "id": f"product-{prod['id']}",
+                "text": text,
+                "metadata": {
+                    "name": prod["title"],
+                    "description": prod["body_html"],
+                    "price": prod["price"],
+                    "price_min": prod["price_min"] if prod["price_min"] is not None else 0.0,
+                    "price_max": prod["price_max"] if prod["price_max"] is not None else 0.0,
+                    "collections": prod["collections"],
+                    "product_type": prod["product_type"],
+                    "tags": prod["tags"],
+                    "variants": [variant_label(v) for v in prod["variants"]],
+                    "available": prod["available"],
+                    "text": text,
+                    "type": "product"
+                }
+            }
+            docs.append((rec["id"], text, rec["metadata"]))
+            if checkpoint and checkpoint.is_done(rec["id"], text):
+                skipped.add(rec["id"])
+                return None
+            return rec
+
+        async def embed_product(rec):
+            emb = await embedder.embed_one(rec["text"], priority=INGEST)
+            return {"id": rec["id"], "values": emb.tolist(), "metadata": rec["metadata"]}
+
+        on_batch = checkpoint.mark_done if checkpoint else None
+        async with UpsertWriter(index, name="products", on_batch=on_batch) as writer:
+            stats = await (
+                Pipeline("products")
+                .stage("clean", clean)
+                .stage("embed", embed_product, concurrency=EMBED_WORKERS)
+                .stage("upsert", writer.add)
+                .run(source())
+            )
+        stats["writer"] = writer.stats()
+        stats["skipped"] = len(skipped)
+        stats["pruned"] = await asyncio.to_thread(prune_stale, index, "product-", writer.ids | skipped)
+        await asyncio.to_thread(lexical.replace, docs)
+        if checkpoint:
+            checkpoint.complete()
+
+        logger.info(f"✅ Successfully ingested {writer.vectors} products ({len(skipped)} unchanged, skipped).")
+        return stats
 
     except Exception as e:
         logger.exception("Error during product ingestion:")
@@ -101,12 +137,25 @@ async def ingest_products(
 async def query_products(query: str, top_k: int = 50):
     try:
         q_lower = query.lower()
+        index = await get_index.aget()
+        lex = lexical.current(index)
+
+        # ---------------------------------------------------------
+        # Filter / Sort / Aggregate (answered from the attribute store)
+        # ---------------------------------------------------------
+        if catalog is not None:
+            with span("catalog"):
+                answer = catalog.answer(query)
+            if answer is not None:
+                LOOKUPS.inc("products", "catalog")
+                return answer
 
         # ---------------------------------------------------------
         # Count Query Detection
         # ---------------------------------------------------------
         if re.search(r"\b(how many|count|number of|products)\b", q_lower):
-            stats = index.describe_index_stats()
+            with span("pinecone_stats"):
+                stats = await asyncio.to_thread(index.describe_index_stats)
             total = stats.get("total_vector_count", 0)
 
             return {
@@ -116,23 +165,32 @@ async def query_products(query: str, top_k: int = 50):
             }
 
         # ---------------------------------------------------------
-        # Semantic Search
+        # Lexical + Semantic Search
+        # (an exact name match skips the embedding and vector query)
         # ---------------------------------------------------------
-        emb = await openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=query
-        )
-
-        embedding = emb.data[0].embedding
-
-        search = index.query(
-            vector=embedding,
-            top_k=top_k,
-            include_metadata=True,
-            filter={"type": "product"}  # ensure only product vectors returned
-        )
+        with span("lexical"):
+            hits = lex.search(query, top_k, filter={"type": "product"}) if lex else []
+        matches = confident(hits)
+
+        if matches:
+            LOOKUPS.inc("products", "short_circuit")
+        else:
+            with span("embed"):
+                embedding = (await embedder.embed_one(query)).tolist()
+
+            with span("pinecone_query"):
+                search = await asyncio.to_thread(
+                    index.query,
+                    vector=embedding,
+                    top_k=top_k,
+                    include_metadata=True,
+                    filter={"type": "product"}  # ensure only product vectors returned
+                )
 
-        matches = search.get("matches", [])
+            matches = search.get("matches", [])
+            if hits:
+                matches = rrf(matches, hits, top_k=top_k)
+            LOOKUPS.inc("products", "fused" if hits else "vector")
         if not matches:
             return {
                 "query": query,
@@ -154,14 +212,20 @@ async def query_products(query: str, top_k: int = 50):
         # ---------------------------------------------------------
         user_prompt = f"User question: {query}\n\nProducts:\n{products}"
 
-        completion = await openai_client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful retail assistant."},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0.3
-        )
+        openai_client = await clients.async_openai_client.aget()
+        with span("llm"):
+            completion = await governor.call(
+                lambda: openai_client.chat.completions.create(
+                    model="gpt-4o-mini",
+                    messages=[
+                        {"role": "system", "content": "You are a helpful retail assistant."},
+                        {"role": "user", "content": user_prompt}
+                    ],
+                    temperature=0.3
+                ),
+                tokens=estimate_tokens(user_prompt, completion=500),
+                op="chat",
+            )
 
         answer = completion.choices[0].message.content
 
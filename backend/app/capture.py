@@ -0,0 +1,154 @@
+"""
+Opt-in capture of chat traffic for replay (see benchmarks/replay.py).
+
+With ``CAPTURE_DIR`` set, each ``/api/chat`` turn (session, message,
+detected intent, reply, stage timings, latency) is queued and a background
+thread appends it as one JSON line to a zstd-compressed log. The request
+never waits on disk: when the queue is full the entry is dropped and
+counted. The writer closes a zstd frame every ``CAPTURE_FLUSH_S`` seconds,
+so a crashed process loses at most that much, and every file is a valid
+multi-frame stream. Each process writes its own file, rotated at
+``CAPTURE_ROTATE_MB``.
+
+Captured messages are user data; keep ``CAPTURE_DIR`` on a private volume.
+"""
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from pathlib import Path
+
+from app import metrics
+
+logger = logging.getLogger("Capture")
+
+CAPTURE_DIR = os.getenv("CAPTURE_DIR", "")
+# Fraction of turns captured
+CAPTURE_SAMPLE = float(os.getenv("CAPTURE_SAMPLE", "1.0"))
+CAPTURE_FLUSH_S = float(os.getenv("CAPTURE_FLUSH_S", "2"))
+CAPTURE_ROTATE_MB = float(os.getenv("CAPTURE_ROTATE_MB", "64"))
+CAPTURE_QUEUE = 10_000
+
+CAPTURED = metrics.Counter("capture_entries_total", "Chat turns captured, by outcome (written, dropped).", ("outcome",))
+
+_STOP = object()
+
+
+class TrafficCapture:
+    def __init__(self, directory: str | Path | None, sample: float = CAPTURE_SAMPLE,
+                 flush_s: float = CAPTURE_FLUSH_S, rotate_mb: float = CAPTURE_ROTATE_MB):
+        self.directory = Path(directory) if directory else None
+        self.sample = sample
+        self.flush_s = flush_s
+        self.rotate_bytes = int(rotate_mb * 1024 * 1024)
+        self._queue: queue.Queue = queue.Queue(maxsize=CAPTURE_QUEUE)
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.directory is not None
+
+    def record(self, entry: dict):
+        """Queue one entry; never blocks."""
+        if not self.enabled or (self.sample < 1.0 and random.random() >= self.sample):
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait(entry)
+        except queue.Full:
+            CAPTURED.inc("dropped")
+
+    def close(self, timeout: float = 5.0):
+        """Flush queued entries and stop the writer."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(_STOP)
+            thread.join(timeout)
+
+    def _ensure_writer(self):
+        # Started on first use, so forked workers each get their own thread
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name="traffic-capture", daemon=True)
+                    self._thread.start()
+
+    def _open(self):
+        import zstandard
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f"capture-{time.strftime('%Y%m%dT%H%M%S')}-{os.getpid()}.jsonl.zst"
+        f = open(path, "ab")
+        logger.info(f"📼 Capturing chat traffic to {path}")
+        return f, zstandard.ZstdCompressor(level=3).stream_writer(f, closefd=False)
+
+    def _run(self):
+        import zstandard
+
+        f, writer = self._open()
+        pending = 0
+        next_flush = time.monotonic() + self.flush_s
+        try:
+            while True:
+                try:
+                    entry = self._queue.get(timeout=max(0.0, next_flush - time.monotonic()))
+                except queue.Empty:
+                    entry = None
+                if entry is _STOP:
+                    break
+                if entry is not None:
+                    writer.write(json.dumps(entry, ensure_ascii=False, default=str).encode() + b"\n")
+                    pending += 1
+                if pending and time.monotonic() >= next_flush:
+                    writer.flush(zstandard.FLUSH_FRAME)
+                    CAPTURED.inc("written", amount=pending)
+                    pending = 0
+                    if f.tell() >= self.rotate_bytes:
+                        writer.close()
+                        f.close()
+                        f, writer = self._open()
+                if time.monotonic() >= next_flush:
+                    next_flush = time.monotonic() + self.flush_s
+        except Exception:
+            logger.exception("Traffic capture stopped")
+        finally:
+            writer.flush(zstandard.FLUSH_FRAME)
+            CAPTURED.inc("written", amount=pending)
+            writer.close()
+            f.close()
+
+
+def read(paths):
+    """Entries of the given capture files (or directories), oldest first."""
+    import zstandard
+
+    files = []
+    for p in map(Path, paths):
+        files += sorted(p.glob("*.jsonl.zst")) if p.is_dir() else [p]
+
+    entries = []
+    for path in files:
+        with open(path, "rb") as f:
+            reader = zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+            chunks = []
+            try:
+                while chunk := reader.read(1 << 20):
+                    chunks.append(chunk)
+            except zstandard.ZstdError:
+                # Last frame cut short by a crash; keep what decoded
+                pass
+        for line in b"".join(chunks).splitlines():
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                continue
+    entries.sort(key=lambda e: e.get("ts", 0))
+    return entries
+
+
+capture = TrafficCapture(CAPTURE_DIR or None)
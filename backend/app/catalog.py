@@ -0,0 +1,331 @@
+"""
+Columnar product attributes for filter, sort and aggregate questions
+("cheapest tumbler", "products under RM50", "how many items above RM100")
+answered without an embedding, a vector query or an LLM call.
+
+``ProductCatalog`` holds one NumPy array per attribute: per product the
+lowest price, product type, capacity (ml) and a tag matrix, and per
+variant its price, availability and owning product. It is built from the
+products index metadata (alongside the lexical index, see app.lexical), so
+the process that ingests and the ones that load from the index build the
+same store. ``parse_constraints`` turns
+the numeric, sort and aggregate parts of a question into a ``Constraints``
+the catalog evaluates as vectorized masks.
+"""
+import re
+from dataclasses import dataclass, field
+
+
+# ---------------------------------------------------------
+# Attribute parsing
+# ---------------------------------------------------------
+_VARIANT = re.compile(r"^(?P<title>.*) RM(?P<price>[\d.]+)(?P<sold_out> \(sold out\))?$")
+_CAPACITY = re.compile(r"\b(\d+(?:\.\d+)?)\s*(ml|l|litre|liter)s?\b")
+
+
+def variant_label(variant: dict):
+    """How a variant is stored in index metadata (and shown to the LLM)."""
+    return f"{variant['title']} RM{variant['price']}{'' if variant['available'] else ' (sold out)'}"
+
+
+def capacity_ml(text: str):
+    """First capacity in ``text`` (``500ml``, ``1L``, ``1.2 litres``) in ml, or None."""
+    m = _CAPACITY.search(text.lower())
+    if not m:
+        return None
+    value = float(m.group(1))
+    return value if m.group(2) == "ml" else value * 1000
+
+
+def _price(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def _singular(word: str):
+    word = word.lower().strip()
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    return word[:-1] if word.endswith("s") and not word.endswith("ss") else word
+
+
+# ---------------------------------------------------------
+# Constraints
+# ---------------------------------------------------------
+@dataclass
+class Constraints:
+    price_min: float | None = None
+    price_max: float | None = None
+    capacity_min: float | None = None
+    capacity_max: float | None = None
+    available: bool = False
+    sort: str | None = None  # price | capacity
+    descending: bool = False
+    limit: int | None = None
+    aggregate: str | None = None  # count | mean
+    words: list[str] = field(default_factory=list)  # matched against types and tags
+
+    @property
+    def structured(self):
+        """True when the question has a numeric, sort or aggregate part."""
+        return any(v is not None for v in (
+            self.price_min, self.price_max, self.capacity_min, self.capacity_max, self.sort, self.aggregate,
+        ))
+
+
+_NUMBER = r"(?:rm\s*)?(\d+(?:\.\d+)?)(?!\s*(?:ml|l|litre|liter)s?\b)(?![\d.])"
+_AMOUNT_ML = r"(\d+(?:\.\d+)?\s*(?:ml|l|litre|liter)s?)\b"
+_BELOW = r"\b(?:under|below|less than|cheaper than|lower than|at most|max(?:imum)?|up to|within)"
+_ABOVE = r"\b(?:above|over|more than|greater than|at least|min(?:imum)?|from)"
+
+_SORTS = [
+    (r"\b(cheapest|lowest price[ds]?|least expensive|most affordable)\b", "price", False),
+    (r"\b(most expensive|priciest|highest price[ds]?|premium)\b", "price", True),
+    (r"\b(largest|biggest|highest capacity|most capacity)\b", "capacity", True),
+    (r"\b(smallest|lowest capacity|least capacity)\b", "capacity", False),
+]
+_PLURAL_HINT = re.compile(r"\b(top|all|list|options|ones|items|products|\w+s)\b")
+
+
+def parse_constraints(query: str):
+    """The filter, sort and aggregate intents of a product question."""
+    q = query.lower().replace(",", "")
+    c = Constraints()
+
+    if m := re.search(rf"\bbetween\s+{_NUMBER}\s+(?:and|to|-)\s+{_NUMBER}", q):
+        c.price_min, c.price_max = sorted((float(m.group(1)), float(m.group(2))))
+    elif m := re.search(rf"\brm\s*(\d+(?:\.\d+)?)\s*(?:-|to)\s*(?:rm\s*)?(\d+(?:\.\d+)?)\b", q):
+        c.price_min, c.price_max = sorted((float(m.group(1)), float(m.group(2))))
+    else:
+        if m := re.search(rf"{_BELOW}\s+{_NUMBER}", q):
+            c.price_max = float(m.group(1))
+        if m := re.search(rf"{_ABOVE}\s+{_NUMBER}", q):
+            c.price_min = float(m.group(1))
+
+    if m := re.search(rf"{_BELOW}\s+{_AMOUNT_ML}", q):
+        c.capacity_max = capacity_ml(m.group(1))
+    if m := re.search(rf"{_ABOVE}\s+{_AMOUNT_ML}", q):
+        c.capacity_min = capacity_ml(m.group(1))
+    if c.capacity_min is None and c.capacity_max is None and (ml := capacity_ml(q)) is not None:
+        c.capacity_min = c.capacity_max = ml
+
+    for pattern, key, descending in _SORTS:
+        if m := re.search(pattern, q):
+            c.sort, c.descending = key, descending
+            # "cheapest tumbler" wants one, "cheapest tumblers" a ranking
+            rest = q[m.end():].split()
+            c.limit = 5 if rest and _PLURAL_HINT.fullmatch(rest[0]) else 1
+            if top := re.search(r"\btop\s+(\d+)\b", q):
+                c.limit = int(top.group(1))
+            break
+
+    if re.search(r"\b(how many|count|number of)\b", q):
+        c.aggregate = "count"
+    elif re.search(r"\b(average|mean|avg)\b.*\bprice\b|\bprice\b.*\b(average|mean|avg)\b", q):
+        c.aggregate = "mean"
+
+    c.available = bool(re.search(r"\b(in stock|available now|not sold out)\b", q))
+    c.words = re.findall(r"[a-z]+", q)
+    return c
+
+
+# ---------------------------------------------------------
+# Store
+# ---------------------------------------------------------
+class ProductCatalog:
+    """Columnar attributes of every product in the products index."""
+
+    def __init__(self, metadata: list[dict]):
+        import numpy as np
+
+        n = len(metadata)
+        self.names = [m.get("name", "Unknown") for m in metadata]
+        self.descriptions = [m.get("description", "") for m in metadata]
+        self.prices = [m.get("price") for m in metadata]
+
+        self.types = sorted({m.get("product_type") or "" for m in metadata} - {""})
+        type_code = {t: i for i, t in enumerate(self.types)}
+        self.product_type = np.array([type_code.get(m.get("product_type") or "", -1) for m in metadata], dtype=np.int16)
+
+        self.tags = sorted({t.lower() for m in metadata for t in m.get("tags") or []})
+        # Singular word forms the question is matched against; sizes and tags
+        # naming a type are left to those filters
+        self._type_words = [" ".join(map(_singular, t.split())) for t in self.types]
+        self._tag_words = [
+            (i, " ".join(map(_singular, t.split()))) for i, t in enumerate(self.tags)
+            if not capacity_ml(t) and " ".join(map(_singular, t.split())) not in self._type_words
+        ]
+        tag_code = {t: i for i, t in enumerate(self.tags)}
+        self.tag_matrix = np.zeros((n, len(self.tags)), dtype=bool)
+        for row, m in enumerate(metadata):
+            for t in m.get("tags") or []:
+                self.tag_matrix[row, tag_code[t.lower()]] = True
+
+        capacities = []
+        for m in metadata:
+            ml = capacity_ml(m.get("name", ""))
+            if ml is None:
+                ml = next((v for v in map(capacity_ml, m.get("tags") or []) if v is not None), None)
+            capacities.append(np.nan if ml is None else ml)
+        self.capacity_ml = np.array(capacities, dtype=np.float32)
+
+        variant_product, variant_price, variant_available = [], [], []
+        for row, m in enumerate(metadata):
+            labels = m.get("variants") or []
+            parsed = [_VARIANT.match(label) for label in labels]
+            if not labels or not all(parsed):
+                # No parseable variants: the product-level range stands in
+                parsed = [None]
+            for p in parsed:
+                variant_product.append(row)
+                variant_price.append(_price(p.group("price")) if p else _price(m.get("price_min") or m.get("price")))
+                variant_available.append(not p.group("sold_out") if p else bool(m.get("available", True)))
+        self.variant_product = np.array(variant_product, dtype=np.int32)
+        self.variant_price = np.array(variant_price, dtype=np.float32)
+        self.variant_available = np.array(variant_available, dtype=bool)
+
+        self.price_min = np.full(n, np.inf, dtype=np.float32)
+        np.minimum.at(self.price_min, self.variant_product, np.nan_to_num(self.variant_price, nan=np.inf))
+        self.price_min[np.isinf(self.price_min)] = np.nan
+
+    def __len__(self):
+        return len(self.names)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (
+            self.product_type, self.tag_matrix, self.capacity_ml, self.variant_product,
+            self.variant_price, self.variant_available, self.price_min,
+        ))
+
+    def describe(self, c: Constraints):
+        """Type and tag filters the question's words select, as (types, tags)."""
+        text = " " + " ".join(_singular(w) for w in c.words) + " "
+        types = [i for i, t in enumerate(self._type_words) if f" {t} " in text]
+        tags = [i for i, t in self._tag_words if f" {t} " in text]
+        return types, tags
+
+    def select(self, c: Constraints):
+        """Product rows satisfying ``c``, ordered when it asks for a sort."""
+        import numpy as np
+
+        types, tags = self.describe(c)
+        mask = np.ones(len(self), dtype=bool)
+        if types:
+            mask &= np.isin(self.product_type, types)
+        if tags:
+            mask &= self.tag_matrix[:, tags].all(axis=1)
+        if c.capacity_min is not None:
+            mask &= self.capacity_ml >= c.capacity_min
+        if c.capacity_max is not None:
+            mask &= self.capacity_ml <= c.capacity_max
+
+        # Price and stock apply per variant: a product qualifies through any variant
+        vmask = mask[self.variant_product] & ~np.isnan(self.variant_price)
+        if c.price_min is not None:
+            vmask &= self.variant_price >= c.price_min
+        if c.price_max is not None:
+            vmask &= self.variant_price <= c.price_max
+        if c.available:
+            vmask &= self.variant_available
+        if c.price_min is not None or c.price_max is not None or c.available or c.sort == "price":
+            mask = np.bincount(self.variant_product[vmask], minlength=len(self)) > 0
+            # Lowest qualifying variant price per product, for sorting and display
+            price = np.full(len(self), np.inf, dtype=np.float32)
+            np.minimum.at(price, self.variant_product[vmask], self.variant_price[vmask])
+        else:
+            price = self.price_min
+
+        rows = np.flatnonzero(mask)
+        if c.sort:
+            key = price[rows] if c.sort == "price" else self.capacity_ml[rows]
+            rows = rows[~np.isnan(key)]
+            key = key[~np.isnan(key)]
+            rows = rows[np.argsort(-key if c.descending else key, kind="stable")]
+        return rows, price
+
+    def answer(self, query: str, c: Constraints | None = None):
+        """
+        A ``query_products``-shaped response, or None when the question has
+        no numeric, sort or aggregate part to answer from the catalog.
+        """
+        import numpy as np
+
+        c = c or parse_constraints(query)
+        if not c.structured:
+            return None
+        rows, price = self.select(c)
+        noun = self._noun(c)
+        qualifier = self._qualifier(c)
+
+        if c.aggregate == "count":
+            response = f"There are {len(rows)} {noun}{qualifier}."
+        elif not len(rows):
+            response = f"No {noun}{qualifier} found."
+        elif c.aggregate == "mean":
+            response = f"The average price of {noun}{qualifier} is RM{float(np.nanmean(price[rows])):.2f}."
+        elif c.sort and c.limit == 1:
+            best = rows[0]
+            detail = self._price(best, price) if c.sort == "price" else f"{self.capacity_ml[best]:g}ml"
+            response = f"{self._sort_word(c)} {_singular(noun)}{qualifier} is {self.names[best]} ({detail})."
+        else:
+            heading = f"{self._sort_word(c)} {noun}" if c.sort else noun[:1].upper() + noun[1:]
+            shown = rows[:c.limit] if c.limit else rows
+            response = f"{heading}{qualifier}:\n" + "\n".join(
+                f"- {self.names[r]} ({self._price(r, price)})" for r in shown
+            )
+
+        shown = rows[:c.limit] if c.limit else rows
+        return {
+            "query": query,
+            "response": response,
+            "matches_found": int(len(rows)),
+            "products": [
+                {
+                    "name": self.names[r],
+                    "price": f"{price[r]:.2f}" if np.isfinite(price[r]) else self.prices[r],
+                    "description": self.descriptions[r],
+                }
+                for r in shown
+            ],
+        }
+
+    def _price(self, row: int, price):
+        import numpy as np
+
+        return f"RM{price[row]:.2f}" if np.isfinite(price[row]) else f"RM{self.prices[row]}"
+
+    def _noun(self, c: Constraints):
+        types, tags = self.describe(c)
+        words = [self.tags[t] for t in tags]
+        if len(types) == 1:
+            t = self.types[types[0]].lower()
+            return " ".join(words + [t if t.endswith("s") else t + ("es" if t.endswith("x") else "s")])
+        return " ".join(words + ["products"])
+
+    @staticmethod
+    def _qualifier(c: Constraints):
+        parts = []
+        if c.price_min is not None and c.price_max is not None:
+            parts.append(f" between RM{c.price_min:g} and RM{c.price_max:g}")
+        elif c.price_max is not None:
+            parts.append(f" up to RM{c.price_max:g}")
+        elif c.price_min is not None:
+            parts.append(f" from RM{c.price_min:g}")
+        if c.capacity_min is not None and c.capacity_min == c.capacity_max:
+            parts.append(f" of {c.capacity_min:g}ml")
+        elif c.capacity_min is not None:
+            parts.append(f" of at least {c.capacity_min:g}ml")
+        elif c.capacity_max is not None:
+            parts.append(f" of at most {c.capacity_max:g}ml")
+        if c.available:
+            parts.append(" in stock")
+        return "".join(parts)
+
+    @staticmethod
+    def _sort_word(c: Constraints):
+        if c.sort == "price":
+            return "The most expensive" if c.descending else "The cheapest"
+        return "The largest" if c.descending else "The smallest"
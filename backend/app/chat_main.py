@@ -1,24 +1,28 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 import uuid
+import time
 from pydantic import BaseModel
-from langchain_openai import ChatOpenAI
-from langchain_core.runnables.history import RunnableWithMessageHistory
-from langchain_core.messages import AIMessage, HumanMessage
-import openai
 import logging
-import numpy as np
 import asyncio
-import os
 
 # Local modules
-from app.memory import ConversationMemory
-from app.api.ProductsAPI import router as products_router, ingest_products, query_products
-from app.api.OutletsAPI import router as outlets_router, ingest_outlets, query_outlets
+from app.memory import create_memory
+from app.api.ProductsAPI import router as products_router, ingest_products, query_products, count_products
+from app.api.ProductsAPI import get_index as get_products_index
+from app.api.OutletsAPI import router as outlets_router, ingest_outlets, query_outlets, count_outlets
+from app.api.OutletsAPI import get_index as get_outlets_index
 from app.api.Calculator import safe_eval
-
-# --- OpenAI setup ---
-openai.api_key = os.getenv("OPENAI_API_KEY") # replace with your actual key
+from app.ratelimit import governor, estimate_tokens
+from app.embeddings import intent_embedder
+from app.lazy import once
+from app import clients
+from app.corpus import Corpus, IngestSupervisor
+from app import timing, metrics
+from app.timing import span, ServerTimingMiddleware
+from app.loopmon import monitor as loop_monitor
+from app.capture import capture
 
 # --- FastAPI setup ---
 app = FastAPI(title="ZusCoffee Chatbot Backend")
@@ -34,8 +38,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+# Per-stage timings as a Server-Timing header (see app.timing)
+app.add_middleware(ServerTimingMiddleware)
+
 # --- Logging Configuration ---
 logging.basicConfig(
     level=logging.INFO,
@@ -58,69 +66,154 @@ QUERY_TYPE_EXAMPLES = {
 }
 
 # --- Precompute embeddings ---
-def embed_text(text: str):
-    resp = openai.embeddings.create(model="text-embedding-3-small", input=text)
-    return np.array(resp.data[0].embedding)
-
-INTENT_EXAMPLES_EMBED = {
-    intent: [embed_text(ex) for ex in examples]
-    for intent, examples in INTENT_EXAMPLES.items()
-}
-
-QUERY_TYPE_EXAMPLES_EMBED = {
-    qtype: [embed_text(ex) for ex in examples]
-    for qtype, examples in QUERY_TYPE_EXAMPLES.items()
-}
+def embed_examples(provider, examples: dict):
+    """
+    Embed every example in one batched call into a single (quantized)
+    matrix; rows for each label are contiguous and start at ``offsets``.
+    """
+    import numpy as np
+    from app.quantize import QuantizedMatrix
+
+    flat = [ex for exs in examples.values() for ex in exs]
+    counts = [len(exs) for exs in examples.values()]
+    return {
+        "labels": list(examples),
+        "offsets": np.cumsum([0] + counts[:-1]),
+        "matrix": QuantizedMatrix.from_vectors(provider.embed_sync(flat)),
+    }
+
+def best_label(examples_embed: dict, query_emb):
+    """Label whose closest example is most similar to the query."""
+    import numpy as np
+
+    scores = examples_embed["matrix"].scores(query_emb)
+    per_label = np.maximum.reduceat(scores, examples_embed["offsets"])
+    return examples_embed["labels"][int(np.argmax(per_label))]
+
+def load_or_embed_examples(kind: str, examples: dict):
+    """
+    Embedded examples per provider. Worker processes first attach the
+    shared, memory-mapped copy (see app.shared); otherwise they load a
+    prebuilt snapshot when one matches (see app.snapshot), or embed now and
+    cache in /tmp, then share the result with the other workers.
+    """
+    from app.snapshot import attach_examples, load_examples, save_examples, share_examples
+
+    out = {}
+    for provider in intent_embedder.providers:
+        result = "shared"
+        embedded = attach_examples(kind, provider, examples)
+        if embedded is None:
+            result = "snapshot"
+            embedded = load_examples(kind, provider, examples)
+            if embedded is None:
+                result = "built"
+                embedded = embed_examples(provider, examples)
+                save_examples(kind, provider, examples, embedded)
+            share_examples(kind, provider, examples, embedded)
+        metrics.CACHE_LOOKUPS.inc(f"{kind}_examples", result)
+        out[provider.name] = embedded
+    return out
+
+# Examples are embedded once per provider, so intent detection keeps working
+# when it degrades to the local fallback. Built on first use, not at import.
+@once
+def get_intent_examples_embed():
+    return load_or_embed_examples("intent", INTENT_EXAMPLES)
+
+@once
+def get_query_type_examples_embed():
+    return load_or_embed_examples("query_type", QUERY_TYPE_EXAMPLES)
 
 # --- Memory Setup ---
-memory = ConversationMemory()
-
-# --- LangChain LLM ---
-llm = ChatOpenAI(
-    temperature=0.9,
-    model_name="gpt-3.5-turbo",
-    max_tokens=200,
-    openai_api_key=openai.api_key
-)
+memory = create_memory()
+metrics.Gauge("memory_sessions", "Sessions held in conversation memory.", fn=lambda: memory.stats()["sessions"])
+metrics.Gauge("memory_turns", "Turns held in conversation memory.", fn=lambda: memory.stats()["turns"])
+
+# --- LangChain LLM (imported on first general-chat turn) ---
+@once
+def get_chat_history():
+    from langchain_core.runnables.history import RunnableWithMessageHistory
+
+    llm = clients.chat_model(
+        temperature=0.9,
+        model_name="gpt-3.5-turbo",
+        max_tokens=200,
+    )
+    return RunnableWithMessageHistory(runnable=llm, get_session_history=get_history_for_session)
 
 # RunnableWithMessageHistory
 def get_history_for_session(session_id: str):
+    from langchain_core.chat_history import InMemoryChatMessageHistory
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    turns = memory.get_history(session_id)
+    # The current message is already stored; the runnable appends it as input
+    if turns and turns[-1]["role"] == "user":
+        turns = turns[:-1]
     messages = []
-    for turn in memory.get_history(session_id):
+    for turn in turns:
         if turn["role"] == "user":
-            messages.append(HumanMessage(content=turn["content"]))
+            messages.append(HumanMessage(content=turn["text"]))
         elif turn["role"] == "bot":
-            messages.append(AIMessage(content=turn["content"]))
-    return messages
-
-chat_history = RunnableWithMessageHistory(runnable=llm, get_session_history=get_history_for_session)
+            messages.append(AIMessage(content=turn["text"]))
+    # A throwaway view: turns are recorded in ``memory`` by the chat handler
+    return InMemoryChatMessageHistory(messages=messages)
 
 # --- Models ---
 class ChatRequest(BaseModel):
     message: str
     session_id: str | None = None
+    lat: float | None = None  # the user's location, for "near me" questions
+    lon: float | None = None
+    debug: bool = False  # include per-stage timings in info
 
 class ChatResponse(BaseModel):
     reply: str
     info: dict = {}
 
+# --- Reply Formatting ---
+# Outlets listed under an outlets answer
+REPLY_OUTLETS = 10
+
+def format_products_reply(answer: dict, query_type: str):
+    """Chat reply for a ``query_products`` answer: its response, plus prices it leaves out for attribute questions."""
+    reply = answer.get("response") or "No matching products found."
+    if query_type == "attribute":
+        details = [
+            f"{p.get('name', 'Unknown')} — Price: {p.get('price', 'N/A')}"
+            for p in answer.get("products") or [] if p.get("name") not in reply
+        ]
+        if details:
+            reply += "\n\nHere are the products with details:\n" + "\n".join(details)
+    return reply
+
+def format_outlets_reply(answer: dict, query_type: str):
+    """Chat reply for a ``query_outlets`` answer: its response, then the outlets it found."""
+    reply = answer.get("response") or "No matching outlets found."
+    outlets = answer.get("outlets") or []
+    if query_type == "count" or not outlets:
+        return reply
+    if query_type == "time":
+        lines = [f"{o.get('name', 'Unknown')}: {o.get('hours', 'N/A')}" for o in outlets[:REPLY_OUTLETS]]
+    else:
+        lines = [f"{o.get('name', 'Unknown')} — {o.get('address', '')}"
+                 + (f" ({o['distance_km']} km)" if o.get("distance_km") is not None else "")
+                 for o in outlets[:REPLY_OUTLETS]]
+    if len(outlets) > REPLY_OUTLETS:
+        lines.append(f"...and {len(outlets) - REPLY_OUTLETS} more.")
+    return reply + "\n" + "\n".join(lines)
+
 # --- Intent & Query Detection ---
-def detect_intent_and_type(user_text: str):
-    query_emb = embed_text(user_text)
+async def detect_intent_and_type(user_text: str):
+    query_embs, source = await intent_embedder.embed_with_source([user_text])
+    query_emb = query_embs[0]
 
     # Determine intent
-    intent_scores = {}
-    for intent, embeddings in INTENT_EXAMPLES_EMBED.items():
-        sims = [np.dot(query_emb, ex_emb) / (np.linalg.norm(query_emb) * np.linalg.norm(ex_emb)) for ex_emb in embeddings]
-        intent_scores[intent] = max(sims)
-    best_intent = max(intent_scores, key=intent_scores.get)
+    best_intent = best_label(get_intent_examples_embed()[source], query_emb)
 
     # Determine query type
-    type_scores = {}
-    for qtype, embeddings in QUERY_TYPE_EXAMPLES_EMBED.items():
-        sims = [np.dot(query_emb, ex_emb) / (np.linalg.norm(query_emb) * np.linalg.norm(ex_emb)) for ex_emb in embeddings]
-        type_scores[qtype] = max(sims)
-    best_type = max(type_scores, key=type_scores.get)
+    best_type = best_label(get_query_type_examples_embed()[source], query_emb)
 
     # Handle count queries
     if best_type == "count":
@@ -133,44 +226,114 @@ def detect_intent_and_type(user_text: str):
 
     return {"intent": best_intent, "query_type": best_type}
 
-# --- Startup Event ---
+# --- Background Ingestion ---
+supervisor = IngestSupervisor(
+    [
+        Corpus("products", ingest_products, count_products),
+        Corpus("outlets", ingest_outlets, count_outlets),
+    ],
+    warmups=[get_intent_examples_embed.aget, get_query_type_examples_embed.aget],
+)
+metrics.Gauge(
+    "corpus_vectors", "Vectors served per corpus.", ("corpus",),
+    fn=lambda: {name: c.vectors or 0 for name, c in supervisor.corpora.items()},
+)
+
 @app.on_event("startup")
 async def startup_event():
     """
-    Run ingestion for products and outlets concurrently at startup.
+    Start ingestion in the background. The app takes traffic right away and
+    serves whatever corpus the indexes already hold; /health/ready reports
+    when every corpus has vectors.
     """
-    try:
-        results = await asyncio.gather(
-            ingest_products(),
-            ingest_outlets(),
-            return_exceptions=True
-        )
-
-        for r in results:
-            if isinstance(r, Exception):
-                print("⚠️ Ingestion task failed:", r)
-
-        print("✅ Parallel ingestion completed successfully.")
-    except Exception as e:
-        print("⚠️ Unexpected error during startup ingestion:", e)
+    supervisor.start()
+    loop_monitor.start()
+    asyncio.create_task(clients.prewarm({"products": get_products_index, "outlets": get_outlets_index}))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await supervisor.stop()
+    await loop_monitor.stop()
+    await asyncio.to_thread(capture.close)
+    await clients.aclose()
+
+def warm_start():
+    """
+    Prepare a process that skips ingestion (Lambda): load the snapshot and
+    build every client once, so warm invocations reuse them. Meant for the
+    init phase; failures are logged and left to lazy initialization.
+    """
+    from app.snapshot import load_manifest
+
+    manifest = load_manifest()
+    if manifest:
+        supervisor.seed(manifest)
+    inits = [p.warm for p in intent_embedder.providers] + [
+        get_intent_examples_embed, get_query_type_examples_embed, get_chat_history,
+        clients.async_openai_client, get_products_index, get_outlets_index,
+    ]
+    for init in inits:
+        try:
+            init()
+        except Exception as e:
+            logger.warning(f"⚠️ Warm start: {init.__name__} failed ({e}); will retry on first use")
+
+    # Mangum runs every invocation on the thread's event loop; open the
+    # pooled connections on that same loop so they are reused
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    loop.run_until_complete(clients.prewarm({"products": get_products_index, "outlets": get_outlets_index}))
+    supervisor.warm = True
 
 @app.get("/health")
 def health():
     return {"status": "ok"}
 
+@app.get("/health/live")
+def health_live():
+    return {"status": "ok", "supervisor": "running" if supervisor.running else "stopped"}
+
+@app.get("/health/ready")
+def health_ready():
+    snapshot = supervisor.snapshot()
+    return JSONResponse(
+        {"status": "ready" if snapshot["ready"] else "not_ready", **snapshot},
+        status_code=200 if snapshot["ready"] else 503,
+    )
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition (see app.metrics)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/debug/loop")
+def debug_loop():
+    """Event-loop lag and blocking call sites (see app.loopmon)."""
+    return loop_monitor.snapshot()
+
+@app.get("/debug/timings")
+def debug_timings():
+    """Per-stage latency histograms (ms) since process start."""
+    return timing.summaries()
+
 # --- Chat Endpoint ---
 @app.post("/api/chat", response_model=ChatResponse)
 async def chat(req: ChatRequest):
     if not req.message:
         raise HTTPException(status_code=400, detail="Message required")
 
+    t0 = time.perf_counter()
     session_id = req.session_id or str(uuid.uuid4())
     user_text = req.message.strip()
-    memory.add_turn(session_id, "user", user_text)
+    with span("memory"):
+        memory.add_turn(session_id, "user", user_text)
     logger.info(f"🟢 Incoming chat: session_id={session_id}, message='{user_text}'")
 
-    # Detect intent & query type
-    intent_obj = detect_intent_and_type(user_text)
+    # Detect intent & query type (example embeddings are built off-loop on first use)
+    with span("examples"):
+        await asyncio.gather(get_intent_examples_embed.aget(), get_query_type_examples_embed.aget())
+    with span("intent"):
+        intent_obj = await detect_intent_and_type(user_text)
     intent = intent_obj["intent"]
     query_type = intent_obj["query_type"]
 
@@ -179,47 +342,57 @@ async def chat(req: ChatRequest):
         if intent == "calc":
             expr = user_text.replace("calculate", "").replace("/calc", "").strip()
             try:
-                result = safe_eval(expr)
+                with span("calc"):
+                    result = safe_eval(expr)
                 reply = f"The answer is **{result}**."
             except Exception as e:
                 reply = f"Sorry, I couldn't calculate that. ({e})"
 
         elif intent == "products":
-            product_results = await query_products(user_text)
-            if query_type == "count":
-                reply = f"There are **{len(product_results)} drinks/products** matching your query."
-            elif query_type == "attribute":
-                attr_texts = [
-                    f"{r.get('metadata', {}).get('name', 'Unknown')} — Price: {r.get('metadata', {}).get('price', 'N/A')}, Calories: {r.get('metadata', {}).get('calories', 'N/A')}"
-                    for r in product_results
-                ]
-                reply = "Here are the products with details:\n" + "\n".join(attr_texts)
-            else:
-                reply = "Here are some products I found:\n" + "\n".join([r["metadata"]["text"] for r in product_results])
+            answer = await query_products(user_text)
+            reply = format_products_reply(answer, query_type)
 
         elif intent == "outlets":
-            outlet_results = await query_outlets(user_text)  # <-- add await here
-            if query_type == "count":
-                reply = f"There are **{len(outlet_results)} outlets** matching your query."
-            elif query_type == "time":
-                times = [
-                    f"{r.get('metadata', {}).get('name', 'Unknown')}: {r.get('metadata', {}).get('hours', 'N/A')}"
-                    for r in outlet_results
-                ]
-                reply = "Outlet opening hours:\n" + "\n".join(times)
-            else:
-                reply = "Here are the nearby outlets:\n" + "\n".join([r["metadata"]["text"] for r in outlet_results])
+            answer = await query_outlets(user_text, lat=req.lat, lon=req.lon)
+            reply = format_outlets_reply(answer, query_type)
 
 
         else:
-            response = await chat_history.invoke_async(session_id=session_id, input=user_text)
+            chat_history = await get_chat_history.aget()
+            with span("llm"):
+                response = await governor.call(
+                    lambda: chat_history.ainvoke(
+                        user_text, config={"configurable": {"session_id": session_id}}
+                    ),
+                    tokens=estimate_tokens(user_text, completion=200),
+                    op="chat",
+                )
             reply = response.content.strip() if hasattr(response, "content") else str(response)
 
-        memory.add_turn(session_id, "bot", reply)
-        return ChatResponse(reply=reply, info={"intent": intent, "query_type": query_type, "session_id": session_id})
+        with span("memory"):
+            memory.add_turn(session_id, "bot", reply)
+        info = {"intent": intent, "query_type": query_type, "session_id": session_id}
 
     except Exception as e:
         reply = "Oops, something went wrong. Please try again."
         memory.add_turn(session_id, "bot", reply)
-        return ChatResponse(reply=reply, info={"error": str(e), "session_id": session_id})
+        info = {"error": str(e), "session_id": session_id}
+
+    if req.debug or timing.CHAT_DEBUG:
+        info["timings"] = timing.current()
+    latency = time.perf_counter() - t0
+    metrics.CHAT_SECONDS.observe(latency, intent)
+    if capture.enabled:
+        capture.record({
+            "ts": time.time() - latency,
+            "session_id": session_id,
+            "message": user_text,
+            "intent": intent,
+            "query_type": query_type,
+            "reply": reply,
+            "error": info.get("error"),
+            "timings": timing.current(),
+            "latency_ms": round(latency * 1000, 3),
+        })
+    return ChatResponse(reply=reply, info=info)
     
\ No newline at end of file
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger("Checkpoint")
+
+INGEST_CHECKPOINT_DIR = os.getenv("INGEST_CHECKPOINT_DIR", ".ingest")
+
+
+def content_hash(text: str):
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=8).hexdigest()
+
+
+class Checkpoint:
+    """
+    Progress of one ingest run, kept in ``{directory}/{corpus}.json``.
+
+    Records fetched source pages (so a resumed run does not crawl them
+    again) and the ids written to the index together with a hash of the text
+    they were embedded from (so unchanged items are not embedded again). A
+    run that finishes calls ``complete()``; the next one starts fresh.
+
+    Writes are atomic (temp file + rename) and throttled to one every
+    ``save_every`` seconds, so an interrupted run loses at most that much.
+    """
+
+    def __init__(self, path: str, corpus: str, save_every: float = 2.0):
+        self.path = path
+        self.corpus = corpus
+        self.save_every = save_every
+        self.data = {"corpus": corpus, "started": time.time(), "complete": False, "pages": {}, "done": {}}
+        self.resumed = False
+        self._last_save = 0.0
+
+    @classmethod
+    def open(cls, corpus: str, directory: str = INGEST_CHECKPOINT_DIR, resume: bool = True):
+        cp = cls(os.path.join(directory, f"{corpus}.json"), corpus)
+        if resume and os.path.exists(cp.path):
+            try:
+                with open(cp.path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"⚠️ Ignoring unreadable checkpoint {cp.path}: {e}")
+            else:
+                if not data.get("complete"):
+                    cp.data = data
+                    cp.resumed = True
+                    logger.info(
+                        f"↩️ Resuming {corpus} ingest: {len(data['pages'])} pages fetched, "
+                        f"{len(data['done'])} items already written"
+                    )
+        return cp
+
+    # -----------------------------------------------------
+    # Fetched pages
+    # -----------------------------------------------------
+    def page(self, key: str):
+        """Records saved for a fetched page, or None if not fetched yet."""
+        return self.data["pages"].get(key)
+
+    def save_page(self, key: str, records: list):
+        self.data["pages"][key] = records
+        self.save(force=True)
+
+    # -----------------------------------------------------
+    # Written items
+    # -----------------------------------------------------
+    def is_done(self, item_id: str, text: str):
+        return self.data["done"].get(item_id) == content_hash(text)
+
+    @property
+    def done_ids(self):
+        return set(self.data["done"])
+
+    def mark_done(self, vectors: list[dict]):
+        for v in vectors:
+            self.data["done"][v["id"]] = content_hash(v["metadata"]["text"])
+        self.save()
+
+    # -----------------------------------------------------
+    def complete(self):
+        self.data["complete"] = True
+        self.data["finished"] = time.time()
+        self.save(force=True)
+
+    def save(self, force: bool = False):
+        now = time.monotonic()
+        if not force and now - self._last_save < self.save_every:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(self.data, f)
+        os.replace(tmp, self.path)
+        self._last_save = now
@@ -0,0 +1,214 @@
+"""
+Process-wide clients for every external service.
+
+One sync and one async ``httpx`` pool carry all OpenAI (SDK and LangChain),
+Shopify and outlet-feed traffic, with keep-alive, connect/read timeouts and
+HTTP/2 when the ``h2`` package is installed. Pinecone keeps its own urllib3
+pool (the SDK does not take an httpx client), sized here and shared by
+every index handle, which also records call latency and errors (see
+app.metrics). Everything is created on first use; ``prewarm()``
+opens connections ahead of the first request and ``aclose()`` releases them
+at shutdown.
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import threading
+import time
+
+from app import metrics
+from app.lazy import once
+
+logger = logging.getLogger("Clients")
+
+# ---------------------------------------------------------
+# Config
+# ---------------------------------------------------------
+HTTP_CONNECT_TIMEOUT_S = float(os.getenv("HTTP_CONNECT_TIMEOUT_S", "5"))
+HTTP_READ_TIMEOUT_S = float(os.getenv("HTTP_READ_TIMEOUT_S", "30"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+HTTP_KEEPALIVE_EXPIRY_S = 60.0
+HTTP2 = importlib.util.find_spec("h2") is not None
+PINECONE_POOL_SIZE = int(os.getenv("PINECONE_POOL_SIZE", "32"))
+# Connections opened per host by prewarm()
+PREWARM_CONNECTIONS = int(os.getenv("PREWARM_CONNECTIONS", "2"))
+
+
+def _pool_options():
+    import httpx
+
+    return {
+        "http2": HTTP2,
+        "timeout": httpx.Timeout(HTTP_READ_TIMEOUT_S, connect=HTTP_CONNECT_TIMEOUT_S),
+        "limits": httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_S,
+        ),
+        "follow_redirects": True,
+    }
+
+
+# ---------------------------------------------------------
+# HTTP pools
+# ---------------------------------------------------------
+@once
+def http_client():
+    import httpx
+
+    return httpx.Client(**_pool_options())
+
+
+@once
+def async_http_client():
+    import httpx
+
+    return httpx.AsyncClient(**_pool_options())
+
+
+# ---------------------------------------------------------
+# OpenAI
+# ---------------------------------------------------------
+# Retries are owned by the rate governor so it sees every 429
+@once
+def openai_client():
+    from openai import OpenAI
+
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0, http_client=http_client())
+
+
+@once
+def async_openai_client():
+    from openai import AsyncOpenAI
+
+    client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), max_retries=0, http_client=async_http_client())
+    # Resources are imported on first attribute access (chat alone is ~0.3 s
+    # of modules); touch them here, off the event loop, not on the first call
+    client.chat.completions, client.embeddings
+    return client
+
+
+def chat_model(**kwargs):
+    """LangChain ``ChatOpenAI`` on the shared pools."""
+    from langchain_openai import ChatOpenAI
+
+    return ChatOpenAI(
+        openai_api_key=os.getenv("OPENAI_API_KEY"),
+        max_retries=0,
+        http_client=http_client(),
+        http_async_client=async_http_client(),
+        **kwargs,
+    )
+
+
+# ---------------------------------------------------------
+# Pinecone
+# ---------------------------------------------------------
+@once
+def pinecone_client():
+    from pinecone import Pinecone
+
+    return Pinecone(api_key=os.getenv("PINECONE_API_KEY"), pool_threads=PINECONE_POOL_SIZE)
+
+
+class InstrumentedIndex:
+    """Pinecone index handle that times its data-plane calls."""
+
+    TIMED = frozenset({"query", "upsert", "fetch", "delete", "update", "describe_index_stats"})
+
+    def __init__(self, index, name: str):
+        self._index = index
+        self._name = name
+
+    def __getattr__(self, attr):
+        value = getattr(self._index, attr)
+        if attr not in self.TIMED:
+            return value
+
+        def timed(*args, **kwargs):
+            t0 = time.perf_counter()
+            outcome = "error"
+            try:
+                result = value(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                metrics.PINECONE_SECONDS.observe(time.perf_counter() - t0, self._name, attr)
+                metrics.PINECONE_REQUESTS.inc(self._name, attr, outcome)
+
+        return timed
+
+
+_indexes: dict = {}
+_indexes_lock = threading.Lock()
+
+
+def pinecone_index(name: str, dimension: int):
+    """Shared handle for index ``name``, created (serverless, cosine) if missing."""
+    with _indexes_lock:
+        if name not in _indexes:
+            from pinecone import ServerlessSpec
+
+            pc = pinecone_client()
+            if name not in pc.list_indexes().names():
+                pc.create_index(
+                    name=name,
+                    dimension=dimension,
+                    metric="cosine",
+                    spec=ServerlessSpec(cloud="aws", region="us-east-1")
+                )
+            _indexes[name] = InstrumentedIndex(pc.Index(name, connection_pool_maxsize=PINECONE_POOL_SIZE), name)
+        return _indexes[name]
+
+
+# ---------------------------------------------------------
+# Lifecycle
+# ---------------------------------------------------------
+async def _warm_openai():
+    openai = await async_openai_client.aget()
+    client = await async_http_client.aget()
+    # Any response (even 401/404) means TCP + TLS are up and pooled
+    await asyncio.gather(*(client.get(str(openai.base_url)) for _ in range(PREWARM_CONNECTIONS)))
+
+
+async def _warm_index(getter):
+    index = await getter.aget()
+    await asyncio.gather(*(
+        asyncio.to_thread(index.describe_index_stats) for _ in range(PREWARM_CONNECTIONS)
+    ))
+
+
+async def prewarm(indexes: dict | None = None):
+    """
+    Open OpenAI connections and ask each Pinecone index (name -> lazy
+    getter) for its stats, so the first user request skips DNS, TCP and TLS
+    setup. Failures are logged only.
+    """
+    t0 = time.perf_counter()
+    jobs = {"openai": _warm_openai()}
+    for name, getter in (indexes or {}).items():
+        jobs[f"pinecone/{name}"] = _warm_index(getter)
+
+    results = await asyncio.gather(*jobs.values(), return_exceptions=True)
+    for name, result in zip(jobs, results):
+        if isinstance(result, Exception):
+            logger.warning(f"⚠️ Prewarm {name} failed: {result}")
+    logger.info(f"🔥 Prewarmed {len(jobs)} hosts in {time.perf_counter() - t0:.2f}s (http2={HTTP2})")
+
+
+async def aclose():
+    """Close every pool at shutdown."""
+    if async_http_client.initialized:
+        await async_http_client.get().aclose()
+    if http_client.initialized:
+        http_client.get().close()
+    with _indexes_lock:
+        for index in _indexes.values():
+            close = getattr(index, "close", None)
+            if close:
+                close()
+        _indexes.clear()
+    for client in (async_http_client, http_client, openai_client, async_openai_client, pinecone_client):
+        client.reset()
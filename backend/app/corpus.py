@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import os
+import time
+
+from app import metrics
+
+logger = logging.getLogger("Corpus")
+
+# ---------------------------------------------------------
+# Config
+# ---------------------------------------------------------
+# false when a separate worker (ingest.py / CronJob) owns ingestion
+INGEST_ON_STARTUP = os.getenv("INGEST_ON_STARTUP", "true").lower() in ("1", "true", "yes")
+# Seconds between scheduled refreshes; 0 ingests once after startup
+INGEST_REFRESH_S = float(os.getenv("INGEST_REFRESH_S", "0"))
+INGEST_RETRY_MIN_S = 5.0
+INGEST_RETRY_MAX_S = 300.0
+
+
+class Corpus:
+    """
+    One searchable corpus (a Pinecone index) and the state of its ingestion.
+
+    ``ingest`` is the async ingest function and ``count`` a blocking call
+    returning how many vectors the index currently serves. The index keeps
+    the previous vectors while a refresh upserts over them, so a corpus that
+    has ever had vectors stays ``serving`` through refreshes and failures.
+    """
+
+    def __init__(self, name: str, ingest, count):
+        self.name = name
+        self.ingest = ingest
+        self.count = count
+
+        self.state = "unknown"  # unknown | empty | refreshing | ready | failed | snapshot
+        self.vectors = 0
+        self.refreshes = 0
+        self.failures = 0
+        self.last_success = None
+        self.last_attempt = None
+        self.last_duration_s = None
+        self.last_error = None
+        self.last_stats = None
+
+    @property
+    def serving(self):
+        return self.vectors > 0
+
+    def snapshot(self):
+        return {
+            "state": self.state,
+            "serving": self.serving,
+            "vectors": self.vectors,
+            "refreshes": self.refreshes,
+            "failures": self.failures,
+            "last_success": self.last_success,
+            "last_attempt": self.last_attempt,
+            "last_duration_s": self.last_duration_s,
+            "last_error": self.last_error,
+        }
+
+    async def probe(self):
+        """Pick up vectors left by a previous deploy before refreshing."""
+        try:
+            self.vectors = await asyncio.to_thread(self.count)
+            self.state = "ready" if self.vectors else "empty"
+            logger.info(f"🔎 {self.name}: {self.vectors} vectors already indexed")
+        except Exception as e:
+            self.last_error = f"probe: {e}"
+            logger.warning(f"⚠️ Could not probe {self.name} index: {e}")
+
+    async def refresh(self):
+        """Run one ingestion; return True when it produced a corpus."""
+        self.state = "refreshing"
+        self.last_attempt = time.time()
+        t0 = time.perf_counter()
+        try:
+            stats = await self.ingest()
+            stats = stats or {}
+            written = stats.get("writer", {}).get("vectors", 0) + stats.get("skipped", 0)
+            if not written:
+                raise RuntimeError("ingest produced no vectors")
+        except Exception as e:
+            self.failures += 1
+            metrics.INGEST_RUNS.inc(self.name, "error")
+            self.last_error = str(getattr(e, "detail", None) or e)
+            self.state = "ready" if self.serving else "failed"
+            logger.warning(f"⚠️ {self.name} ingest failed ({self.last_error}); "
+                           f"{'serving previous corpus' if self.serving else 'no corpus to serve'}")
+            return False
+        finally:
+            self.last_duration_s = round(time.perf_counter() - t0, 3)
+            metrics.INGEST_SECONDS.observe(self.last_duration_s, self.name)
+
+        self.refreshes += 1
+        self.last_success = time.time()
+        self.last_error = None
+        self.last_stats = stats
+        self.vectors = written
+        self.state = "ready"
+        metrics.INGEST_RUNS.inc(self.name, "ok")
+        metrics.INGEST_VECTORS.inc(self.name, amount=written)
+        logger.info(f"✅ {self.name} corpus refreshed: {written} vectors in {self.last_duration_s}s")
+        return True
+
+
+class IngestSupervisor:
+    """
+    Runs ingestion in the background so the app accepts traffic at once.
+
+    Each corpus is first probed for vectors from a previous deploy, then
+    refreshed; failed refreshes are retried with exponential backoff, and
+    with ``refresh_interval`` set a successful one is repeated on schedule.
+    ``warmups`` are awaited once before the app reports ready (e.g. the
+    intent example embeddings), so the first routed request is not slow.
+
+    With ``ingest=False`` another process ingests: the indexes are only
+    probed, with backoff, until they have vectors.
+    """
+
+    def __init__(self, corpora: list[Corpus], warmups=(), refresh_interval: float = INGEST_REFRESH_S,
+                 ingest: bool = INGEST_ON_STARTUP):
+        self.corpora = {c.name: c for c in corpora}
+        self.warmups = list(warmups)
+        self.refresh_interval = refresh_interval
+        self.ingest = ingest
+        self.warm = not self.warmups
+        self._task: asyncio.Task | None = None
+        self._refreshing: dict[str, asyncio.Task] = {}
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    @property
+    def ready(self):
+        return self.warm and all(c.serving for c in self.corpora.values())
+
+    def snapshot(self):
+        return {
+            "ready": self.ready,
+            "warm": self.warm,
+            "supervisor": "running" if self.running else "stopped",
+            "corpora": {name: c.snapshot() for name, c in self.corpora.items()},
+        }
+
+    def seed(self, manifest: dict):
+        """Take corpus sizes from a snapshot manifest instead of probing."""
+        for name, vectors in manifest.get("corpora", {}).items():
+            if name in self.corpora:
+                corpus = self.corpora[name]
+                corpus.vectors = vectors
+                corpus.state = "snapshot"
+                corpus.last_success = manifest.get("built_at")
+
+    def start(self):
+        if not self.running:
+            self._task = asyncio.create_task(self._run(), name="ingest-supervisor")
+        return self._task
+
+    async def stop(self):
+        if self._task is None:
+            return
+        tasks = [self._task, *self._refreshing.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._task = None
+
+    async def refresh(self, name: str):
+        """Refresh one corpus now, joining a refresh already in progress."""
+        task = self._refreshing.get(name)
+        if task is None or task.done():
+            task = asyncio.create_task(self.corpora[name].refresh())
+            self._refreshing[name] = task
+        return await asyncio.shield(task)
+
+    async def _run(self):
+        await asyncio.gather(*(c.probe() for c in self.corpora.values()))
+        await asyncio.gather(
+            self._warm_up(),
+            *(self._supervise(name) for name in self.corpora),
+        )
+
+    async def _warm_up(self):
+        for warmup in self.warmups:
+            try:
+                await warmup()
+            except Exception as e:
+                # Requests warm lazily on their own; do not hold readiness hostage
+                logger.warning(f"⚠️ Warm-up {getattr(warmup, '__name__', warmup)} failed: {e}")
+        self.warm = True
+
+    async def _supervise(self, name: str):
+        delay = INGEST_RETRY_MIN_S
+        corpus = self.corpora[name]
+        while not self.ingest:
+            if corpus.serving:
+                return
+            await asyncio.sleep(delay)
+            delay = min(INGEST_RETRY_MAX_S, delay * 2)
+            await corpus.probe()
+        while True:
+            if await self.refresh(name):
+                if not self.refresh_interval:
+                    return
+                delay = INGEST_RETRY_MIN_S
+                await asyncio.sleep(self.refresh_interval)
+            else:
+                await asyncio.sleep(delay)
+                delay = min(INGEST_RETRY_MAX_S, delay * 2)
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import os
+import time
+
+from app import clients
+from app.ratelimit import governor, estimate_tokens, CHAT
+
+logger = logging.getLogger("Embeddings")
+
+# ---------------------------------------------------------
+# Config
+# ---------------------------------------------------------
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai")
+EMBEDDING_FALLBACK = os.getenv("EMBEDDING_FALLBACK", "local")
+EMBEDDING_TIMEOUT_S = float(os.getenv("EMBEDDING_TIMEOUT_S", "2.0"))
+OPENAI_EMBEDDING_MODEL = "text-embedding-3-small"
+OPENAI_EMBEDDING_DIM = 1536
+# text-embedding-3 models can shorten their output natively (Matryoshka)
+EMBEDDING_DIMENSIONS = int(os.getenv("EMBEDDING_DIMENSIONS", str(OPENAI_EMBEDDING_DIM)))
+
+
+# ---------------------------------------------------------
+# Providers
+# ---------------------------------------------------------
+class EmbeddingProvider:
+    """
+    Turns texts into an ``(n, dimension)`` float32 array. Vectors from different
+    providers live in different spaces, so anything compared against stored
+    vectors must use the provider those vectors were built with.
+    """
+
+    name = "base"
+    dimension = 0
+
+    def embed_sync(self, texts: list[str], priority: int = CHAT, timeout: float | None = None):
+        raise NotImplementedError
+
+    async def embed(self, texts: list[str], priority: int = CHAT, timeout: float | None = None):
+        raise NotImplementedError
+
+    def embed_one_sync(self, text: str, **kwargs):
+        return self.embed_sync([text], **kwargs)[0]
+
+    async def embed_one(self, text: str, **kwargs):
+        return (await self.embed([text], **kwargs))[0]
+
+    def warm(self):
+        """Create clients ahead of the first call (no network)."""
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    name = "openai"
+
+    def __init__(self, model: str = OPENAI_EMBEDDING_MODEL, dimension: int = EMBEDDING_DIMENSIONS):
+        self.model = model
+        self.dimension = dimension
+
+    def warm(self):
+        clients.openai_client()
+        clients.async_openai_client()
+
+    @property
+    def client(self):
+        return clients.openai_client()
+
+    @property
+    def async_client(self):
+        return clients.async_openai_client()
+
+    def _kwargs(self, texts, timeout):
+        kwargs = {"model": self.model, "input": texts}
+        if self.dimension != OPENAI_EMBEDDING_DIM:
+            kwargs["dimensions"] = self.dimension
+        if timeout is not None:
+            kwargs["timeout"] = timeout
+        return kwargs
+
+    def embed_sync(self, texts, priority=CHAT, timeout=None):
+        resp = governor.call_sync(
+            lambda: self.client.embeddings.create(**self._kwargs(texts, timeout)),
+            priority=priority,
+            tokens=estimate_tokens(texts),
+            op="embeddings",
+        )
+        import numpy as np
+
+        return np.array([d.embedding for d in resp.data], dtype=np.float32)
+
+    async def embed(self, texts, priority=CHAT, timeout=None):
+        await clients.async_openai_client.aget()
+        resp = await governor.call(
+            lambda: self.async_client.embeddings.create(**self._kwargs(texts, timeout)),
+            priority=priority,
+            tokens=estimate_tokens(texts),
+            op="embeddings",
+        )
+        import numpy as np
+
+        return np.array([d.embedding for d in resp.data], dtype=np.float32)
+
+
+class HashingEmbeddingProvider(EmbeddingProvider):
+    """
+    Deterministic CPU embedding: character n-grams of the lowercased text are
+    hashed (polynomial rolling hash, computed with NumPy over all positions
+    at once) into ``dimension`` signed buckets and L2-normalised. No network,
+    no model weights, identical output in every process.
+    """
+
+    name = "local"
+
+    _PRIME = 1_000_003
+    _MIX = 0x9E3779B97F4A7C15
+
+    def __init__(self, dimension: int = EMBEDDING_DIMENSIONS, ngram_range: tuple[int, int] = (3, 5)):
+        self.dimension = dimension
+        self.ngram_range = ngram_range
+
+    def _vector(self, text: str):
+        import numpy as np
+
+        prime, mix = np.uint64(self._PRIME), np.uint64(self._MIX)
+        vec = np.zeros(self.dimension, dtype=np.float32)
+        data = np.frombuffer(f" {text.lower()} ".encode("utf-8"), dtype=np.uint8).astype(np.uint64)
+
+        with np.errstate(over="ignore"):
+            for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                if len(data) < n:
+                    continue
+                h = np.zeros(len(data) - n + 1, dtype=np.uint64)
+                for k in range(n):
+                    h = h * prime + data[k:len(data) - n + 1 + k]
+                h = (h + np.uint64(n)) * mix
+                idx = (h >> np.uint64(32)) % np.uint64(self.dimension)
+                sign = np.where(h & np.uint64(1), 1.0, -1.0).astype(np.float32)
+                np.add.at(vec, idx.astype(np.intp), sign)
+
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def embed_sync(self, texts, priority=CHAT, timeout=None):
+        import numpy as np
+
+        return np.stack([self._vector(t) for t in texts])
+
+    async def embed(self, texts, priority=CHAT, timeout=None):
+        if len(texts) > 64:
+            return await asyncio.to_thread(self.embed_sync, texts)
+        return self.embed_sync(texts)
+
+
+class FallbackEmbeddingProvider:
+    """
+    Uses ``primary`` with a tight timeout and switches to ``fallback`` when it
+    is slow or failing. After a failure the primary is skipped for
+    ``cooldown`` seconds so every request does not pay the timeout again.
+
+    Results come back with the name of the provider that produced them,
+    because only callers holding vectors from both spaces (e.g. the intent
+    examples) can use a fallback vector meaningfully.
+    """
+
+    def __init__(self, primary: EmbeddingProvider, fallback: EmbeddingProvider | None,
+                 timeout: float = EMBEDDING_TIMEOUT_S, cooldown: float = 30.0):
+        self.primary = primary
+        self.fallback = fallback
+        self.timeout = timeout
+        self.cooldown = cooldown
+        self._skip_until = 0.0
+
+    @property
+    def providers(self):
+        return [p for p in (self.primary, self.fallback) if p is not None]
+
+    def _failed(self, e: Exception):
+        logger.warning(f"⚠️ {self.primary.name} embeddings unavailable ({type(e).__name__}); "
+                       f"using {self.fallback.name} for {self.cooldown:.0f}s")
+        self._skip_until = time.monotonic() + self.cooldown
+
+    async def embed_with_source(self, texts: list[str], priority: int = CHAT):
+        if self.fallback is None:
+            return await self.primary.embed(texts, priority=priority), self.primary.name
+        if time.monotonic() >= self._skip_until:
+            try:
+                vecs = await asyncio.wait_for(
+                    self.primary.embed(texts, priority=priority, timeout=self.timeout),
+                    timeout=self.timeout * 2,
+                )
+                return vecs, self.primary.name
+            except Exception as e:
+                self._failed(e)
+        return await self.fallback.embed(texts, priority=priority), self.fallback.name
+
+
+# ---------------------------------------------------------
+# Registry
+# ---------------------------------------------------------
+PROVIDERS = {
+    "openai": OpenAIEmbeddingProvider,
+    "local": HashingEmbeddingProvider,
+}
+
+
+def get_provider(name: str):
+    try:
+        return PROVIDERS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown embedding provider '{name}' (expected one of {sorted(PROVIDERS)})")
+
+
+# Provider for everything compared against the vector indexes
+embedder = get_provider(EMBEDDING_PROVIDER)
+
+
+def index_name_for(base: str):
+    """Indexes are per dimensionality; a 1536-dim index cannot take 512-dim vectors."""
+    return base if embedder.dimension == OPENAI_EMBEDDING_DIM else f"{base}-{embedder.dimension}"
+
+# Provider for intent detection, which can degrade to the local backend
+intent_embedder = FallbackEmbeddingProvider(
+    embedder,
+    get_provider(EMBEDDING_FALLBACK)
+    if EMBEDDING_FALLBACK and EMBEDDING_FALLBACK != EMBEDDING_PROVIDER else None,
+)
@@ -0,0 +1,208 @@
+"""
+Nearest-outlet search: coordinates for outlets and a grid index over them.
+
+Outlets get coordinates at ingest, without a geocoding service: from their
+map link when it carries them (see app.outlet_pages), otherwise from the
+centroid of the postcode area in their address, looked up in the bundled
+``app/data/postcodes.csv`` (town-level areas, so a few km approximate).
+
+``GeoIndex`` buckets points into ``CELL_DEG`` lat/lon cells and keeps them
+sorted by cell, so each grid row a query spans is one ``searchsorted``
+slice. Great-circle distances are computed for those candidates only.
+Nearest-k widens the radius until k points fall inside it, so either kind
+of query reads a few cells instead of every outlet.
+"""
+import csv
+import math
+import os
+import re
+from pathlib import Path
+
+from app.lazy import once
+
+POSTCODES_PATH = Path(__file__).parent / "data" / "postcodes.csv"
+# Radius of "near me" questions
+OUTLET_NEAR_KM = float(os.getenv("OUTLET_NEAR_KM", "5"))
+CELL_DEG = 0.05
+EARTH_KM = 6371.0088
+# Nearest-k stops widening here (Peninsular Malaysia to Borneo)
+MAX_KM = 2000.0
+
+_POSTCODE = re.compile(r"(?<!\d)(\d{5})(?!\d)")
+# Only "around me/here" and "within <distance>": "open around 10pm" is a time question
+_NEAR = re.compile(r"\b(near|nearest|nearby|closest|around (?:me|here))\b")
+_RADIUS = re.compile(r"\bwithin\s+(\d+(?:\.\d+)?)\s*(km|kilomet(?:er|re)s?|m|met(?:er|re)s?)\b")
+_COUNT = re.compile(r"\b(?:nearest|closest)\s+(\d{1,2})\b|\b(\d{1,2})\s+(?:nearest|closest)\b")
+_PLURAL = re.compile(r"\b(outlets|stores|shops|branches|ones|places|cafes)\b")
+
+
+# ---------------------------------------------------------
+# Postcode centroids
+# ---------------------------------------------------------
+@once
+def postcode_table():
+    """Postcode ranges of ``postcodes.csv`` as arrays sorted by start, plus their rows."""
+    import numpy as np
+
+    with open(POSTCODES_PATH, newline="") as f:
+        rows = sorted(csv.DictReader(f), key=lambda r: int(r["start"]))
+    return {
+        "start": np.array([int(r["start"]) for r in rows], dtype=np.int32),
+        "end": np.array([int(r["end"]) for r in rows], dtype=np.int32),
+        "rows": [{"area": r["area"], "state": r["state"], "lat": float(r["lat"]), "lon": float(r["lon"])} for r in rows],
+    }
+
+
+def postcode_area(text: str):
+    """
+    Area, state and centroid of the last postcode in ``text`` the table
+    covers (addresses end with it; lot numbers come first), or None.
+    """
+    import numpy as np
+
+    table = postcode_table()
+    for code in reversed(_POSTCODE.findall(text or "")):
+        i = int(np.searchsorted(table["start"], int(code), side="right")) - 1
+        if i >= 0 and int(code) <= table["end"][i]:
+            return {"postcode": code, **table["rows"][i]}
+    return None
+
+
+def locate(address: str):
+    """``(lat, lon)`` of the postcode area in ``address``, or None."""
+    area = postcode_area(address)
+    return (area["lat"], area["lon"]) if area else None
+
+
+def haversine_km(lat, lon, lats, lons):
+    """Great-circle distance (km) from one point to arrays of points."""
+    import numpy as np
+
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    a = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+# ---------------------------------------------------------
+# Grid index
+# ---------------------------------------------------------
+class GeoIndex:
+    """Outlets with coordinates (``lat``/``lon`` metadata), bucketed in a lat/lon grid."""
+
+    def __init__(self, metadata: list[dict], cell_deg: float = CELL_DEG):
+        import numpy as np
+
+        rows = [m for m in metadata if m.get("lat") is not None and m.get("lon") is not None]
+        self.cell_deg = cell_deg
+        self.cols = int(math.ceil(360 / cell_deg)) + 1
+        lat = np.array([float(m["lat"]) for m in rows], dtype=np.float64)
+        lon = np.array([float(m["lon"]) for m in rows], dtype=np.float64)
+        keys = self._row(lat) * self.cols + self._col(lon)
+        order = np.argsort(keys, kind="stable")
+        self.metadata = [rows[i] for i in order]
+        self.lat, self.lon, self.keys = lat[order], lon[order], keys[order]
+
+    def __len__(self):
+        return len(self.metadata)
+
+    @property
+    def nbytes(self):
+        return self.lat.nbytes + self.lon.nbytes + self.keys.nbytes
+
+    def _row(self, lat):
+        import numpy as np
+
+        return np.floor((np.asarray(lat) + 90) / self.cell_deg).astype(np.int64)
+
+    def _col(self, lon):
+        import numpy as np
+
+        return np.floor((np.asarray(lon) + 180) / self.cell_deg).astype(np.int64)
+
+    def within(self, lat: float, lon: float, radius_km: float):
+        """Positions and distances (km) of the points within ``radius_km``, nearest first."""
+        import numpy as np
+
+        dlat = math.degrees(radius_km / EARTH_KM)
+        dlon = min(180.0, dlat / max(math.cos(math.radians(lat)), 1e-6))
+        rows = np.arange(self._row(max(-90.0, lat - dlat)), self._row(min(90.0, lat + dlat)) + 1)
+        c0, c1 = self._col(max(-180.0, lon - dlon)), self._col(min(180.0, lon + dlon))
+        lo = np.searchsorted(self.keys, rows * self.cols + c0, side="left")
+        hi = np.searchsorted(self.keys, rows * self.cols + c1, side="right")
+        spans = [np.arange(a, b) for a, b in zip(lo, hi) if b > a]
+        if not spans:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        candidates = np.concatenate(spans)
+        distances = haversine_km(lat, lon, self.lat[candidates], self.lon[candidates])
+        keep = distances <= radius_km
+        candidates, distances = candidates[keep], distances[keep]
+        order = np.argsort(distances, kind="stable")
+        return candidates[order], distances[order]
+
+    def nearest(self, lat: float, lon: float, k: int = 1, max_km: float = MAX_KM):
+        """Positions and distances (km) of the ``k`` points nearest to ``(lat, lon)``."""
+        radius = self.cell_deg * 111.0
+        while True:
+            found, distances = self.within(lat, lon, radius)
+            if len(found) >= k or radius >= max_km:
+                return found[:k], distances[:k]
+            radius = min(radius * 4, max_km)
+
+    def answer(self, query: str, lat: float | None = None, lon: float | None = None, limit: int | None = None):
+        """
+        A ``query_outlets``-shaped response for a proximity question
+        ("nearest outlet", "outlets near me", "within 2 km of 47500"),
+        around ``lat``/``lon`` or a postcode in the query. None when the
+        query is not about proximity or has no location to measure from.
+        """
+        q = query.lower()
+        radius = _RADIUS.search(q)
+        if not len(self) or not (_NEAR.search(q) or radius):
+            return None
+        origin = "you"
+        if lat is None or lon is None:
+            area = postcode_area(q)
+            if area is None:
+                return None
+            lat, lon, origin = area["lat"], area["lon"], area["postcode"]
+
+        count = _COUNT.search(q)
+        if radius:
+            km = float(radius.group(1)) / (1 if radius.group(2).startswith("k") else 1000)
+            found, distances = self.within(lat, lon, km)
+            label = f"within {radius.group(1)} {radius.group(2)} of {origin}"
+        elif count or re.search(r"\b(nearest|closest)\b", q):
+            k = int(count.group(1) or count.group(2)) if count else (5 if _PLURAL.search(q) else 1)
+            found, distances = self.nearest(lat, lon, k)
+            label = f"nearest to {origin}"
+        else:
+            found, distances = self.within(lat, lon, OUTLET_NEAR_KM)
+            label = f"within {OUTLET_NEAR_KM:g} km of {origin}"
+            if not len(found):
+                found, distances = self.nearest(lat, lon, 3)
+                label = f"nearest to {origin} (none within {OUTLET_NEAR_KM:g} km)"
+        found, distances = found[:limit], distances[:limit]
+
+        n = len(found)
+        if n == 1 and label.startswith("nearest"):
+            m = self.metadata[found[0]]
+            response = f"The outlet nearest to {origin} is {m['name']}, {distances[0]:.1f} km away."
+        else:
+            response = f"{n} outlet{'' if n == 1 else 's'} {label}."
+        return {
+            "query": query,
+            "response": response,
+            "matches_found": n,
+            "cities_detected": [],
+            "outlets": [
+                {
+                    "name": self.metadata[i]["name"],
+                    "address": self.metadata[i]["address"],
+                    "city": self.metadata[i].get("city"),
+                    "hours": self.metadata[i].get("hours", "Not available"),
+                    "distance_km": round(float(d), 2),
+                }
+                for i, d in zip(found, distances)
+            ],
+        }
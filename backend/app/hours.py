@@ -0,0 +1,338 @@
+"""
+Outlet opening hours: parsing, storage and "open now / at T / late" lookups.
+
+``parse_hours`` turns the free text of an outlet page ("Mon - Fri: 8am -
+10pm", "Daily 7:30AM - 12:00AM", "Open 24 hours") into weekly intervals in
+minutes from Monday 00:00; spans past midnight run into the next day and
+wrap at the end of the week. Intervals travel in index metadata as
+``"start-end"`` strings, and ``HoursTable`` keeps every outlet's intervals
+in flat NumPy arrays, so "which outlets are open at T" is one comparison
+over all intervals and a ``bincount``. ``parse_time_query`` finds the
+moment a question asks about, in ``OUTLET_TZ``.
+"""
+import html as htmllib
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+from app.lexical import Partitions
+from app.places import localities_of
+
+OUTLET_TZ = ZoneInfo(os.getenv("OUTLET_TZ", "Asia/Kuala_Lumpur"))
+DAY = 1440
+WEEK = 7 * DAY
+# "Open late" means still open at this hour; "open early" already open at this one
+LATE_HOUR = 22
+EARLY_HOUR = 7
+
+DAY_NAMES = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
+# Day names and their abbreviations, but not "Sunway" or "Monthly"
+_DAY = r"(mon|tue|wed|thu|fri|sat|sun)(?:day|sday|nesday|rsday|urday|rs|r|s)?\b\.?"
+_DAY_START = r"(?:mon|tue|wed|thu|fri|sat|sun)"
+_TIME = r"(\d{1,2})(?:[:.](\d{2}))?\s*([ap]\.?m\.?)?"
+_RANGE = re.compile(rf"{_TIME}\s*(?:-|to|until|till)\s*{_TIME}")
+_ALL_DAY = re.compile(r"\b(24\s*hours|24\s*hrs|24/7|24-hour)\b")
+
+
+# ---------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------
+def _days(segment: str):
+    """Weekdays (0 = Monday) a segment of hours text applies to, or None."""
+    if re.search(r"\b(daily|every\s*day|everyday|all days|7 days)\b", segment):
+        return list(range(7))
+    days = set()
+    if re.search(r"\bweekdays?\b", segment):
+        days.update(range(5))
+    if re.search(r"\bweekends?\b", segment):
+        days.update((5, 6))
+    names = [(m.start(), m.end(), ["mon", "tue", "wed", "thu", "fri", "sat", "sun"].index(m.group(1)))
+             for m in re.finditer(rf"\b{_DAY}", segment)]
+    i = 0
+    while i < len(names):
+        # "Mon - Fri" / "Monday to Sunday" is a range, "Sat & Sun" two days
+        if i + 1 < len(names) and re.fullmatch(r"\s*(-|to|until|till)\s*", segment[names[i][1]:names[i + 1][0]]):
+            first, last = names[i][2], names[i + 1][2]
+            days.update(d % 7 for d in range(first, last + 1 if last >= first else last + 8))
+            i += 2
+        else:
+            days.add(names[i][2])
+            i += 1
+    return sorted(days) if days else None
+
+
+def _minutes(hour: str, minute: str | None, suffix: str | None):
+    h, m = int(hour), int(minute or 0)
+    if suffix:
+        if h == 12:
+            h = 0
+        if suffix.startswith("p"):
+            h += 12
+    return h * 60 + m
+
+
+def _span(m):
+    """(open, close) minutes of a time-range match; close > open, up to 48h."""
+    start_suffix, end_suffix = m.group(3), m.group(6)
+    if not start_suffix and end_suffix and int(m.group(1)) <= 12:
+        # "8 - 10pm" opens in the morning; "12 - 10pm" at noon
+        start_suffix = "pm" if int(m.group(1)) == 12 else "am"
+    start = _minutes(m.group(1), m.group(2), start_suffix)
+    end = _minutes(m.group(4), m.group(5), end_suffix)
+    if not end_suffix and start_suffix and end <= start and int(m.group(4)) < 12:
+        end += 12 * 60  # "10am - 10": the evening
+    if end <= start:
+        end += DAY  # past midnight (or 24:00)
+    return start, end
+
+
+def _normalize(text: str):
+    return text.lower().replace("\u2013", "-").replace("\u2014", "-")
+
+
+def parse_hours(text: str):
+    """Weekly ``(start, end)`` intervals in minutes from Monday 00:00."""
+    # Sentences split too, but not after "a.m."; "... 5pm Sat 10am - ..." splits before the day
+    segments = re.split(
+        rf"[\n;|,]|(?<!\.m)\.\s+|(?:(?<=[ap]m)|(?<=[ap]\.m\.))\s+(?={_DAY_START})", _normalize(text)
+    )
+    schedule: dict[int, list] = {}
+    closed, pending = set(), []
+    default = None  # a time range with no days applies to days not listed
+    for segment in segments:
+        days = _days(segment)
+        if re.search(r"\bclosed\b", segment):
+            closed.update(days or [])
+            continue
+        spans = [(0, DAY)] if _ALL_DAY.search(segment) else [
+            # A bare "1-2" is a lot number, not a time
+            _span(m) for m in _RANGE.finditer(segment) if any(m.group(i) for i in (2, 3, 5, 6))
+        ]
+        spans = [s for s in spans if s[0] < DAY and s[1] - s[0] <= DAY]
+        if not spans:
+            # "Monday, Tuesday: 9am - 5pm": days listed ahead of their hours
+            pending += days or []
+            continue
+        if pending:
+            days, pending = sorted(set(days or []) | set(pending)), []
+        if days is None:
+            default = spans
+        else:
+            for d in days:
+                schedule.setdefault(d, []).extend(spans)
+    if default:
+        for d in range(7):
+            schedule.setdefault(d, list(default))
+    for d in closed:
+        schedule.pop(d, None)
+
+    intervals = []
+    for d, spans in schedule.items():
+        for start, end in spans:
+            start, end = d * DAY + start, d * DAY + end
+            if end > WEEK:
+                intervals += [(start, WEEK), (0, end - WEEK)]
+            else:
+                intervals.append((start, end))
+    return sorted(intervals)
+
+
+def extract_hours(page: str):
+    """
+    Intervals from an outlet detail page: the lines of visible text that
+    hold a time range and mention days or hours (on the line or the one
+    before it, for a heading such as "Opening Hours").
+    """
+    page = re.sub(r"(?is)<(script|style|noscript)\b.*?</\1>", " ", page)
+    text = htmllib.unescape(re.sub(r"(?s)<[^>]+>", "\n", page))
+    lines = [re.sub(r"\s+", " ", _normalize(line)).strip() for line in text.splitlines()]
+    lines = [line for line in lines if line]
+    picked = []
+    for i, line in enumerate(lines):
+        context = line + " " + (lines[i - 1] if i else "")
+        if (_RANGE.search(line) or _ALL_DAY.search(line)) and re.search(
+            rf"\b(hours?|hrs|open|opening|operating|business|daily|every\s*day|weekdays?|weekends?|closed|{_DAY})", context
+        ):
+            picked.append(line)
+    return parse_hours("\n".join(picked)) if picked else []
+
+
+# ---------------------------------------------------------
+# Formatting and metadata encoding
+# ---------------------------------------------------------
+def _clock(minutes: int):
+    h, m = divmod(minutes % DAY, 60)
+    return f"{(h % 12) or 12}:{m:02d} {'AM' if h < 12 else 'PM'}"
+
+
+def format_hours(intervals):
+    """Readable weekly hours, e.g. ``Mon-Fri 8:00 AM-10:00 PM; Sat-Sun 9:00 AM-11:00 PM``."""
+    if not intervals:
+        return "Not available"
+    # Re-join spans split at the week boundary, then group days with equal hours
+    by_day: dict[int, list] = {d: [] for d in range(7)}
+    for start, end in intervals:
+        if start == 0 and any(e == WEEK for _, e in intervals) and end < DAY:
+            continue
+        if end == WEEK and any(s == 0 and e < DAY for s, e in intervals):
+            end = WEEK + next(e for s, e in intervals if s == 0 and e < DAY)
+        day = start // DAY
+        by_day[day].append((start - day * DAY, end - day * DAY))
+    labels = []
+    for d in range(7):
+        spans = by_day[d]
+        if not spans:
+            labels.append("Closed")
+        elif spans == [(0, DAY)]:
+            labels.append("Open 24 hours")
+        else:
+            labels.append(", ".join(f"{_clock(s)}-{_clock(e)}" for s, e in spans))
+    if len(set(labels)) == 1:
+        return labels[0] if labels[0] == "Open 24 hours" else f"Daily {labels[0]}"
+    parts, d = [], 0
+    while d < 7:
+        e = d
+        while e + 1 < 7 and labels[e + 1] == labels[d]:
+            e += 1
+        days = DAY_NAMES[d][:3] if d == e else f"{DAY_NAMES[d][:3]}-{DAY_NAMES[e][:3]}"
+        parts.append(f"{days} {labels[d]}")
+        d = e + 1
+    return "; ".join(parts)
+
+
+def encode(intervals):
+    return [f"{s}-{e}" for s, e in intervals]
+
+
+def decode(values):
+    out = []
+    for v in values or []:
+        start, _, end = str(v).partition("-")
+        out.append((int(start), int(end)))
+    return out
+
+
+# ---------------------------------------------------------
+# Time questions
+# ---------------------------------------------------------
+@dataclass
+class TimeQuery:
+    minute: int | None  # minute of the week asked about; None for "24 hours"
+    label: str
+
+
+def now_minute(now: datetime | None = None):
+    now = now or datetime.now(OUTLET_TZ)
+    return now.weekday() * DAY + now.hour * 60 + now.minute
+
+
+def parse_time_query(query: str, now: datetime | None = None):
+    """The moment an outlet question asks about, or None when it asks about none."""
+    q = query.lower()
+    now = now or datetime.now(OUTLET_TZ)
+    if _ALL_DAY.search(q):
+        return TimeQuery(None, "open 24 hours")
+
+    day, day_label = now.weekday(), "today"
+    if re.search(r"\btomorrow\b", q):
+        day, day_label = (now + timedelta(days=1)).weekday(), "tomorrow"
+    elif m := re.search(rf"\b(?:on\s+)?{_DAY}", q):
+        day = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"].index(m.group(1))
+        day_label = f"on {DAY_NAMES[day]}"
+
+    if re.search(r"\b(open now|opened now|right now|currently open|open at the moment|still open)\b", q):
+        return TimeQuery(now_minute(now), f"now ({DAY_NAMES[now.weekday()]} {_clock(now.hour * 60 + now.minute)})")
+    if m := re.search(rf"\b(?:at|by|around|until|till|after|before)\s+{_TIME}", q):
+        if m.group(3) or m.group(2) or int(m.group(1)) > 12:
+            minutes = _minutes(m.group(1), m.group(2), m.group(3))
+            if re.search(r"\b(until|till|before)\s", m.group(0)):
+                minutes -= 1  # open until 11pm: still open at 10:59
+            minutes %= DAY
+            return TimeQuery(day * DAY + minutes, f"at {_clock(minutes)} {day_label}")
+    if re.search(r"\b(late|tonight|late night|midnight supper)\b", q):
+        return TimeQuery(day * DAY + LATE_HOUR * 60, f"late ({_clock(LATE_HOUR * 60)}) {day_label}")
+    if re.search(r"\b(early|breakfast|morning)\b", q):
+        return TimeQuery(day * DAY + EARLY_HOUR * 60, f"early ({_clock(EARLY_HOUR * 60)}) {day_label}")
+    if re.search(r"\b(open|opened)\b", q) and day_label != "today":
+        return TimeQuery(day * DAY + 12 * 60, f"{day_label}")
+    return None
+
+
+# ---------------------------------------------------------
+# Table
+# ---------------------------------------------------------
+class HoursTable:
+    """Weekly opening intervals of every outlet, as flat arrays."""
+
+    def __init__(self, metadata: list[dict]):
+        import numpy as np
+
+        self.metadata = metadata
+        self.places = Partitions(metadata, localities_of)
+        outlet, start, end = [], [], []
+        for row, m in enumerate(metadata):
+            for s, e in decode(m.get("opening_intervals")):
+                outlet.append(row)
+                start.append(s)
+                end.append(e)
+        self.outlet = np.array(outlet, dtype=np.int32)
+        self.start = np.array(start, dtype=np.int16)
+        self.end = np.array(end, dtype=np.int16)
+        self.known = np.bincount(self.outlet, minlength=len(metadata)) > 0
+        # Outlets open around the clock: seven days' worth of open minutes
+        self.all_day = np.bincount(self.outlet, weights=(self.end - self.start).astype(np.int32),
+                                   minlength=len(metadata)) >= WEEK
+
+    def __len__(self):
+        return len(self.metadata)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.outlet, self.start, self.end, self.known, self.all_day))
+
+    def open_at(self, minute: int):
+        """Mask of outlets open at ``minute`` of the week."""
+        import numpy as np
+
+        hit = (self.start <= minute) & (minute < self.end)
+        return np.bincount(self.outlet[hit], minlength=len(self)) > 0
+
+    def answer(self, query: str, cities=(), now: datetime | None = None, limit: int | None = None):
+        """
+        A ``query_outlets``-shaped response listing the outlets open at the
+        time the question asks about (in the detected cities, matched on
+        each outlet's localities), or None when it asks about no time or
+        no outlet has known hours.
+        """
+        import numpy as np
+
+        asked = parse_time_query(query, now)
+        if asked is None or not self.known.any():
+            return None
+        mask = self.all_day if asked.minute is None else self.open_at(asked.minute)
+        scope = self.places.mask(cities) if cities else np.ones(len(self), dtype=bool)
+        rows = np.flatnonzero(mask & scope)
+        unknown = int((scope & ~self.known).sum())
+
+        where = f" in {', '.join(cities)}" if cities else ""
+        state = asked.label if asked.minute is None else f"open {asked.label}"
+        response = f"{len(rows)} outlet{'' if len(rows) == 1 else 's'}{where} {'is' if len(rows) == 1 else 'are'} {state}."
+        if unknown:
+            response += f" Opening hours are not listed for {unknown} other outlet{'' if unknown == 1 else 's'}."
+        return {
+            "query": query,
+            "response": response,
+            "matches_found": int(len(rows)),
+            "cities_detected": list(cities),
+            "outlets": [
+                {
+                    "name": self.metadata[r]["name"],
+                    "address": self.metadata[r]["address"],
+                    "city": self.metadata[r].get("city"),
+                    "hours": self.metadata[r].get("hours", "Not available"),
+                }
+                for r in rows[:limit]
+            ],
+        }
@@ -0,0 +1,52 @@
+import asyncio
+import functools
+import threading
+
+
+class Once:
+    """
+    Runs a zero-argument initializer at most once and caches its result.
+
+    ``get()`` is safe to call from any thread. ``await aget()`` runs the
+    initializer in a worker thread, so a first call doing network I/O never
+    blocks the event loop; concurrent awaiters all wait on the same run. A
+    failed initializer is not cached and is retried on the next call.
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+        self._lock = threading.Lock()
+        self._done = False
+        self._value = None
+        functools.update_wrapper(self, fn)
+
+    def __call__(self):
+        return self.get()
+
+    def get(self):
+        if self._done:
+            return self._value
+        with self._lock:
+            if not self._done:
+                self._value = self.fn()
+                self._done = True
+        return self._value
+
+    async def aget(self):
+        if self._done:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+    @property
+    def initialized(self):
+        return self._done
+
+    def reset(self):
+        with self._lock:
+            self._done = False
+            self._value = None
+
+
+def once(fn):
+    """Decorator form of :class:`Once`."""
+    return Once(fn)
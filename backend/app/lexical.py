@@ -0,0 +1,322 @@
+"""
+In-process BM25 search over product and outlet texts, fused with vector
+results by reciprocal-rank fusion.
+
+A ``LexicalIndex`` is immutable and array-backed: postings are stored
+CSR-style (one ``offsets`` array into flat doc-id and impact arrays), with
+each posting's BM25 contribution precomputed, so a query is a few slices,
+one ``bincount`` and an ``argpartition``. Each hit also carries its
+``coverage``, the share of the query's IDF mass the document matches. When
+hits cover at least ``LEXICAL_CONFIDENCE`` of a query (an exact product or
+outlet name), the caller can skip the embedding and the vector query.
+
+An index can also be partitioned (by outlet locality, say): searches
+scoped to some partitions only consider their documents, and partitions
+live inside the index, so they are always swapped together with it.
+
+Indexes are rebuilt from the records of each successful ingest. A process
+that did not ingest (other workers, a separate ingest job) loads one in
+the background from the vector index's metadata on first use, and serves
+vector-only results until it is ready. Every ``LEXICAL_REFRESH_S`` it
+reloads the metadata in the background and rebuilds only if the documents'
+fingerprint changed, so a corpus re-ingested elsewhere reaches every process.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from collections import Counter
+
+from app import metrics
+
+logger = logging.getLogger("Lexical")
+
+LEXICAL_SEARCH = os.getenv("LEXICAL_SEARCH", "true").lower() in ("1", "true", "yes")
+# Share of a query's IDF mass a hit must match to skip the vector search
+LEXICAL_CONFIDENCE = float(os.getenv("LEXICAL_CONFIDENCE", "0.9"))
+# ...and the least IDF it must match, so terms in most documents never decide alone
+LEXICAL_MIN_IDF = 1.0
+RRF_K = 60
+LOAD_RETRY_S = 60.0
+# How often a loaded index checks the vector index for a re-ingested corpus (0 = never)
+LEXICAL_REFRESH_S = float(os.getenv("LEXICAL_REFRESH_S", "300"))
+FETCH_BATCH = 100
+
+LOOKUPS = metrics.Counter(
+    "lexical_lookups_total", "Searches by how they were answered (catalog, hours, geo, short_circuit, fused, vector).",
+    ("corpus", "outcome"),
+)
+
+# Question words and filler that name no product or outlet
+STOPWORDS = frozenset("""
+a about all an and any are as at available be can do does for from get have how i in is it me my near
+nearest of on or please show tell the there to what when where which who with you your
+find list outlet outlets store stores branch branches shop shops location locations product products
+price prices much many cost hours opening open close closing time
+""".split())
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str):
+    """Lowercase ASCII word tokens; accents folded, punctuation dropped."""
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("ascii")
+    return _TOKEN.findall(text.lower())
+
+
+def _matches(metadata: dict, filter: dict):
+    """Pinecone-style metadata filter (plain values, ``$eq`` and ``$in``, which matches any element of a list)."""
+    for key, cond in filter.items():
+        value = metadata.get(key)
+        if not isinstance(cond, dict):
+            ok = value == cond
+        elif "$eq" in cond:
+            ok = value == cond["$eq"]
+        elif "$in" in cond:
+            ok = any(v in cond["$in"] for v in value) if isinstance(value, list) else value in cond["$in"]
+        else:
+            ok = True
+        if not ok:
+            return False
+    return True
+
+
+class Partitions:
+    """Positions of the rows under each key of ``key_fn(metadata)`` (a list of keys, matched case-insensitively)."""
+
+    def __init__(self, metadata: list[dict], key_fn):
+        import numpy as np
+
+        self.size = len(metadata)
+        groups: dict[str, list[int]] = {}
+        for row, m in enumerate(metadata):
+            for key in dict.fromkeys(k.lower() for k in key_fn(m)):
+                groups.setdefault(key, []).append(row)
+        self.rows = {key: np.asarray(rows, dtype=np.int32) for key, rows in groups.items()}
+
+    def __len__(self):
+        return len(self.rows)
+
+    def of(self, keys):
+        """Sorted positions of the rows under any of ``keys``."""
+        import numpy as np
+
+        parts = [self.rows[k.lower()] for k in keys if k.lower() in self.rows]
+        return np.unique(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int32)
+
+    def mask(self, keys):
+        import numpy as np
+
+        mask = np.zeros(self.size, dtype=bool)
+        mask[self.of(keys)] = True
+        return mask
+
+
+class LexicalIndex:
+    """
+    BM25 (``k1``, ``b``) over ``(id, text, metadata)`` documents, optionally
+    partitioned by ``partition_by(metadata)``.
+    """
+
+    def __init__(self, docs, k1: float = 1.2, b: float = 0.75, partition_by=None):
+        import numpy as np
+
+        self.ids, self.metadata = [], []
+        vocab: dict[str, int] = {}
+        term_ids, doc_ids, tfs, lengths = [], [], [], []
+        for d, (doc_id, text, metadata) in enumerate(docs):
+            self.ids.append(doc_id)
+            self.metadata.append(metadata)
+            counts = Counter(tokenize(text))
+            lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(d)
+                tfs.append(tf)
+
+        self.vocab = vocab
+        n = len(self.ids)
+        term_ids = np.asarray(term_ids, dtype=np.int32)
+        order = np.argsort(term_ids, kind="stable")
+        self.df = np.bincount(term_ids, minlength=len(vocab)).astype(np.int32)
+        self.offsets = np.concatenate(([0], np.cumsum(self.df))).astype(np.int64)
+        self.doc_ids = np.asarray(doc_ids, dtype=np.int32)[order]
+
+        self.idf = np.log1p((n - self.df + 0.5) / (self.df + 0.5)).astype(np.float32)
+        # IDF a term missing from every document would have
+        self.unknown_idf = math.log1p((n + 0.5) / 0.5)
+        lengths = np.asarray(lengths, dtype=np.float32)
+        tf = np.asarray(tfs, dtype=np.float32)[order]
+        norm = k1 * (1 - b + b * lengths[self.doc_ids] / max(float(lengths.mean()) if n else 1.0, 1.0))
+        self.impacts = (self.idf[term_ids[order]] * tf * (k1 + 1) / (tf + norm)).astype(np.float32)
+        self.partitions = Partitions(self.metadata, partition_by) if partition_by else None
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.df, self.offsets, self.doc_ids, self.idf, self.impacts))
+
+    def search(self, query: str, top_k: int = 10, filter: dict | None = None, partitions=None):
+        """
+        Best ``top_k`` documents as Pinecone-style matches (``id``,
+        ``score``, ``metadata``) plus their ``coverage`` of the query,
+        among the documents of ``partitions`` when given.
+        """
+        import numpy as np
+
+        terms = [t for t in dict.fromkeys(tokenize(query)) if t not in STOPWORDS]
+        known = np.array([self.vocab[t] for t in terms if t in self.vocab], dtype=np.int64)
+        if not len(known):
+            return []
+        total_idf = float(self.idf[known].sum()) + self.unknown_idf * (len(terms) - len(known))
+
+        slices = [slice(self.offsets[t], self.offsets[t + 1]) for t in known]
+        docs = np.concatenate([self.doc_ids[s] for s in slices])
+        scores = np.bincount(docs, weights=np.concatenate([self.impacts[s] for s in slices]), minlength=len(self))
+        matched = np.bincount(docs, weights=np.repeat(self.idf[known], self.df[known]), minlength=len(self))
+
+        candidates = np.unique(docs)
+        if partitions is not None and self.partitions is not None:
+            candidates = np.intersect1d(candidates, self.partitions.of(partitions), assume_unique=True)
+        if filter:
+            candidates = candidates[[_matches(self.metadata[d], filter) for d in candidates]]
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        return [
+            {
+                "id": self.ids[d],
+                "score": float(scores[d]),
+                "metadata": self.metadata[d],
+                "coverage": float(matched[d] / total_idf),
+                "matched_idf": float(matched[d]),
+            }
+            for d in candidates
+        ]
+
+
+def confident(hits: list, threshold: float = LEXICAL_CONFIDENCE):
+    """Hits that match (nearly) the whole query, best first."""
+    return [h for h in hits if h["coverage"] >= threshold and h["matched_idf"] >= LEXICAL_MIN_IDF]
+
+
+def rrf(*rankings, k: int = RRF_K, top_k: int | None = None):
+    """
+    Reciprocal-rank fusion of ranked match lists: each match scores
+    ``1 / (k + rank)`` per list it appears in. Matches only need ``id``
+    and ``metadata`` (Pinecone matches or lexical hits).
+    """
+    scores, metadata = {}, {}
+    for ranking in rankings:
+        for rank, m in enumerate(ranking, start=1):
+            scores[m["id"]] = scores.get(m["id"], 0.0) + 1.0 / (k + rank)
+            metadata.setdefault(m["id"], m["metadata"])
+    fused = sorted(scores, key=scores.get, reverse=True)[:top_k]
+    return [{"id": i, "score": scores[i], "metadata": metadata[i]} for i in fused]
+
+
+def index_namespaces(index):
+    """Namespaces of ``index`` that hold vectors (the default one is "")."""
+    stats = index.describe_index_stats()
+    return list(stats.get("namespaces", {}) or {}) or [""]
+
+
+def load_docs(index, prefix: str, namespace: str | None = None, batch: int = FETCH_BATCH):
+    """``(id, text, metadata)`` of every vector under ``prefix``, from its stored metadata."""
+    where = {} if namespace is None else {"namespace": namespace}
+    ids = [i for page in index.list(prefix=prefix, **where) for i in page]
+    docs = []
+    for start in range(0, len(ids), batch):
+        response = index.fetch(ids=ids[start:start + batch], **where)
+        vectors = response.vectors if hasattr(response, "vectors") else response["vectors"]
+        for vector_id, vector in vectors.items():
+            metadata = vector.metadata if hasattr(vector, "metadata") else vector.get("metadata")
+            if metadata and metadata.get("text"):
+                docs.append((vector_id, metadata["text"], dict(metadata)))
+    return docs
+
+
+def fingerprint(docs):
+    """Digest of ``(id, text, metadata)`` documents, independent of their order."""
+    digest = hashlib.blake2b(digest_size=16)
+    for doc_id, _, metadata in sorted(docs, key=lambda d: d[0]):
+        digest.update(doc_id.encode("utf-8"))
+        digest.update(json.dumps(metadata, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+class LexicalCorpus:
+    """
+    The current ``LexicalIndex`` of one corpus, swapped whole on refresh.
+    ``on_replace`` is called with the same documents, for stores derived
+    from them (e.g. app.catalog); ``partition_by`` partitions the index.
+    A ``sharded`` corpus is loaded from every namespace of the vector index.
+    """
+
+    def __init__(self, name: str, prefix: str, on_replace=None, partition_by=None, sharded: bool = False):
+        self.name = name
+        self.prefix = prefix
+        self.on_replace = on_replace
+        self.partition_by = partition_by
+        self.sharded = sharded
+        self.index: LexicalIndex | None = None
+        self.version: str | None = None
+        self._loading: asyncio.Task | None = None
+        self._retry_at = 0.0
+        self._checked_at = 0.0
+
+    def replace(self, docs):
+        index = LexicalIndex(docs, partition_by=self.partition_by)
+        self.index, self.version = index, fingerprint(docs)
+        self._checked_at = time.monotonic()
+        if self.on_replace:
+            self.on_replace(docs)
+        logger.info(f"🔤 {self.name} lexical index: {len(index)} docs, {len(index.vocab)} terms, "
+                    + (f"{len(index.partitions)} partitions, " if index.partitions else "")
+                    + f"{index.nbytes / 1024:.0f} KiB")
+        return index
+
+    def current(self, vector_index):
+        """
+        The lexical index, or None while one is loaded in the background
+        from ``vector_index`` (or when lexical search is disabled; derived
+        stores are loaded either way). A loaded index is re-checked against
+        ``vector_index`` every ``LEXICAL_REFRESH_S``.
+        """
+        now = time.monotonic()
+        due = self.index is None or (LEXICAL_REFRESH_S > 0 and now - self._checked_at >= LEXICAL_REFRESH_S)
+        if due and (self._loading is None or self._loading.done()) and now >= self._retry_at:
+            self._checked_at = now
+            self._loading = asyncio.create_task(self._load(vector_index), name=f"lexical-{self.name}")
+        return self.index if LEXICAL_SEARCH else None
+
+    async def _load(self, vector_index):
+        seen = self.version
+        try:
+            if self.sharded:
+                namespaces = await asyncio.to_thread(index_namespaces, vector_index)
+                loaded = await asyncio.gather(*(
+                    asyncio.to_thread(load_docs, vector_index, self.prefix, namespace) for namespace in namespaces
+                ))
+                docs = [doc for shard in loaded for doc in shard]
+            else:
+                docs = await asyncio.to_thread(load_docs, vector_index, self.prefix)
+            if not docs:
+                raise RuntimeError("no documents with text metadata")
+            await asyncio.to_thread(self._refresh, docs, seen)
+        except Exception as e:
+            self._retry_at = time.monotonic() + LOAD_RETRY_S
+            fallback = "keeping the current index" if self.index is not None else "vector search only for now"
+            logger.warning(f"⚠️ Could not load {self.name} lexical index ({e}); {fallback}")
+
+    def _refresh(self, docs, seen):
+        """Rebuild from ``docs`` if they changed, unless an ingest replaced the index since ``seen``."""
+        if self.version == seen and fingerprint(docs) != seen:
+            self.replace(docs)
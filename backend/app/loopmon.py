@@ -0,0 +1,148 @@
+"""
+Event-loop lag heartbeat and blocking-call detector.
+
+A task sleeps ``LOOP_LAG_INTERVAL_S`` and measures how late it wakes up:
+anything beyond the interval is time the loop spent running something else
+without yielding. Lag goes to the ``event_loop_lag_seconds`` histogram.
+
+With ``LOOP_MONITOR`` on, the heartbeat ticks faster and a watchdog thread
+checks it: once the loop has missed its beat by ``LOOP_BLOCK_THRESHOLD_S``
+the watchdog captures the loop thread's stack. When the loop recovers the
+block is logged with that stack and its full duration, and counted by call
+site (the innermost frame in backend code, so a sync SDK call is reported
+where the app made it). Offenders are in ``event_loop_blocks_total``,
+``event_loop_block_seconds`` and ``/debug/loop``.
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+
+from app import metrics
+
+logger = logging.getLogger("LoopMonitor")
+
+LOOP_LAG_INTERVAL_S = float(os.getenv("LOOP_LAG_INTERVAL_S", "0.5"))
+LOOP_MONITOR = os.getenv("LOOP_MONITOR", "false").lower() in ("1", "true", "yes")
+LOOP_BLOCK_THRESHOLD_S = float(os.getenv("LOOP_BLOCK_THRESHOLD_S", "0.1"))
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Wrappers every external call passes through; the caller is the offender
+PASS_THROUGH = {
+    os.path.join(BACKEND_DIR, "app", name)
+    for name in ("clients.py", "embeddings.py", "lazy.py", "loopmon.py", "metrics.py", "ratelimit.py", "timing.py")
+}
+
+BLOCKS = metrics.Counter("event_loop_blocks_total", "Event-loop blocks over the threshold by call site.", ("site",))
+BLOCK_SECONDS = metrics.Histogram(
+    "event_loop_block_seconds", "Duration of event-loop blocks by call site.", ("site",),
+    buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+
+
+def call_site(frame):
+    """``file:line in function`` of the innermost app frame (else the innermost)."""
+    innermost = frame
+    while frame is not None:
+        path = frame.f_code.co_filename
+        if path.startswith(BACKEND_DIR) and "site-packages" not in path and path not in PASS_THROUGH:
+            break
+        frame = frame.f_back
+    frame = frame or innermost
+    path = frame.f_code.co_filename
+    if path.startswith(BACKEND_DIR):
+        path = os.path.relpath(path, BACKEND_DIR)
+    return f"{path}:{frame.f_lineno} in {frame.f_code.co_name}"
+
+
+class LoopMonitor:
+    def __init__(self, interval: float = LOOP_LAG_INTERVAL_S, watchdog: bool = LOOP_MONITOR,
+                 threshold: float = LOOP_BLOCK_THRESHOLD_S):
+        self.watchdog = watchdog
+        self.threshold = threshold
+        # Beat often enough that a block is caught close to the threshold
+        self.interval = min(interval, threshold / 2) if watchdog else interval
+        self.last_lag = 0.0
+        self.offenders: dict[str, dict] = {}
+        self._task: asyncio.Task | None = None
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._beat = 0.0
+        self._loop_thread = None
+        self._capture = None  # (site, stack) of the block in progress
+
+    @property
+    def running(self):
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        if self.running:
+            return
+        self._beat = time.monotonic()
+        self._loop_thread = threading.get_ident()
+        self._task = asyncio.create_task(self._heartbeat())
+        if self.watchdog:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+            self._thread.start()
+            logger.info(f"🐕 Loop watchdog on (threshold {self.threshold * 1000:.0f}ms)")
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def snapshot(self):
+        return {
+            "watchdog": self.watchdog,
+            "threshold_s": self.threshold,
+            "last_lag_s": round(self.last_lag, 4),
+            "offenders": dict(sorted(self.offenders.items(), key=lambda kv: -kv[1]["total_s"])),
+        }
+
+    async def _heartbeat(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            t0 = loop.time()
+            await asyncio.sleep(self.interval)
+            self.last_lag = max(0.0, loop.time() - t0 - self.interval)
+            self._beat = time.monotonic()
+            metrics.LOOP_LAG.observe(self.last_lag)
+            capture, self._capture = self._capture, None
+            if capture is not None:
+                self._report(*capture, self.last_lag)
+
+    def _watch(self):
+        while not self._stop.wait(self.threshold / 4):
+            late = time.monotonic() - self._beat - self.interval
+            if late < self.threshold or self._capture is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread)
+            if frame is None:
+                continue
+            # Re-check: the loop may have beaten while we looked
+            if time.monotonic() - self._beat - self.interval >= self.threshold:
+                self._capture = (call_site(frame), "".join(traceback.format_stack(frame)))
+
+    def _report(self, site: str, stack: str, blocked: float):
+        stats = self.offenders.setdefault(site, {"count": 0, "total_s": 0.0, "max_s": 0.0})
+        stats["count"] += 1
+        stats["total_s"] = round(stats["total_s"] + blocked, 4)
+        stats["max_s"] = round(max(stats["max_s"], blocked), 4)
+        BLOCKS.inc(site)
+        BLOCK_SECONDS.observe(blocked, site)
+        logger.warning(f"🐢 Event loop blocked {blocked * 1000:.0f}ms at {site}\n{stack}")
+
+
+monitor = LoopMonitor()
@@ -1,4 +1,6 @@
 from typing import Dict, Any
+import os
+import threading
 import time
 
 class ConversationMemory:
@@ -15,5 +17,71 @@ class ConversationMemory:
     def get_history(self, session_id: str, max_turns: int = 10):
         return self._mem.get(session_id, [])[-max_turns:]
 
+    def stats(self):
+        return {"sessions": len(self._mem), "turns": sum(len(t) for t in list(self._mem.values()))}
+
+    def reset(self, session_id: str):
+        self._mem[session_id] = []
+
+
+class SqliteConversationMemory:
+    """
+    ConversationMemory kept in one SQLite file, so every worker process on
+    the host sees the same sessions. WAL mode lets readers run alongside the
+    single writer; on tmpfs (SHARED_DIR) a call takes tens of microseconds.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self._conn = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _db(self):
+        # Connections must not cross fork(): open one per process on first use
+        if self._pid != os.getpid():
+            import sqlite3
+
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=5.0, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS turns ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL, "
+                "role TEXT NOT NULL, text TEXT NOT NULL, timestamp REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS turns_session ON turns (session_id, id)")
+            self._conn, self._pid = conn, os.getpid()
+        return self._conn
+
+    def add_turn(self, session_id: str, role: str, text: str):
+        with self._lock:
+            self._db().execute(
+                "INSERT INTO turns (session_id, role, text, timestamp) VALUES (?, ?, ?, ?)",
+                (session_id, role, text, time.time()),
+            )
+
+    def get_history(self, session_id: str, max_turns: int = 10):
+        with self._lock:
+            rows = self._db().execute(
+                "SELECT role, text, timestamp FROM turns WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+                (session_id, max_turns),
+            ).fetchall()
+        return [{"role": role, "text": text, "timestamp": ts} for role, text, ts in reversed(rows)]
+
+    def stats(self):
+        with self._lock:
+            sessions, turns = self._db().execute(
+                "SELECT COUNT(DISTINCT session_id), COUNT(*) FROM turns"
+            ).fetchone()
+        return {"sessions": sessions, "turns": turns}
+
     def reset(self, session_id: str):
-        self._mem[session_id] = []
\ No newline at end of file
+        with self._lock:
+            self._db().execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+
+
+def create_memory():
+    """Shared SQLite memory when SESSION_DB is set (serve.py sets it for >1 worker)."""
+    path = os.getenv("SESSION_DB")
+    return SqliteConversationMemory(path) if path else ConversationMemory()
@@ -0,0 +1,238 @@
+"""
+Prometheus metrics, served as text at ``/metrics``.
+
+Recording is lock-free on the hot path: each metric keeps one accumulator
+per thread (a plain dict keyed by label values) and a thread only ever
+writes its own. The metric's lock is taken once per thread, to register
+that thread's accumulator, and by the scrape, which sums them. Stage and
+per-route latencies come from the ``app.timing`` histograms; gauges whose
+value lives elsewhere (session memory, corpus state) are read at scrape
+time through callbacks.
+
+Every serve.py worker keeps its own registry, so scrape each pod's workers
+as separate targets or aggregate with ``sum without (instance)``.
+"""
+import bisect
+import threading
+
+# Seconds; covers a sub-ms calc reply up to a slow LLM completion
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry: list = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values, extra: str = ""):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(v):
+    if v == float("inf"):
+        return "+Inf"
+    return repr(float(v)) if isinstance(v, float) else str(v)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: tuple = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._local = threading.local()
+        self._shards: list[dict] = []
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _shard(self):
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _merged(self):
+        with self._lock:
+            shards = list(self._shards)
+        # list() of a dict is one C call, so it never sees a half-applied write
+        return [item for shard in shards for item in list(shard.items())]
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonic total: ``requests.inc("chat", "ok")``."""
+
+    kind = "counter"
+
+    def inc(self, *labels, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def collect(self):
+        totals: dict = {}
+        for key, value in self._merged():
+            totals[key] = totals.get(key, 0) + value
+        return self._header() + [
+            f"{self.name}{_labels(self.labelnames, key)} {_number(value)}" for key, value in sorted(totals.items())
+        ]
+
+
+class Gauge(Counter):
+    """
+    Up/down value. Recorded gauges (``inc``/``dec``) sum across threads, so
+    an in-flight count works from any thread; ``fn`` instead reads the value
+    at scrape time and returns a number or a ``{label values: number}`` dict.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), fn=None):
+        super().__init__(name, help, labels)
+        self.fn = fn
+
+    def dec(self, *labels, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    def collect(self):
+        if self.fn is None:
+            return super().collect()
+        value = self.fn()
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        return self._header() + [
+            f"{self.name}{_labels(self.labelnames, key if isinstance(key, tuple) else (key,))} {_number(v)}"
+            for key, v in values
+        ]
+
+
+class Histogram(_Metric):
+    """Fixed-bucket histogram: ``latency.observe(0.12, "products")``."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: tuple = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels):
+        shard = self._shard()
+        acc = shard.get(labels)
+        if acc is None:
+            # One count per bucket plus +Inf, then the running sum
+            acc = shard[labels] = [0] * (len(self.buckets) + 2)
+        acc[bisect.bisect_left(self.buckets, value)] += 1
+        acc[-1] += value
+
+    def collect(self):
+        totals: dict = {}
+        for key, acc in self._merged():
+            total = totals.setdefault(key, [0] * len(acc))
+            for i, v in enumerate(acc):
+                total[i] += v
+        lines = self._header()
+        for key, acc in sorted(totals.items()):
+            lines += _histogram_lines(self.name, self.labelnames, key, self.buckets, acc[:-1], acc[-1])
+        return lines
+
+
+def _histogram_lines(name, labelnames, key, bounds, counts, total):
+    lines, seen = [], 0
+    for bound, count in zip(list(bounds) + [float("inf")], counts):
+        seen += count
+        le = 'le="%s"' % _number(float(bound))
+        lines.append(f"{name}_bucket{_labels(labelnames, key, le)} {seen}")
+    lines.append(f"{name}_sum{_labels(labelnames, key)} {_number(float(total))}")
+    lines.append(f"{name}_count{_labels(labelnames, key)} {seen}")
+    return lines
+
+
+# ---------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled.")
+HTTP_REQUESTS = Counter("http_requests_total", "HTTP responses by route and status.", ("route", "status"))
+CHAT_SECONDS = Histogram("chat_request_duration_seconds", "Chat request latency by detected intent.", ("intent",))
+
+OPENAI_SECONDS = Histogram("openai_request_duration_seconds", "OpenAI call latency.", ("op",))
+OPENAI_REQUESTS = Counter("openai_requests_total", "OpenAI calls by outcome (ok, throttled, error).", ("op", "outcome"))
+OPENAI_TOKENS = Counter("openai_tokens_total", "Tokens reported by OpenAI responses.", ("op", "kind"))
+
+PINECONE_SECONDS = Histogram("pinecone_request_duration_seconds", "Pinecone call latency.", ("index", "op"))
+PINECONE_REQUESTS = Counter("pinecone_requests_total", "Pinecone calls by outcome (ok, error).", ("index", "op", "outcome"))
+
+LOOP_LAG = Histogram(
+    "event_loop_lag_seconds", "Delay of the event-loop heartbeat past its schedule.",
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+
+INGEST_VECTORS = Counter("ingest_vectors_total", "Vectors written or kept by successful ingests.", ("corpus",))
+INGEST_RUNS = Counter("ingest_runs_total", "Ingest runs by outcome (ok, error).", ("corpus", "outcome"))
+INGEST_SECONDS = Histogram(
+    "ingest_duration_seconds", "Ingest run duration.", ("corpus",),
+    buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600),
+)
+
+CACHE_LOOKUPS = Counter("cache_lookups_total", "Cache lookups by cache and where the value came from.", ("cache", "result"))
+
+
+def observe_usage(op: str, result):
+    """Count tokens from an OpenAI SDK response or a LangChain message."""
+    usage = getattr(result, "usage", None)
+    if usage is not None:
+        prompt = getattr(usage, "prompt_tokens", 0) or 0
+        completion = getattr(usage, "completion_tokens", 0) or 0
+    else:
+        usage = getattr(result, "usage_metadata", None) or {}
+        prompt = usage.get("input_tokens", 0)
+        completion = usage.get("output_tokens", 0)
+    if prompt:
+        OPENAI_TOKENS.inc(op, "prompt", amount=prompt)
+    if completion:
+        OPENAI_TOKENS.inc(op, "completion", amount=completion)
+
+
+# ---------------------------------------------------------
+# Exposition
+# ---------------------------------------------------------
+def _timing_lines():
+    """Per-route and per-stage latency from the app.timing histograms."""
+    from app import timing
+
+    routes, stages = [], []
+    for name, h in sorted(timing._histograms.items()):
+        bounds_ns = [b * 1e9 for b in LATENCY_BUCKETS]
+        counts = h.bucket_counts(bounds_ns)
+        if name.startswith("http "):
+            routes += _histogram_lines("http_request_duration_seconds", ("route",), (name[5:],),
+                                       LATENCY_BUCKETS, counts, h.sum / 1e9)
+        else:
+            stages += _histogram_lines("stage_duration_seconds", ("stage",), (name,),
+                                       LATENCY_BUCKETS, counts, h.sum / 1e9)
+    lines = []
+    if routes:
+        lines += ["# HELP http_request_duration_seconds HTTP request latency by route.",
+                  "# TYPE http_request_duration_seconds histogram"] + routes
+    if stages:
+        lines += ["# HELP stage_duration_seconds Latency of timed request stages (see app.timing).",
+                  "# TYPE stage_duration_seconds histogram"] + stages
+    return lines
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        try:
+            lines += metric.collect()
+        except Exception as e:
+            lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+    lines += _timing_lines()
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,248 @@
+"""
+Outlet detail pages: fetched concurrently, revalidated with conditional
+requests, parsed in a process pool.
+
+The RSS feed only carries an outlet's name and address; opening hours, the
+map link and listed services come from its page. ``OutletPageScraper``
+fetches pages on the shared async pool, at most ``OUTLET_DETAIL_WORKERS``
+at once, and keeps what it extracted from each (not the HTML) in a small
+JSON file under ``OUTLET_PAGE_CACHE_DIR`` with the page's ``ETag``,
+``Last-Modified`` and a hash of its body. The next refresh sends
+``If-None-Match`` / ``If-Modified-Since``; a 304, or a 200 with the same
+body, reuses the cached details without parsing, so an unchanged site costs
+one small request per outlet.
+
+``extract_details`` does not build a DOM: pages are ~380 KB of theme markup
+around a few hundred bytes of content, so it finds the post-content widgets
+by string search and runs a handful of regexes over those slices only.
+Parsing runs in a ``ProcessPoolExecutor`` (started on the first page that
+needs it), keeping the event loop and the GIL free for the rest of ingest.
+"""
+import asyncio
+import hashlib
+import html as htmllib
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+
+from app import clients, metrics
+from app.checkpoint import INGEST_CHECKPOINT_DIR
+from app.hours import extract_hours
+
+logger = logging.getLogger("OutletPages")
+
+# Outlet pages fetched at once during ingest
+OUTLET_DETAIL_WORKERS = int(os.getenv("OUTLET_DETAIL_WORKERS", "8"))
+OUTLET_PAGE_CACHE_DIR = os.getenv("OUTLET_PAGE_CACHE_DIR", os.path.join(INGEST_CHECKPOINT_DIR, "outlet-pages"))
+# Pages checked less than this long ago are not requested again (0 = always revalidate)
+OUTLET_PAGE_TTL_S = float(os.getenv("OUTLET_PAGE_TTL_S", "0"))
+# Parser processes (0 parses in a thread instead)
+OUTLET_PARSE_PROCESSES = int(os.getenv("OUTLET_PARSE_PROCESSES", str(min(4, os.cpu_count() or 1))))
+
+PAGES = metrics.Counter(
+    "outlet_pages_total", "Outlet pages by outcome (parsed, not_modified, unchanged, fresh, error).", ("outcome",),
+)
+
+# ---------------------------------------------------------
+# Extraction
+# ---------------------------------------------------------
+_CARD = "elementor-widget-theme-post-content"
+_FOOTER = re.compile(r"<footer\b|elementor-location-footer")
+_TITLE = re.compile(r"""class=["']entry-title["'][^>]*>(.*?)<""", re.S)
+_PARAGRAPH = re.compile(r"<p\b[^>]*>(.*?)</p>", re.S)
+_MAP_LINK = re.compile(
+    r"""href=["'](https?://(?:maps\.app\.goo\.gl|goo\.gl/maps|maps\.google\.[a-z.]+|(?:www\.)?google\.[a-z.]+/maps"""
+    r"""|(?:www\.|ul\.)?waze\.com)[^"']*)""",
+    re.I,
+)
+# "@lat,lon" or "?q=lat,lon" (and ll=, query=, destination=) in a map URL
+_COORDS = re.compile(r"(?:@|[?&](?:q|ll|query|destination)=)(-?\d{1,2}\.\d+)(?:,|%2C)\s*(-?\d{1,3}\.\d+)", re.I)
+SERVICES = {
+    "dine-in": re.compile(r"\bdine[\s-]?in\b"),
+    "takeaway": re.compile(r"\b(take[\s-]?away|pick[\s-]?up)\b"),
+    "delivery": re.compile(r"\bdelivery\b"),
+    "drive-thru": re.compile(r"\bdrive[\s-]?(thru|through)\b"),
+}
+
+
+def _text(fragment: str):
+    return re.sub(r"\s+", " ", htmllib.unescape(re.sub(r"<[^>]+>", " ", fragment))).strip()
+
+
+def _key(name: str):
+    return re.sub(r"[\W_]+", "", htmllib.unescape(name).lower())
+
+
+def _cards(page: str):
+    """Slices of ``page`` holding one outlet each (one on a detail page, a dozen on a listing)."""
+    starts = []
+    at = page.find(_CARD)
+    while at != -1:
+        starts.append(at)
+        # The class name also appears in the widget's data attributes
+        at = page.find(_CARD, page.find(">", at) + 1)
+    if not starts:
+        return [page]
+    footer = _FOOTER.search(page, starts[-1])
+    ends = starts[1:] + [footer.start() if footer else len(page)]
+    return [page[s:e] for s, e in zip(starts, ends)]
+
+
+def _card_details(card: str):
+    title = _TITLE.search(card)
+    paragraph = _PARAGRAPH.search(card)
+    map_link = _MAP_LINK.search(card)
+    map_url = htmllib.unescape(map_link.group(1)) if map_link else ""
+    coords = _COORDS.search(map_url)
+    text = _text(re.sub(r"(?is)<(script|style|noscript)\b.*?</\1>", " ", card)).lower()
+    return {
+        "name": _text(title.group(1)) if title else "",
+        "address": _text(paragraph.group(1)) if paragraph else "",
+        "opening_intervals": extract_hours(card),
+        "map_url": map_url,
+        "lat": float(coords.group(1)) if coords else None,
+        "lon": float(coords.group(2)) if coords else None,
+        "services": [service for service, pattern in SERVICES.items() if pattern.search(text)],
+    }
+
+
+def extract_outlets(page: str):
+    """Details of every outlet on a page."""
+    return [_card_details(card) for card in _cards(page)]
+
+
+def extract_details(page: str, name: str = ""):
+    """
+    Details of the outlet called ``name`` on a page (the first outlet when
+    no title matches): ``opening_intervals``, ``map_url``, ``lat``/``lon``
+    (when the map link has them) and ``services``.
+    """
+    cards = _cards(page)
+    card = cards[0]
+    if name and len(cards) > 1:
+        wanted = _key(name)
+        for c in cards:
+            title = _TITLE.search(c)
+            if title and _key(_text(title.group(1))) == wanted:
+                card = c
+                break
+    details = _card_details(card)
+    del details["name"], details["address"]
+    return details
+
+
+# ---------------------------------------------------------
+# Scraper
+# ---------------------------------------------------------
+def _digest(body: bytes):
+    return hashlib.blake2b(body, digest_size=16).hexdigest()
+
+
+class OutletPageScraper:
+    """
+    Details of outlet pages, fetched and parsed concurrently and cached on
+    disk between runs. Use as an async context manager; the parser pool is
+    shut down on exit.
+    """
+
+    def __init__(self, cache_dir: str = OUTLET_PAGE_CACHE_DIR, concurrency: int = OUTLET_DETAIL_WORKERS,
+                 processes: int = OUTLET_PARSE_PROCESSES, ttl_s: float = OUTLET_PAGE_TTL_S):
+        self.cache_dir = cache_dir
+        self.processes = processes
+        self.ttl_s = ttl_s
+        self._limit = asyncio.Semaphore(concurrency)
+        self._pool = None  # ProcessPoolExecutor, started on the first page parsed
+        self.outcomes = Counter()
+        self.bytes = 0
+        self._started = time.perf_counter()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._pool is not None:
+            await asyncio.to_thread(self._pool.shutdown)
+            self._pool = None
+
+    def stats(self):
+        return {**self.outcomes, "bytes": self.bytes, "elapsed_s": round(time.perf_counter() - self._started, 3)}
+
+    async def details(self, url: str, name: str = ""):
+        """Details of the outlet ``name`` from ``url``; the cached ones (or {}) when the page cannot be fetched."""
+        path = os.path.join(self.cache_dir, f"{_digest(f'{url}|{name}'.encode('utf-8'))}.json")
+        entry = await asyncio.to_thread(self._load, path)
+        if entry and time.time() - entry["checked"] < self.ttl_s:
+            return self._count("fresh", entry["details"])
+
+        headers = {}
+        if entry and entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry and entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+
+        client = await clients.async_http_client.aget()
+        try:
+            async with self._limit:
+                response = await client.get(url, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except Exception as e:
+            logger.warning(f"⚠️ Could not fetch outlet page {url}: {e}")
+            return self._count("error", entry["details"] if entry else {})
+
+        if response.status_code == 304:
+            outcome, details = "not_modified", entry["details"]
+        else:
+            self.bytes += len(response.content)
+            digest = _digest(response.content)
+            if entry and entry.get("digest") == digest:
+                outcome, details = "unchanged", entry["details"]
+            else:
+                outcome, details = "parsed", await self._parse(response.text, name)
+            entry = {
+                "url": url,
+                "etag": response.headers.get("etag"),
+                "last_modified": response.headers.get("last-modified"),
+                "digest": digest,
+                "details": details,
+            }
+        entry["checked"] = time.time()
+        await asyncio.to_thread(self._save, path, entry)
+        return self._count(outcome, details)
+
+    # -----------------------------------------------------
+    async def _parse(self, page: str, name: str):
+        if not self.processes:
+            return await asyncio.to_thread(extract_details, page, name)
+        if self._pool is None:
+            # Imported here: only ingest parses pages, and the API imports this module
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            # spawn, not fork: the parent has running threads (HTTP, Pinecone)
+            self._pool = ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn"))
+        return await asyncio.get_running_loop().run_in_executor(self._pool, extract_details, page, name)
+
+    def _count(self, outcome: str, details: dict):
+        self.outcomes[outcome] += 1
+        PAGES.inc(outcome)
+        return details
+
+    @staticmethod
+    def _load(path: str):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def _save(path: str, entry: dict):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(entry, f)
+        os.replace(tmp, path)
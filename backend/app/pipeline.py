@@ -0,0 +1,172 @@
+import asyncio
+import inspect
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Callable
+
+logger = logging.getLogger("Pipeline")
+
+_DONE = object()
+
+# Upper bound on in-flight embeddings per ingest; the rate governor decides
+# how many of them actually reach OpenAI at once
+EMBED_WORKERS = int(os.getenv("INGEST_EMBED_WORKERS", "16"))
+
+
+# ---------------------------------------------------------
+# Stage bookkeeping
+# ---------------------------------------------------------
+@dataclass
+class StageStats:
+    name: str
+    items_in: int = 0
+    items_out: int = 0
+    errors: int = 0
+    busy_s: float = 0.0
+    started: float | None = None
+    finished: float | None = None
+
+    def as_dict(self):
+        wall = (self.finished or time.perf_counter()) - (self.started or time.perf_counter())
+        return {
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "errors": self.errors,
+            "busy_s": round(self.busy_s, 3),
+            "wall_s": round(wall, 3),
+            "items_per_s": round(self.items_out / wall, 1) if wall > 0 else 0.0,
+        }
+
+
+@dataclass
+class Stage:
+    name: str
+    fn: Callable[[Any], Any]
+    concurrency: int = 1
+    batch_size: int | None = None
+    stats: StageStats = field(init=False)
+
+    def __post_init__(self):
+        self.stats = StageStats(self.name)
+        self.is_async = inspect.iscoroutinefunction(self.fn)
+
+
+def _first_error(exc: BaseException):
+    while isinstance(exc, BaseExceptionGroup):
+        exc = exc.exceptions[0]
+    return exc
+
+
+# ---------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------
+class Pipeline:
+    """
+    Async pipeline: source -> stage -> stage -> ... with a bounded queue
+    between each pair, so a slow stage applies backpressure upstream and at
+    most ``queue_size`` items wait at each hop.
+
+    A stage ``fn`` takes one item (or a list when ``batch_size`` is set) and
+    returns the next item, a list of items for batch stages, or ``None`` to
+    drop it. Sync functions run inline; async ones run ``concurrency`` wide.
+    """
+
+    def __init__(self, name: str, queue_size: int = 64, max_errors: int = 0):
+        self.name = name
+        self.queue_size = queue_size
+        self.max_errors = max_errors
+        self.stages: list[Stage] = []
+        self.source_stats = StageStats("source")
+        self._errors = 0
+
+    def stage(self, name: str, fn, concurrency: int = 1, batch_size: int | None = None):
+        self.stages.append(Stage(name, fn, concurrency, batch_size))
+        return self
+
+    async def run(self, source: AsyncIterable):
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+
+        try:
+            async with asyncio.TaskGroup() as tg:
+                tg.create_task(self._feed(source, queues[0], self.stages[0].concurrency))
+                for i, stage in enumerate(self.stages):
+                    out_q = queues[i + 1] if i + 1 < len(self.stages) else None
+                    next_workers = self.stages[i + 1].concurrency if out_q else 0
+                    tg.create_task(self._run_stage(stage, queues[i], out_q, next_workers))
+        except* Exception as eg:
+            raise _first_error(eg)
+
+        stats = self.stats()
+        for stage_name, s in stats.items():
+            logger.info(
+                f"📊 {self.name}/{stage_name}: {s['items_out']} items in {s['wall_s']}s "
+                f"({s['items_per_s']}/s, {s['errors']} errors)"
+            )
+        return stats
+
+    def stats(self):
+        out = {"source": self.source_stats.as_dict()}
+        out.update({s.name: s.stats.as_dict() for s in self.stages})
+        return out
+
+    # -----------------------------------------------------
+    async def _feed(self, source: AsyncIterable, out_q: asyncio.Queue, workers: int):
+        st = self.source_stats
+        st.started = time.perf_counter()
+        async for item in source:
+            st.items_out += 1
+            await out_q.put(item)
+        st.finished = time.perf_counter()
+        for _ in range(workers):
+            await out_q.put(_DONE)
+
+    async def _run_stage(self, stage: Stage, in_q, out_q, next_workers: int):
+        stage.stats.started = time.perf_counter()
+        async with asyncio.TaskGroup() as tg:
+            for _ in range(stage.concurrency):
+                tg.create_task(self._worker(stage, in_q, out_q))
+        stage.stats.finished = time.perf_counter()
+        for _ in range(next_workers):
+            await out_q.put(_DONE)
+
+    async def _worker(self, stage: Stage, in_q, out_q):
+        batch = []
+        while True:
+            item = await in_q.get()
+            if item is _DONE:
+                if batch:
+                    await self._process(stage, batch, out_q)
+                return
+
+            stage.stats.items_in += 1
+            if stage.batch_size:
+                batch.append(item)
+                if len(batch) >= stage.batch_size:
+                    await self._process(stage, batch, out_q)
+                    batch = []
+            else:
+                await self._process(stage, item, out_q)
+
+    async def _process(self, stage: Stage, payload, out_q):
+        t0 = time.perf_counter()
+        try:
+            result = await stage.fn(payload) if stage.is_async else stage.fn(payload)
+        except Exception:
+            stage.stats.errors += 1
+            self._errors += 1
+            if self._errors > self.max_errors:
+                raise
+            logger.exception(f"{self.name}/{stage.name} failed; dropping item")
+            return
+        finally:
+            stage.stats.busy_s += time.perf_counter() - t0
+
+        if result is None:
+            return
+        results = result if stage.batch_size else [result]
+        for r in results:
+            stage.stats.items_out += 1
+            if out_q is not None:
+                await out_q.put(r)
@@ -0,0 +1,138 @@
+"""
+Where an outlet is: its city, state and every locality it can be found under.
+
+Feed addresses end with "<postcode> <town>, <state>". The city is that
+postal town (a known place name when it is one), the state comes from the
+postcode range in ``app/data/postcodes.csv``, and ``localities`` lists
+every known place the address mentions plus the city, postcode area and
+state, so "outlets in Cheras" finds a Cheras outlet whose postal town is
+Kuala Lumpur and "outlets in Selangor" finds all of them. Known places are
+``CITY_LIST`` plus the postcode table's areas and the states; queries are
+matched against the same list (see ``extract_cities``).
+
+Outlets are also sharded by ``REGIONS``, the store categories the site
+lists them under; ``regions_of`` routes the places a query names to the
+regions holding them.
+"""
+import re
+
+from app.geo import postcode_area, postcode_table
+from app.lazy import once
+
+CITY_LIST = [
+    "Kuala Lumpur", "Shah Alam", "Petaling Jaya", "Subang Jaya", "Puchong",
+    "Kajang", "Selayang", "Rawang", "Ampang", "Bangi", "Cyberjaya", "Putrajaya",
+    "Cheras", "Sungai Buloh", "Klang", "Serdang", "Gombak", "Damansara",
+    "Sepang", "Seri Kembangan"
+]
+STATES = {
+    "Johor": ["johore"], "Kedah": [], "Kelantan": [], "Kuala Lumpur": ["wilayah persekutuan kuala lumpur"],
+    "Labuan": [], "Melaka": ["malacca"], "Negeri Sembilan": ["negri sembilan"], "Pahang": [],
+    "Penang": ["pulau pinang"], "Perak": [], "Perlis": [], "Putrajaya": [], "Sabah": [], "Sarawak": [],
+    "Selangor": [], "Terengganu": ["trengganu"],
+}
+# Store category slug of each region, and the states it covers
+REGIONS = {
+    "johor": ["Johor"], "kedah": ["Kedah"], "kelantan": ["Kelantan"],
+    "kuala-lumpur-selangor": ["Kuala Lumpur", "Selangor", "Putrajaya"], "melaka": ["Melaka"],
+    "negeri-sembilan": ["Negeri Sembilan"], "pahang": ["Pahang"], "penang": ["Penang"], "perak": ["Perak"],
+    "perlis": ["Perlis"], "sabah": ["Sabah", "Labuan"], "sarawak": ["Sarawak"], "terengganu": ["Terengganu"],
+}
+
+# "<postcode>[,] <town>" up to the next comma or full stop
+_TOWN = re.compile(r"(?<!\d)\d{5}(?!\d),?\s+([A-Za-z][A-Za-z .'-]*?)\s*(?:[,.]|$)")
+_NOT_A_TOWN = {"malaysia", "wilayah persekutuan"}
+_WORD = re.compile(r"[a-z]+")
+
+
+@once
+def known_places():
+    """
+    Canonical name of every known place and alias, keyed by its lowercase
+    words; the first words of those names; and the most words in one.
+    """
+    names = {}
+    for place in CITY_LIST + [row["area"] for row in postcode_table()["rows"]] + list(STATES):
+        names.setdefault(" ".join(_WORD.findall(place.lower())), place)
+    for state, aliases in STATES.items():
+        for alias in aliases:
+            names[alias] = state
+    return names, {n.split()[0] for n in names}, max(len(n.split()) for n in names)
+
+
+def find_places(text: str):
+    """Known places named in ``text``, in order of first mention (longest name first at each word)."""
+    names, first_words, longest = known_places()
+    words = _WORD.findall((text or "").lower())
+    found, i = {}, 0
+    while i < len(words):
+        if words[i] not in first_words:
+            i += 1
+            continue
+        for n in range(min(longest, len(words) - i), 0, -1):
+            place = names.get(" ".join(words[i:i + n]))
+            if place:
+                found.setdefault(place)
+                i += n
+                break
+        else:
+            i += 1
+    return list(found)
+
+
+@once
+def _place_regions():
+    """Regions of every known place: through its state, or the states of its postcode areas."""
+    state_regions = {state: region for region, states in REGIONS.items() for state in states}
+    regions = {state: {region} for state, region in state_regions.items()}
+    for row in postcode_table()["rows"]:
+        regions.setdefault(row["area"], set()).add(state_regions[row["state"]])
+    return regions
+
+
+def regions_of(places):
+    """Regions holding the given places (none for places outside every region)."""
+    table = _place_regions()
+    return sorted({region for place in places for region in table.get(place, ())})
+
+
+def extract_cities(query: str):
+    """Cities, areas and states a query names."""
+    return find_places(query)
+
+
+def attribute(address: str):
+    """``city``, ``state`` and ``localities`` of an outlet address (empty when unknown)."""
+    area = postcode_area(address)
+    places = find_places(address)
+    towns = [t for t in _TOWN.findall(address or "") if t.lower() not in _NOT_A_TOWN]
+
+    if towns:
+        known = find_places(towns[-1])
+        city = known[0] if known and known[0].lower() == towns[-1].lower() else towns[-1].strip().title()
+    elif area:
+        city = area["area"]
+    else:
+        city = next((p for p in reversed(places) if p not in STATES), "")
+
+    if area:
+        state = area["state"]
+    else:
+        state = next((p for p in reversed(places) if p in STATES), "")
+
+    localities = places + [city, state] + ([area["area"]] if area else [])
+    return {
+        "city": city,
+        "state": state,
+        "localities": [p for p in dict.fromkeys(localities) if p],
+    }
+
+
+def localities_of(metadata: dict):
+    """Localities of an indexed outlet; derived from its address for records ingested without them."""
+    return metadata.get("localities") or attribute(metadata.get("address", ""))["localities"]
+
+
+def partition_keys(metadata: dict):
+    """Partitions of an indexed outlet: its localities and ``region:<slug>`` (empty before sharding)."""
+    return [*localities_of(metadata), f"region:{metadata.get('region', '')}"]
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+
+# float32 | float16 | int8
+EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float32")
+
+DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+
+
+def normalize(mat):
+    mat = np.asarray(mat, dtype=np.float32)
+    if mat.ndim == 1:
+        n = np.linalg.norm(mat)
+        return mat / n if n else mat
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    return mat / np.where(norms == 0, 1.0, norms)
+
+
+class QuantizedMatrix:
+    """
+    Row-normalised vectors held as float32, float16 or int8. int8 uses a
+    symmetric per-row scale, so ``scores`` (cosine similarity against a
+    query) dequantizes exactly by multiplying each row's dot product back by
+    its scale. Low-precision rows are widened to float32 before the matmul,
+    so accumulation never happens in float16 or int8.
+    """
+
+    def __init__(self, data: np.ndarray, scale: np.ndarray | None = None):
+        self.data = data
+        self.scale = scale
+
+    @classmethod
+    def from_vectors(cls, vectors, storage: str = EMBEDDING_STORAGE):
+        if storage not in DTYPES:
+            raise ValueError(f"Unknown storage '{storage}' (expected one of {sorted(DTYPES)})")
+        mat = normalize(np.atleast_2d(vectors))
+
+        if storage == "int8":
+            scale = np.abs(mat).max(axis=1) / 127.0
+            scale[scale == 0] = 1.0
+            data = np.round(mat / scale[:, None]).astype(np.int8)
+            return cls(data, scale.astype(np.float32))
+        return cls(mat.astype(DTYPES[storage]))
+
+    @property
+    def storage(self):
+        return self.data.dtype.name
+
+    @property
+    def shape(self):
+        return self.data.shape
+
+    @property
+    def nbytes(self):
+        return self.data.nbytes + (self.scale.nbytes if self.scale is not None else 0)
+
+    def __len__(self):
+        return self.data.shape[0]
+
+    def dequantize(self):
+        mat = self.data.astype(np.float32)
+        return mat * self.scale[:, None] if self.scale is not None else mat
+
+    def scores(self, query):
+        """Cosine similarity of every row against ``query``."""
+        q = normalize(query)
+        s = self.data.astype(np.float32) @ q
+        return s * self.scale if self.scale is not None else s
+
+    def topk(self, query, k: int, rescore=None):
+        """
+        Indices and scores of the ``k`` best rows. With ``rescore`` (the
+        full-precision matrix), the best ``4k`` quantized candidates are
+        re-ranked exactly.
+        """
+        s = self.scores(query)
+        k = min(k, len(s))
+        if rescore is None:
+            idx = np.argpartition(-s, k - 1)[:k] if k < len(s) else np.arange(len(s))
+            idx = idx[np.argsort(-s[idx])]
+            return idx, s[idx]
+
+        n = min(len(s), 4 * k)
+        cand = np.argpartition(-s, n - 1)[:n] if n < len(s) else np.arange(len(s))
+        exact = normalize(rescore[cand]) @ normalize(query)
+        order = np.argsort(-exact)[:k]
+        return cand[order], exact[order]
@@ -0,0 +1,315 @@
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import random
+import threading
+import time
+
+from app import metrics
+
+logger = logging.getLogger("RateGovernor")
+
+# Lower value = served first
+CHAT = 0
+INGEST = 1
+
+
+def estimate_tokens(text: str | list | None, completion: int = 0):
+    """Cheap token estimate (~4 chars per token) for TPM accounting."""
+    if text is None:
+        return completion
+    if isinstance(text, list):
+        text = " ".join(str(t) for t in text)
+    return len(text) // 4 + 1 + completion
+
+
+def is_rate_limited(exc: Exception):
+    return getattr(exc, "status_code", None) == 429 or type(exc).__name__ == "RateLimitError"
+
+
+def _retry_after(exc: Exception):
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if "retry-after-ms" in headers:
+            return float(headers["retry-after-ms"]) / 1000
+        if "retry-after" in headers:
+            return float(headers["retry-after"])
+    except (TypeError, ValueError):
+        pass
+    return None
+
+
+# ---------------------------------------------------------
+# Token bucket
+# ---------------------------------------------------------
+class TokenBucket:
+    """
+    Refills ``per_minute`` tokens per minute up to one minute's worth.
+    Low-priority callers may not draw the bucket below ``reserve`` of its
+    capacity, which keeps headroom for chat traffic during ingestion.
+    """
+
+    def __init__(self, per_minute: float, reserve: float = 0.2):
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.reserve = reserve
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def take(self, n: float, priority: int):
+        """Take ``n`` tokens; return 0 on success or seconds to wait."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        floor = self.capacity * self.reserve if priority > CHAT else 0.0
+        n = min(n, self.capacity - floor)
+        if self.tokens - n >= floor:
+            self.tokens -= n
+            return 0.0
+        return (n + floor - self.tokens) / self.rate
+
+
+# ---------------------------------------------------------
+# Governor
+# ---------------------------------------------------------
+class RateGovernor:
+    """
+    Process-wide gate for OpenAI calls. Combines RPM/TPM token buckets with
+    an AIMD concurrency limit: each fast success grows the limit by
+    ~1/limit, a 429 halves it, a call slower than ``latency_target`` shrinks
+    it by ``latency_backoff``. Waiters are served by priority, so chat
+    requests overtake queued ingestion work.
+
+    Thread-safe: async callers use ``call``, code running in worker threads
+    uses ``call_sync``.
+    """
+
+    def __init__(
+        self,
+        rpm: float = 500,
+        tpm: float = 200_000,
+        initial_concurrency: float = 8,
+        min_concurrency: float = 1,
+        max_concurrency: float = 64,
+        latency_target: float = 5.0,
+        latency_backoff: float = 0.8,
+        max_retries: int = 4,
+    ):
+        self.rpm = TokenBucket(rpm)
+        self.tpm = TokenBucket(tpm)
+        self.limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.latency_target = latency_target
+        self.latency_backoff = latency_backoff
+        self.max_retries = max_retries
+
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._waiters: list = []
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+
+        self.stats = {"calls": 0, "throttled": 0, "slow": 0, "retries": 0, "errors": 0}
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            rpm=float(os.getenv("OPENAI_RPM", "500")),
+            tpm=float(os.getenv("OPENAI_TPM", "200000")),
+            initial_concurrency=float(os.getenv("OPENAI_INITIAL_CONCURRENCY", "8")),
+            max_concurrency=float(os.getenv("OPENAI_MAX_CONCURRENCY", "64")),
+            latency_target=float(os.getenv("OPENAI_LATENCY_TARGET_S", "5")),
+        )
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "in_flight": self._in_flight,
+                "waiting": len(self._waiters),
+                **self.stats,
+            }
+
+    # -----------------------------------------------------
+    # Public API
+    # -----------------------------------------------------
+    async def call(self, fn, *, priority: int = CHAT, tokens: int = 1, op: str = "openai"):
+        """
+        Run ``await fn()`` under the governor, retrying 429s with backoff.
+        ``op`` labels the call's latency, outcome and token metrics.
+        """
+        for attempt in range(self.max_retries + 1):
+            await self._acquire_async(priority, tokens)
+            t0 = time.monotonic()
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self._release()
+                raise
+            except Exception as e:
+                delay = self._on_error(e, time.monotonic() - t0, attempt, op)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            self._on_success(time.monotonic() - t0, op)
+            metrics.observe_usage(op, result)
+            return result
+
+    def call_sync(self, fn, *, priority: int = CHAT, tokens: int = 1, op: str = "openai"):
+        """Blocking variant of ``call`` for code running in worker threads."""
+        for attempt in range(self.max_retries + 1):
+            self._acquire_sync(priority, tokens)
+            t0 = time.monotonic()
+            try:
+                result = fn()
+            except Exception as e:
+                delay = self._on_error(e, time.monotonic() - t0, attempt, op)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                continue
+            self._on_success(time.monotonic() - t0, op)
+            metrics.observe_usage(op, result)
+            return result
+
+    # -----------------------------------------------------
+    # Slots
+    # -----------------------------------------------------
+    def _try_slot(self):
+        if self._in_flight < max(self.min_concurrency, int(self.limit)):
+            self._in_flight += 1
+            return True
+        return False
+
+    async def _acquire_async(self, priority: int, tokens: int):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            granted = not self._waiters and self._try_slot()
+            if not granted:
+                waiter = ["async", loop, loop.create_future(), False]
+                heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        if not granted:
+            try:
+                await waiter[2]
+            except asyncio.CancelledError:
+                self._abandon(waiter)
+                raise
+        try:
+            await self._wait_for_budget_async(priority, tokens)
+        except asyncio.CancelledError:
+            self._release()
+            raise
+
+    def _acquire_sync(self, priority: int, tokens: int):
+        with self._lock:
+            granted = not self._waiters and self._try_slot()
+            if not granted:
+                waiter = ["sync", None, threading.Event(), False]
+                heapq.heappush(self._waiters, (priority, next(self._seq), waiter))
+        if not granted:
+            waiter[2].wait()
+        self._wait_for_budget_sync(priority, tokens)
+
+    def _abandon(self, waiter):
+        with self._lock:
+            if waiter[3]:
+                # Slot was handed over just before cancellation
+                self._in_flight -= 1
+            else:
+                self._waiters = [w for w in self._waiters if w[2] is not waiter]
+                heapq.heapify(self._waiters)
+            self._wake()
+
+    def _budget_wait(self, priority: int, tokens: int):
+        with self._lock:
+            wait = self.rpm.take(1, priority)
+            if wait:
+                return wait
+            wait = self.tpm.take(tokens, priority)
+            if wait:
+                # Give the request token back; both must succeed together
+                self.rpm.tokens += 1
+            return wait
+
+    async def _wait_for_budget_async(self, priority: int, tokens: int):
+        while wait := self._budget_wait(priority, tokens):
+            await asyncio.sleep(wait)
+
+    def _wait_for_budget_sync(self, priority: int, tokens: int):
+        while wait := self._budget_wait(priority, tokens):
+            time.sleep(wait)
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self._wake()
+
+    def _wake(self):
+        # Called with the lock held
+        while self._waiters and self._try_slot():
+            _, _, waiter = heapq.heappop(self._waiters)
+            kind, loop, waker, _ = waiter
+            waiter[3] = True
+            if kind == "sync":
+                waker.set()
+            else:
+                loop.call_soon_threadsafe(_resolve, waker)
+
+    # -----------------------------------------------------
+    # AIMD
+    # -----------------------------------------------------
+    def _on_success(self, latency: float, op: str = "openai"):
+        metrics.OPENAI_SECONDS.observe(latency, op)
+        metrics.OPENAI_REQUESTS.inc(op, "ok")
+        with self._lock:
+            self.stats["calls"] += 1
+            if latency > self.latency_target:
+                self.stats["slow"] += 1
+                self._decrease(self.latency_backoff)
+            else:
+                self.limit = min(self.max_concurrency, self.limit + 1.0 / self.limit)
+        self._release()
+
+    def _on_error(self, exc: Exception, latency: float, attempt: int, op: str = "openai"):
+        """Record a failure; return a retry delay or None to re-raise."""
+        throttled = is_rate_limited(exc)
+        metrics.OPENAI_SECONDS.observe(latency, op)
+        metrics.OPENAI_REQUESTS.inc(op, "throttled" if throttled else "error")
+        with self._lock:
+            if throttled:
+                self.stats["throttled"] += 1
+                self._decrease(0.5)
+            else:
+                self.stats["errors"] += 1
+        self._release()
+
+        if not throttled or attempt >= self.max_retries:
+            return None
+        self.stats["retries"] += 1
+        delay = _retry_after(exc) or min(20.0, 0.5 * 2 ** attempt)
+        return delay * (0.5 + random.random())
+
+    def _decrease(self, factor: float):
+        # At most one multiplicative decrease per latency window, so a burst
+        # of 429s from the same overload collapses the limit only once
+        now = time.monotonic()
+        if now - self._last_decrease < min(self.latency_target, 1.0):
+            return
+        self._last_decrease = now
+        old = self.limit
+        self.limit = max(self.min_concurrency, self.limit * factor)
+        logger.warning(f"⚠️ OpenAI concurrency limit {old:.1f} -> {self.limit:.1f}")
+
+
+def _resolve(fut):
+    if not fut.done():
+        fut.set_result(None)
+
+
+governor = RateGovernor.from_env()
@@ -0,0 +1,74 @@
+"""
+Read-only arrays shared between worker processes.
+
+A published set is a directory of ``.npy`` files plus ``meta.json`` under
+``SHARED_DIR`` (``/dev/shm`` when available, so it never touches disk).
+Workers attach with ``np.load(mmap_mode="r")``: every process maps the same
+page-cache pages, so N workers hold one copy of the data instead of N.
+
+Sets are content-addressed by the caller's key (include a fingerprint of
+what was embedded), written to a temp directory and renamed into place, so
+readers only ever see complete sets and concurrent publishers are harmless.
+"""
+import json
+import logging
+import os
+import shutil
+import tempfile
+
+logger = logging.getLogger("Shared")
+
+SHARED_DIR = os.getenv(
+    "SHARED_DIR",
+    "/dev/shm/zus-shared" if os.path.isdir("/dev/shm") else os.path.join(tempfile.gettempdir(), "zus-shared"),
+)
+
+
+def _path(key: str, directory: str):
+    return os.path.join(directory, key)
+
+
+def publish(key: str, arrays: dict, meta: dict | None = None, directory: str = SHARED_DIR):
+    """Write ``arrays`` (name -> ndarray) once; return the set's path or None."""
+    import numpy as np
+
+    path = _path(key, directory)
+    if os.path.isdir(path):
+        return path
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp = tempfile.mkdtemp(prefix=f".{key}-", dir=directory)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+        with open(os.path.join(tmp, "meta.json"), "w") as f:
+            json.dump(meta or {}, f)
+        os.chmod(tmp, 0o755)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            # Another worker published the same key first
+            shutil.rmtree(tmp, ignore_errors=True)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not publish shared set {key}: {e}")
+        return None
+    return path
+
+
+def attach(key: str, directory: str = SHARED_DIR):
+    """``(arrays, meta)`` memory-mapped read-only, or None if not published."""
+    import numpy as np
+
+    path = _path(key, directory)
+    if not os.path.isdir(path):
+        return None
+    try:
+        with open(os.path.join(path, "meta.json")) as f:
+            meta = json.load(f)
+        arrays = {
+            name[:-4]: np.load(os.path.join(path, name), mmap_mode="r", allow_pickle=False)
+            for name in os.listdir(path) if name.endswith(".npy")
+        }
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Could not attach shared set {key}: {e}")
+        return None
+    return arrays, meta
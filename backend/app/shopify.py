@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import os
+
+from app import clients
+
+logger = logging.getLogger("Shopify")
+
+# ---------------------------------------------------------
+# Config
+# ---------------------------------------------------------
+SHOP_URL = os.getenv("SHOP_URL", "https://shop.zuscoffee.com")
+PRODUCT_COLLECTIONS = [
+    c.strip() for c in os.getenv("PRODUCT_COLLECTIONS", "drinkware").split(",") if c.strip()
+]
+
+# Shopify caps products.json at 250 items per page
+PAGE_LIMIT = 250
+MAX_PAGES = 100
+
+
+# ---------------------------------------------------------
+# Pagination
+# ---------------------------------------------------------
+async def fetch_collection(
+    client: "httpx.AsyncClient",
+    collection: str,
+    limit: int = PAGE_LIMIT,
+    max_pages: int = MAX_PAGES,
+):
+    """Walk ?page=N&limit=L for one collection until the first short page."""
+    url = f"{SHOP_URL}/collections/{collection}/products.json"
+    products = []
+
+    for page in range(1, max_pages + 1):
+        response = await client.get(url, params={"page": page, "limit": limit})
+        response.raise_for_status()
+        batch = response.json().get("products", [])
+
+        for prod in batch:
+            prod.setdefault("_collections", []).append(collection)
+        products.extend(batch)
+
+        if len(batch) < limit:
+            break
+
+    logger.info(f"Fetched {len(products)} products from '{collection}' ({page} pages)")
+    return products
+
+
+async def fetch_products(
+    collections: list[str] | None = None,
+    client: "httpx.AsyncClient | None" = None,
+    limit: int = PAGE_LIMIT,
+):
+    """
+    Fetch every collection concurrently on one pooled client (the shared one
+    from app.clients by default) and merge the results, deduping products
+    that appear in several collections.
+    """
+    collections = collections or PRODUCT_COLLECTIONS
+
+    if client is None:
+        client = await clients.async_http_client.aget()
+
+    pages = await asyncio.gather(*[
+        fetch_collection(client, c, limit) for c in collections
+    ])
+
+    merged: dict = {}
+    for batch in pages:
+        for prod in batch:
+            seen = merged.get(prod["id"])
+            if seen is None:
+                merged[prod["id"]] = prod
+            else:
+                for c in prod["_collections"]:
+                    if c not in seen["_collections"]:
+                        seen["_collections"].append(c)
+
+    logger.info(f"Fetched {len(merged)} unique products across {len(collections)} collections")
+    return [flatten_product(p) for p in merged.values()]
+
+
+# ---------------------------------------------------------
+# Record shaping
+# ---------------------------------------------------------
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def flatten_product(prod: dict):
+    """Flatten a Shopify product and all of its variants into one record."""
+    variants = []
+    for v in prod.get("variants") or []:
+        variants.append({
+            "id": v.get("id"),
+            "title": v.get("title", ""),
+            "price": v.get("price"),
+            "compare_at_price": v.get("compare_at_price"),
+            "available": bool(v.get("available", True)),
+            "sku": v.get("sku") or "",
+        })
+
+    prices = [p for p in (_to_float(v["price"]) for v in variants) if p is not None]
+    tags = prod.get("tags") or []
+    if isinstance(tags, str):
+        tags = [t.strip() for t in tags.split(",") if t.strip()]
+
+    return {
+        "id": prod["id"],
+        "title": prod.get("title", "Unknown"),
+        "handle": prod.get("handle", ""),
+        "body_html": prod.get("body_html") or "",
+        "vendor": prod.get("vendor", ""),
+        "product_type": prod.get("product_type", ""),
+        "tags": tags,
+        "collections": prod.get("_collections", []),
+        "variants": variants,
+        "price": variants[0]["price"] if variants else "N/A",
+        "price_min": min(prices) if prices else None,
+        "price_max": max(prices) if prices else None,
+        "available": any(v["available"] for v in variants),
+    }
+
+
+def product_text(record: dict):
+    """Text used for embedding and display, one line per variant."""
+    lines = [
+        f"Product: {record['title']}",
+        f"Description: {record['body_html']}",
+        f"Price: RM{record['price']}",
+    ]
+    if len(record["variants"]) > 1:
+        lines.append("Variants: " + "; ".join(
+            f"{v['title']} RM{v['price']}{'' if v['available'] else ' (sold out)'}"
+            for v in record["variants"]
+        ))
+    return "\n".join(lines)
@@ -0,0 +1,163 @@
+"""
+Prebuilt snapshots for cold starts (Lambda).
+
+Intent and query-type example embeddings are stored as ``.npz`` files keyed
+by a fingerprint of the examples, provider, model, dimension and storage,
+so a stale snapshot is simply never found. Lookup order is the snapshot
+baked into the image (``SNAPSHOT_DIR``), then the ``/tmp`` cache a previous
+cold start on the same host may have written. Worker processes share one
+memory-mapped copy through ``app.shared`` (``attach_examples``).
+
+``manifest.json`` records what the indexes held when the snapshot was
+built, so a process that skips ingestion still reports its corpus.
+
+    python -m app.snapshot            # writes into SNAPSHOT_DIR
+"""
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+
+logger = logging.getLogger("Snapshot")
+
+SNAPSHOT_DIR = os.getenv(
+    "SNAPSHOT_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "snapshot")
+)
+SNAPSHOT_CACHE_DIR = os.getenv("SNAPSHOT_CACHE_DIR", os.path.join(tempfile.gettempdir(), "zus-snapshot"))
+
+
+def fingerprint(kind: str, provider, examples: dict):
+    from app.quantize import EMBEDDING_STORAGE
+
+    key = json.dumps(
+        [kind, provider.name, getattr(provider, "model", ""), provider.dimension, EMBEDDING_STORAGE, examples],
+        sort_keys=True,
+    )
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _filename(kind: str, provider, examples: dict):
+    return f"{kind}-{provider.name}-{fingerprint(kind, provider, examples)}.npz"
+
+
+# ---------------------------------------------------------
+# Example embeddings
+# ---------------------------------------------------------
+def _to_arrays(embedded: dict):
+    matrix = embedded["matrix"]
+    arrays = {"offsets": embedded["offsets"], "data": matrix.data}
+    if matrix.scale is not None:
+        arrays["scale"] = matrix.scale
+    return arrays
+
+
+def _from_arrays(arrays, labels):
+    from app.quantize import QuantizedMatrix
+
+    scale = arrays["scale"] if "scale" in arrays and arrays["scale"].size else None
+    return {
+        "labels": [str(label) for label in labels],
+        "offsets": arrays["offsets"],
+        "matrix": QuantizedMatrix(arrays["data"], scale),
+    }
+
+
+def load_examples(kind: str, provider, examples: dict, dirs=None):
+    """Embedded examples in the ``embed_examples`` layout, or None."""
+    import numpy as np
+
+    name = _filename(kind, provider, examples)
+    for directory in dirs or (SNAPSHOT_DIR, SNAPSHOT_CACHE_DIR):
+        path = os.path.join(directory, name)
+        if not os.path.exists(path):
+            continue
+        try:
+            with np.load(path, allow_pickle=False) as z:
+                return _from_arrays({k: z[k] for k in z.files}, z["labels"])
+        except (OSError, KeyError, ValueError) as e:
+            logger.warning(f"⚠️ Ignoring unreadable snapshot {path}: {e}")
+    return None
+
+
+def save_examples(kind: str, provider, examples: dict, embedded: dict, directory: str = SNAPSHOT_CACHE_DIR):
+    """Write embedded examples; best effort, a read-only disk is not an error."""
+    import numpy as np
+
+    path = os.path.join(directory, _filename(kind, provider, examples))
+    try:
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{path}.tmp.npz"
+        np.savez(tmp, labels=np.array(embedded["labels"]), **_to_arrays(embedded))
+        os.replace(tmp, path)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not write snapshot {path}: {e}")
+        return None
+    return path
+
+
+def attach_examples(kind: str, provider, examples: dict):
+    """Embedded examples memory-mapped from the shared set, or None."""
+    from app.shared import attach
+
+    found = attach(_filename(kind, provider, examples)[:-4])
+    return _from_arrays(found[0], found[1]["labels"]) if found else None
+
+
+def share_examples(kind: str, provider, examples: dict, embedded: dict):
+    """Publish embedded examples for the other worker processes."""
+    from app.shared import publish
+
+    return publish(_filename(kind, provider, examples)[:-4], _to_arrays(embedded), {"labels": embedded["labels"]})
+
+
+# ---------------------------------------------------------
+# Corpus manifest
+# ---------------------------------------------------------
+def load_manifest(dirs=None):
+    for directory in dirs or (SNAPSHOT_DIR, SNAPSHOT_CACHE_DIR):
+        path = os.path.join(directory, "manifest.json")
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError) as e:
+            logger.warning(f"⚠️ Ignoring unreadable manifest {path}: {e}")
+    return None
+
+
+def save_manifest(corpora: dict, directory: str = SNAPSHOT_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, "manifest.json")
+    with open(path, "w") as f:
+        json.dump({"built_at": time.time(), "corpora": corpora}, f, indent=2)
+    return path
+
+
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build the cold-start snapshot")
+    parser.add_argument("--out", default=SNAPSHOT_DIR)
+    parser.add_argument("--skip-manifest", action="store_true", help="do not query the indexes")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    from app.chat_main import INTENT_EXAMPLES, QUERY_TYPE_EXAMPLES, embed_examples, intent_embedder
+
+    for kind, examples in (("intent", INTENT_EXAMPLES), ("query_type", QUERY_TYPE_EXAMPLES)):
+        for provider in intent_embedder.providers:
+            path = save_examples(kind, provider, examples, embed_examples(provider, examples), args.out)
+            print(f"✅ {path}")
+
+    if not args.skip_manifest:
+        from app.api.ProductsAPI import count_products
+        from app.api.OutletsAPI import count_outlets
+
+        print(f"✅ {save_manifest({'products': count_products(), 'outlets': count_outlets()}, args.out)}")
+
+
+if __name__ == "__main__":
+    main()
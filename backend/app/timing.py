@@ -0,0 +1,204 @@
+"""
+Hot-path stage timing.
+
+``span("name")`` times a block with the monotonic ns clock, adds it to the
+current request's timings (a context variable, so concurrent requests never
+mix) and to a process-wide HDR-style histogram for that stage.
+``ServerTimingMiddleware`` opens the per-request timings and sends them
+back as a ``Server-Timing`` header. A span costs ~2 µs
+(``python -m benchmarks.bench_timing``).
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+
+from app import metrics
+
+# Include per-stage timings in chat responses' ``info`` for every request
+CHAT_DEBUG = os.getenv("CHAT_DEBUG", "false").lower() in ("1", "true", "yes")
+
+_now = time.perf_counter_ns
+
+
+# ---------------------------------------------------------
+# Histogram
+# ---------------------------------------------------------
+class Histogram:
+    """
+    Log-linear histogram of non-negative integers (nanoseconds here), in the
+    style of HdrHistogram: each power-of-two range is split into
+    ``2**precision`` linear sub-buckets, so any recorded value is known to
+    within a relative error of ``2**-precision`` (~3% at the default 5) at a
+    fixed 2048-slot footprint. ``record`` is a few integer operations.
+    """
+
+    def __init__(self, precision: int = 5):
+        self.precision = precision
+        self.sub = 1 << precision
+        self.counts = [0] * (64 * self.sub)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def _index(self, v: int):
+        if v < self.sub:
+            return v
+        shift = v.bit_length() - self.precision - 1
+        return (shift + 1) * self.sub + (v >> shift) - self.sub
+
+    def _value(self, i: int):
+        """Midpoint of bucket ``i``."""
+        if i < self.sub:
+            return i
+        shift = i // self.sub - 1
+        low = (i % self.sub + self.sub) << shift
+        return low + ((1 << shift) - 1) // 2
+
+    def record(self, v: int):
+        v = max(0, int(v))
+        self.counts[self._index(v)] += 1
+        self.count += 1
+        self.sum += v
+        if v > self.max:
+            self.max = v
+
+    def merge(self, other: "Histogram"):
+        for i, c in enumerate(other.counts):
+            if c:
+                self.counts[i] += c
+        self.count += other.count
+        self.sum += other.sum
+        self.max = max(self.max, other.max)
+        return self
+
+    def percentile(self, q: float):
+        if not self.count:
+            return 0
+        rank = max(1, int(round(q / 100 * self.count)))
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return min(self._value(i), self.max)
+        return self.max
+
+    def bucket_counts(self, bounds):
+        """Counts per ``bounds`` bucket (by bucket midpoint) plus one overflow bucket."""
+        out = [0] * (len(bounds) + 1)
+        for i, c in enumerate(self.counts):
+            if c:
+                out[bisect.bisect_left(bounds, self._value(i))] += c
+        return out
+
+    def summary(self, scale: float = 1e6):
+        """Count, mean and percentiles, in ms by default."""
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count / scale, 3) if self.count else 0.0,
+            "p50": round(self.percentile(50) / scale, 3),
+            "p90": round(self.percentile(90) / scale, 3),
+            "p99": round(self.percentile(99) / scale, 3),
+            "max": round(self.max / scale, 3),
+        }
+
+
+_histograms: dict[str, Histogram] = {}
+_histograms_lock = threading.Lock()
+
+
+def histogram(name: str):
+    h = _histograms.get(name)
+    if h is None:
+        with _histograms_lock:
+            h = _histograms.setdefault(name, Histogram())
+    return h
+
+
+def summaries():
+    return {name: h.summary() for name, h in sorted(_histograms.items())}
+
+
+# ---------------------------------------------------------
+# Spans
+# ---------------------------------------------------------
+_request: contextvars.ContextVar[list | None] = contextvars.ContextVar("timings", default=None)
+
+
+class span:
+    """``with span("vector_query"): ...`` — times the block (see module doc)."""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = _now()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = _now() - self.start
+        timings = _request.get()
+        if timings is not None:
+            timings.append((self.name, elapsed))
+        histogram(self.name).record(elapsed)
+        return False
+
+
+def current():
+    """Stage durations of the current request in ms, summed per stage."""
+    out: dict[str, float] = {}
+    for name, ns in _request.get() or ():
+        out[name] = out.get(name, 0.0) + ns / 1e6
+    return {name: round(ms, 3) for name, ms in out.items()}
+
+
+def server_timing(timings: dict[str, float]):
+    return ", ".join(f"{name};dur={ms}" for name, ms in timings.items())
+
+
+# ---------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------
+class ServerTimingMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body buffering): collects
+    the spans of each HTTP request and adds ``Server-Timing`` with a
+    ``total`` entry to the response headers. Also counts requests in flight
+    and responses by route and status for /metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        start = _now()
+        token = _request.set([])
+        status = 500
+        metrics.IN_FLIGHT.inc()
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timings = current()
+                timings["total"] = round((_now() - start) / 1e6, 3)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            # Route template, not the raw path, so unmatched URLs add no series
+            route = getattr(scope.get("route"), "path", "unmatched")
+            histogram(f"http {route}").record(_now() - start)
+            metrics.HTTP_REQUESTS.inc(route, str(status))
+            metrics.IN_FLIGHT.dec()
+            _request.reset(token)
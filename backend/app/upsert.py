@@ -0,0 +1,230 @@
+import asyncio
+import json
+import logging
+import time
+
+logger = logging.getLogger("Upsert")
+
+# Pinecone rejects upsert requests above 2 MB; leave headroom for framing
+MAX_BATCH_BYTES = 1_800_000
+MAX_BATCH_SIZE = 100
+
+
+# Upper bound for one JSON-encoded float32/float64 value plus separator
+BYTES_PER_VALUE = 22
+
+
+def vector_size(vector: dict):
+    """
+    Serialized size of one vector as it goes over the wire. Values are
+    estimated (dumping 1536 floats per vector costs more than the estimate
+    is worth); id and metadata are measured exactly.
+    """
+    rest = {k: v for k, v in vector.items() if k != "values"}
+    return BYTES_PER_VALUE * len(vector.get("values", ())) + len(
+        json.dumps(rest, separators=(",", ":"), default=str)
+    )
+
+
+class UpsertWriter:
+    """
+    Buffers vectors into batches capped by serialized bytes (and count) and
+    runs up to ``concurrency`` ``index.upsert`` calls at once in worker
+    threads, so the sync Pinecone client never blocks the event loop. Failed
+    batches are retried with jittered exponential backoff. ``on_batch`` is
+    called with each batch once it is stored (e.g. to checkpoint progress).
+    Vectors go to ``namespace`` when given (one writer per shard).
+
+        async with UpsertWriter(index) as writer:
+            await writer.add(vector)
+        writer.stats()
+    """
+
+    def __init__(
+        self,
+        index,
+        max_batch_bytes: int = MAX_BATCH_BYTES,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        concurrency: int = 4,
+        max_attempts: int = 5,
+        name: str = "upsert",
+        on_batch=None,
+        namespace: str | None = None,
+    ):
+        self.index = index
+        self.namespace = namespace
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_size = max_batch_size
+        self.max_attempts = max_attempts
+        self.name = name
+        self.on_batch = on_batch
+
+        self._semaphore = asyncio.Semaphore(concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._batch: list[dict] = []
+        self._batch_bytes = 0
+        self._error: Exception | None = None
+
+        self.ids: set[str] = set()
+        self.vectors = 0
+        self.batches = 0
+        self.bytes = 0
+        self.retries = 0
+        self._started = None
+        self._finished = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            await self.close()
+        else:
+            for task in self._tasks:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def add(self, vector: dict):
+        if self._started is None:
+            self._started = time.perf_counter()
+
+        size = vector_size(vector)
+        if self._batch and (
+            self._batch_bytes + size > self.max_batch_bytes
+            or len(self._batch) >= self.max_batch_size
+        ):
+            await self._submit()
+
+        self._batch.append(vector)
+        self._batch_bytes += size
+        return vector
+
+    async def flush(self):
+        try:
+            if self._batch:
+                await self._submit()
+        finally:
+            # Let in-flight batches land (and report) even when one failed
+            if self._tasks:
+                await asyncio.gather(*self._tasks)
+        if self._error is not None:
+            raise self._error
+
+    async def close(self):
+        await self.flush()
+        self._finished = time.perf_counter()
+        s = self.stats()
+        logger.info(
+            f"📦 {self.name}: {s['vectors']} vectors in {s['batches']} batches "
+            f"({s['vectors_per_s']}/s, {s['retries']} retries)"
+        )
+        return s
+
+    def stats(self):
+        elapsed = ((self._finished or time.perf_counter()) - self._started) if self._started else 0.0
+        return {
+            "vectors": self.vectors,
+            "batches": self.batches,
+            "bytes": self.bytes,
+            "retries": self.retries,
+            "elapsed_s": round(elapsed, 3),
+            "vectors_per_s": round(self.vectors / elapsed, 1) if elapsed > 0 else 0.0,
+        }
+
+    # -----------------------------------------------------
+    async def _submit(self):
+        batch, size = self._batch, self._batch_bytes
+        self._batch, self._batch_bytes = [], 0
+
+        # Backpressure: wait for a free slot before accepting more vectors
+        await self._semaphore.acquire()
+        task = asyncio.create_task(self._send(batch, size))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+        # Surface failures from already finished batches early
+        if self._error is not None:
+            raise self._error
+
+    async def _send(self, batch: list[dict], size: int):
+        from tenacity import AsyncRetrying, stop_after_attempt, wait_random_exponential
+
+        try:
+            async for attempt in AsyncRetrying(
+                stop=stop_after_attempt(self.max_attempts),
+                wait=wait_random_exponential(multiplier=0.5, max=20),
+                reraise=True,
+            ):
+                with attempt:
+                    if attempt.retry_state.attempt_number > 1:
+                        self.retries += 1
+                        logger.warning(f"Retrying {self.name} batch of {len(batch)} (attempt {attempt.retry_state.attempt_number})")
+                    await asyncio.to_thread(self.index.upsert, vectors=batch, **_namespace(self.namespace))
+        except Exception as e:
+            logger.error(f"{self.name} batch of {len(batch)} failed after {self.max_attempts} attempts: {e}")
+            self._error = self._error or e
+            return
+        finally:
+            self._semaphore.release()
+
+        self.ids.update(v["id"] for v in batch)
+        self.vectors += len(batch)
+        self.batches += 1
+        self.bytes += size
+        if self.on_batch is not None:
+            self.on_batch(batch)
+
+
+def combined_stats(writers):
+    """
+    ``stats()`` totals of writers that ran side by side (one corpus split
+    over namespaces), timed from the first start to the last finish.
+    """
+    writers = [w for w in writers if w._started]
+    now = time.perf_counter()
+    elapsed = max((w._finished or now) for w in writers) - min(w._started for w in writers) if writers else 0.0
+    vectors = sum(w.vectors for w in writers)
+    return {
+        "vectors": vectors,
+        "batches": sum(w.batches for w in writers),
+        "bytes": sum(w.bytes for w in writers),
+        "retries": sum(w.retries for w in writers),
+        "elapsed_s": round(elapsed, 3),
+        "vectors_per_s": round(vectors / elapsed, 1) if elapsed > 0 else 0.0,
+    }
+
+
+def _namespace(namespace: str | None):
+    # Calls without a namespace keep the client's default (and work with fakes that take none)
+    return {} if namespace is None else {"namespace": namespace}
+
+
+def prune_stale(index, prefix: str, keep: set[str], batch_size: int = 1000, namespace: str | None = None):
+    """
+    Delete vectors whose id starts with ``prefix`` but was not written by the
+    latest ingest, e.g. outlets that closed. Runs only after a refresh has
+    succeeded, so queries keep hitting the previous vectors until then.
+    Needs ``index.list`` (serverless indexes); skipped otherwise.
+    """
+    if not keep:
+        return 0
+    return _delete_prefix(index, prefix, keep, batch_size, namespace)
+
+
+def clear_prefix(index, prefix: str, namespace: str | None = None, batch_size: int = 1000):
+    """Delete every vector whose id starts with ``prefix``, e.g. records moved to another namespace."""
+    return _delete_prefix(index, prefix, set(), batch_size, namespace)
+
+
+def _delete_prefix(index, prefix: str, keep: set[str], batch_size: int, namespace: str | None):
+    try:
+        stale = [i for page in index.list(prefix=prefix, **_namespace(namespace)) for i in page if i not in keep]
+        for start in range(0, len(stale), batch_size):
+            index.delete(ids=stale[start:start + batch_size], **_namespace(namespace))
+    except Exception as e:
+        logger.warning(f"Skipping stale '{prefix}*' cleanup: {e}")
+        return 0
+    if stale:
+        where = f" from namespace '{namespace}'" if namespace is not None else ""
+        logger.info(f"🧹 Removed {len(stale)} stale '{prefix}*' vectors{where}")
+    return len(stale)
@@ -0,0 +1,88 @@
+"""
+Drive the fake OpenAI server with an ingestion-sized burst of embeddings,
+with and without the rate governor, while a trickle of chat-priority calls
+measures how long interactive requests wait.
+
+    python -m benchmarks.bench_governor --requests 400 --capacity 8
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from openai import AsyncOpenAI, RateLimitError
+
+from app.ratelimit import RateGovernor, CHAT, INGEST
+from benchmarks.fake_openai import ServerThread, create_app
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else None
+
+
+async def run(base_url: str, n: int, governor: RateGovernor | None):
+    client = AsyncOpenAI(api_key="test", base_url=f"{base_url}/v1", max_retries=0 if governor else 2)
+    failures = 0
+    chat_latencies = []
+
+    async def embed(i, priority):
+        nonlocal failures
+        call = lambda: client.embeddings.create(model="text-embedding-3-small", input=f"item {i}")
+        try:
+            if governor:
+                await governor.call(call, priority=priority, tokens=4)
+            else:
+                await call()
+        except RateLimitError:
+            failures += 1
+
+    async def chat_trickle(stop):
+        i = 0
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            await embed(f"chat-{i}", CHAT)
+            chat_latencies.append(time.perf_counter() - t0)
+            i += 1
+            await asyncio.sleep(0.05)
+
+    stop = asyncio.Event()
+    trickle = asyncio.create_task(chat_trickle(stop))
+    t0 = time.perf_counter()
+    await asyncio.gather(*[embed(i, INGEST) for i in range(n)])
+    elapsed = time.perf_counter() - t0
+    stop.set()
+    await trickle
+    await client.close()
+
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "ok_per_s": round((n - failures) / elapsed, 1),
+        "failed": failures,
+        "chat_p50_s": percentile(chat_latencies, 0.5),
+        "chat_p95_s": percentile(chat_latencies, 0.95),
+        "governor": governor.snapshot() if governor else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--capacity", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--error-rate", type=float, default=0.02)
+    args = parser.parse_args()
+
+    report = {}
+    for name, gov in [
+        ("ungoverned", None),
+        ("governed", RateGovernor(rpm=100_000, tpm=10_000_000, initial_concurrency=4, latency_target=2.0)),
+    ]:
+        app = create_app(args.latency_ms, capacity=args.capacity, error_rate=args.error_rate)
+        with ServerThread(app) as server:
+            report[name] = asyncio.run(run(server.url, args.requests, gov))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
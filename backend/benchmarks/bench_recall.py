@@ -0,0 +1,119 @@
+"""
+Recall vs memory for reduced dimensionality and quantized storage.
+
+For each corpus (products, outlets) the reference ranking is exact cosine
+top-k on full 1536-dim float32 vectors. Every (dimensions, storage)
+combination is scored against it: recall@k and bytes per vector.
+
+With ``--provider openai`` the reduced vectors are the full ones truncated
+and re-normalised, which is what the API's ``dimensions`` parameter does
+for text-embedding-3 models; with ``--provider local`` (default, offline)
+each dimensionality is embedded afresh.
+
+    python -m benchmarks.bench_recall --k 5 --synthetic 2000
+"""
+import argparse
+import json
+import random
+from pathlib import Path
+
+import numpy as np
+
+from app.embeddings import HashingEmbeddingProvider, OpenAIEmbeddingProvider, OPENAI_EMBEDDING_DIM
+from app.quantize import QuantizedMatrix, normalize
+from app.shopify import flatten_product, product_text
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+PRODUCT_QUERIES = [
+    "cheap tumbler", "gotong royong tumbler", "cold cup with straw", "1 litre bottle",
+    "ceramic mug", "gift for coffee lover", "kids bottle", "stainless steel straw",
+    "keeps coffee hot", "limited edition cup",
+]
+OUTLET_QUERIES = [
+    "outlet in shah alam", "zus coffee cheras", "ampang branch", "putrajaya",
+    "petaling jaya damansara", "sentul", "wangsa maju aeon", "kuala lumpur city centre",
+]
+
+
+def load_corpora(synthetic: int, seed: int = 0):
+    products = [product_text(flatten_product(p))
+                for p in json.loads((FIXTURES / "products.json").read_text())["products"]]
+    outlets = [f"{o['name']} - {o['address']}"
+               for o in json.loads((FIXTURES / "outlets.json").read_text())]
+
+    # Pad small fixtures with perturbed copies so recall is measured on a
+    # corpus closer to nationwide scale
+    rng = random.Random(seed)
+    def grow(items):
+        words = " ".join(items).split()
+        extra = [f"{rng.choice(items)} {' '.join(rng.sample(words, 6))}" for _ in range(synthetic)]
+        return items + extra
+
+    return {"products": (grow(products), PRODUCT_QUERIES), "outlets": (grow(outlets), OUTLET_QUERIES)}
+
+
+def embed_fn(provider_name: str):
+    if provider_name == "openai":
+        provider = OpenAIEmbeddingProvider(dimension=OPENAI_EMBEDDING_DIM)
+        cache = {}
+        def embed(texts, dim):
+            key = tuple(texts)
+            if key not in cache:
+                cache[key] = np.concatenate([provider.embed_sync(texts[i:i + 512]) for i in range(0, len(texts), 512)])
+            return normalize(cache[key][:, :dim])
+        return embed
+
+    def embed(texts, dim):
+        return HashingEmbeddingProvider(dimension=dim).embed_sync(texts)
+    return embed
+
+
+def recall(reference: list[set], got: list[np.ndarray]):
+    return float(np.mean([len(r & set(g.tolist())) / len(r) for r, g in zip(reference, got)]))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--provider", choices=["local", "openai"], default="local")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--synthetic", type=int, default=1000)
+    parser.add_argument("--dims", default="1536,1024,512,256")
+    args = parser.parse_args()
+
+    embed = embed_fn(args.provider)
+    dims = [int(d) for d in args.dims.split(",")]
+    report = {}
+
+    for corpus_name, (docs, queries) in load_corpora(args.synthetic).items():
+        ref_docs = embed(docs, OPENAI_EMBEDDING_DIM)
+        ref_q = embed(queries, OPENAI_EMBEDDING_DIM)
+        reference = [set(np.argsort(-(ref_docs @ q))[:args.k].tolist()) for q in ref_q]
+
+        rows = []
+        for dim in dims:
+            d_docs, d_q = embed(docs, dim), embed(queries, dim)
+            for storage in ["float32", "float16", "int8"]:
+                mat = QuantizedMatrix.from_vectors(d_docs, storage)
+                got = [mat.topk(q, args.k)[0] for q in d_q]
+                rows.append({
+                    "dims": dim, "storage": storage,
+                    f"recall@{args.k}": round(recall(reference, got), 3),
+                    "bytes_per_vector": round(mat.nbytes / len(mat), 1),
+                    "total_mb": round(mat.nbytes / 1e6, 3),
+                })
+            mat = QuantizedMatrix.from_vectors(d_docs, "int8")
+            got = [mat.topk(q, args.k, rescore=d_docs)[0] for q in d_q]
+            rows.append({
+                "dims": dim, "storage": "int8+rescore",
+                f"recall@{args.k}": round(recall(reference, got), 3),
+                "bytes_per_vector": round(mat.nbytes / len(mat), 1),
+                "total_mb": round(mat.nbytes / 1e6, 3),
+            })
+        report[corpus_name] = {"documents": len(docs), "queries": len(queries), "results": rows}
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
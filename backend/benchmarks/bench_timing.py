@@ -0,0 +1,77 @@
+"""
+Overhead of ``app.timing``: an empty ``span`` with and without an open
+request, a bare histogram ``record``, and the histogram's percentile error
+against exact percentiles of a log-normal sample.
+
+    python -m benchmarks.bench_timing --iterations 200000
+"""
+import argparse
+import json
+import random
+import time
+
+from app import timing
+from app.timing import Histogram, span
+
+
+def per_call_ns(fn, n: int):
+    t0 = time.perf_counter_ns()
+    fn(n)
+    return round((time.perf_counter_ns() - t0) / n, 1)
+
+
+def empty_loop(n):
+    for _ in range(n):
+        pass
+
+
+def spans(n):
+    for _ in range(n):
+        with span("bench"):
+            pass
+
+
+def records(n):
+    h = Histogram()
+    for i in range(n):
+        h.record(i)
+
+
+def accuracy(n: int = 100_000):
+    rng = random.Random(0)
+    values = sorted(int(rng.lognormvariate(15, 1)) for _ in range(n))
+    h = Histogram()
+    for v in values:
+        h.record(v)
+    out = {}
+    for q in (50, 90, 99, 99.9):
+        exact = values[min(n - 1, int(q / 100 * n))]
+        out[f"p{q}"] = round(abs(h.percentile(q) - exact) / exact * 100, 2)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--iterations", type=int, default=200_000)
+    args = parser.parse_args()
+    n = args.iterations
+
+    loop = per_call_ns(empty_loop, n)
+    idle = per_call_ns(spans, n) - loop
+    token = timing._request.set([])
+    try:
+        active = per_call_ns(spans, n) - loop
+    finally:
+        timing._request.reset(token)
+    record = per_call_ns(records, n) - loop
+
+    print(json.dumps({
+        "span_ns": round(idle, 1),
+        "span_in_request_ns": round(active, 1),
+        "record_ns": round(record, 1),
+        "percentile_error_pct": accuracy(),
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Compare the old fixed-size sequential upsert with UpsertWriter against a
+FakeIndex.
+
+    python -m benchmarks.bench_upsert --vectors 2000 --rtt 0.05
+"""
+import argparse
+import asyncio
+import json
+import time
+
+from app.upsert import UpsertWriter
+from benchmarks.fakes import FakeIndex, fake_vectors
+
+
+def sequential(index, vectors, batch_size=50):
+    t0 = time.perf_counter()
+    failed = 0
+    for i in range(0, len(vectors), batch_size):
+        try:
+            index.upsert(vectors[i:i + batch_size])
+        except Exception:
+            failed += 1
+    elapsed = time.perf_counter() - t0
+    return {"elapsed_s": round(elapsed, 3), "vectors_per_s": round(len(vectors) / elapsed, 1), "failed_batches": failed}
+
+
+async def writer(index, vectors, concurrency):
+    async with UpsertWriter(index, concurrency=concurrency) as w:
+        for v in vectors:
+            await w.add(v)
+    return w.stats()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--description-bytes", type=int, default=4000)
+    parser.add_argument("--rtt", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--concurrency", type=int, default=4)
+    args = parser.parse_args()
+
+    vectors = list(fake_vectors(args.vectors, args.dim, args.description_bytes))
+
+    def fresh():
+        return FakeIndex(rtt_s=args.rtt, failure_rate=args.failure_rate)
+
+    baseline = sequential(fresh(), vectors)
+    adaptive = asyncio.run(writer(fresh(), vectors, args.concurrency))
+    print(json.dumps({"sequential_50": baseline, "upsert_writer": adaptive}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+Throughput and memory of ``serve.py`` at different worker counts.
+
+Starts the server with the local embedding provider and ingestion off, fires
+concurrent calculator chats (CPU-bound: intent scoring, JSON, formatting)
+for a fixed time, and reports requests/s alongside the summed RSS and PSS
+of all processes. PSS splits shared pages between the processes mapping
+them, so it is the number that shows sharing.
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _kb(path: str, field: str):
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith(field):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+def tree_memory_mb(root: int):
+    """Summed RSS and PSS of ``root`` and its children, in MB."""
+    pids = [root]
+    try:
+        with open(f"/proc/{root}/task/{root}/children") as f:
+            pids += [int(p) for p in f.read().split()]
+    except OSError:
+        pass
+    rss = sum(_kb(f"/proc/{p}/status", "VmRSS:") for p in pids)
+    pss = sum(_kb(f"/proc/{p}/smaps_rollup", "Pss:") for p in pids)
+    return round(rss / 1024, 1), round(pss / 1024, 1)
+
+
+async def load(url: str, duration: float, concurrency: int):
+    import httpx
+
+    done, errors = 0, 0
+    deadline = time.perf_counter() + duration
+
+    async def user(client, n):
+        nonlocal done, errors
+        while time.perf_counter() < deadline:
+            r = await client.post(f"{url}/api/chat", json={"message": f"calculate {n} * 7 + 3", "session_id": f"u{n}"})
+            if r.status_code == 200 and "answer" in r.json()["reply"]:
+                done += 1
+            else:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=30, limits=limits) as client:
+        await asyncio.gather(*(user(client, n) for n in range(concurrency)))
+    return done, errors
+
+
+def wait_live(url: str, timeout: float = 60):
+    import httpx
+
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"{url}/health/live", timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("server did not come up")
+
+
+def run(workers: int, duration: float, concurrency: int):
+    port = free_port()
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "EMBEDDING_PROVIDER": "local",
+        "INGEST_ON_STARTUP": "false",
+    }
+    proc = subprocess.Popen([sys.executable, "serve.py"], cwd=BACKEND, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        wait_live(url)
+        asyncio.run(load(url, 1.0, concurrency))  # warm every worker
+        done, errors = asyncio.run(load(url, duration, concurrency))
+        rss, pss = tree_memory_mb(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait(timeout=30)
+    return {
+        "workers": workers,
+        "req_per_s": round(done / duration, 1),
+        "errors": errors,
+        "rss_mb": rss,
+        "pss_mb": pss,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=32)
+    args = parser.parse_args()
+
+    results = [run(n, args.duration, args.concurrency) for n in args.workers]
+    print(json.dumps({"cores": len(os.sched_getaffinity(0)), "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+Local stand-in for the OpenAI embeddings and chat completions API.
+
+Latency is log-normal around ``latency_ms``. Requests beyond ``capacity``
+concurrent calls, or beyond ``rpm`` per minute, get a 429 with
+``retry-after-ms`` like the real service; ``error_rate`` injects extra 429s
+at random.
+
+    python -m benchmarks.fake_openai --port 8100 --capacity 8
+"""
+import argparse
+import asyncio
+import random
+import threading
+import time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+
+def fake_embedding(text: str, dim: int = 1536):
+    """
+    Hashed character n-grams (the app's local provider), so similar texts
+    get similar vectors and intent routing behaves as it would for real.
+    """
+    from app.embeddings import HashingEmbeddingProvider
+
+    return HashingEmbeddingProvider(dimension=dim).embed_sync([text])[0].tolist()
+
+
+def create_app(
+    latency_ms: float = 80,
+    latency_sigma: float = 0.4,
+    capacity: int = 16,
+    rpm: float | None = None,
+    error_rate: float = 0.0,
+    seed: int = 0,
+):
+    app = FastAPI(title="fake-openai")
+    rng = random.Random(seed)
+    state = {"in_flight": 0, "window": [], "requests": 0, "throttled": 0}
+
+    def too_many():
+        return JSONResponse(
+            status_code=429,
+            headers={"retry-after-ms": "200"},
+            content={"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+        )
+
+    async def gate():
+        state["requests"] += 1
+        now = time.monotonic()
+        if rpm:
+            state["window"] = [t for t in state["window"] if now - t < 60]
+            if len(state["window"]) >= rpm:
+                return False
+            state["window"].append(now)
+        if state["in_flight"] >= capacity or rng.random() < error_rate:
+            return False
+        return True
+
+    async def simulate():
+        state["in_flight"] += 1
+        try:
+            await asyncio.sleep(rng.lognormvariate(0, latency_sigma) * latency_ms / 1000)
+        finally:
+            state["in_flight"] -= 1
+
+    @app.post("/v1/embeddings")
+    async def embeddings(request: Request):
+        body = await request.json()
+        if not await gate():
+            state["throttled"] += 1
+            return too_many()
+        await simulate()
+
+        inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+        dim = body.get("dimensions") or 1536
+        tokens = sum(len(str(t)) // 4 + 1 for t in inputs)
+        return {
+            "object": "list",
+            "model": body.get("model", "text-embedding-3-small"),
+            "data": [
+                {"object": "embedding", "index": i, "embedding": fake_embedding(str(t), dim)}
+                for i, t in enumerate(inputs)
+            ],
+            "usage": {"prompt_tokens": tokens, "total_tokens": tokens},
+        }
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if not await gate():
+            state["throttled"] += 1
+            return too_many()
+        await simulate()
+
+        last = body["messages"][-1]["content"] if body.get("messages") else ""
+        content = f"(fake) You asked: {str(last)[:200]}"
+        return {
+            "id": f"chatcmpl-{state['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o-mini"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {"prompt_tokens": len(str(last)) // 4 + 1, "completion_tokens": 12, "total_tokens": len(str(last)) // 4 + 13},
+        }
+
+    @app.get("/_stats")
+    async def stats():
+        return {k: v for k, v in state.items() if k != "window"}
+
+    return app
+
+
+class ServerThread:
+    """Run an ASGI app with uvicorn on a daemon thread."""
+
+    def __init__(self, app, host: str = "127.0.0.1", port: int = 0):
+        self.config = uvicorn.Config(app, host=host, port=port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(self.config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    @property
+    def url(self):
+        sock = self.server.servers[0].sockets[0]
+        host, port = sock.getsockname()[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency-ms", type=float, default=80)
+    parser.add_argument("--capacity", type=int, default=16)
+    parser.add_argument("--rpm", type=float, default=None)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    app = create_app(args.latency_ms, capacity=args.capacity, rpm=args.rpm, error_rate=args.error_rate)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
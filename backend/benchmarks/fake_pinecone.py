@@ -0,0 +1,163 @@
+"""
+Local stand-in for the Pinecone HTTP API: the control plane calls the app
+makes (list, describe and create index) and the data plane (query, upsert,
+fetch, list, delete, describe_index_stats). Each index's data-plane host is
+a path on this server (``/index/<name>``), so pointing
+``PINECONE_CONTROLLER_HOST`` here is enough.
+
+Data-plane latency is log-normal around ``latency_ms``; ``error_rate``
+injects 503s at random.
+
+    python -m benchmarks.fake_pinecone --port 8200 --latency-ms 20
+"""
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+from benchmarks.fakes import FakeIndex
+
+
+def create_app(
+    latency_ms: float = 20,
+    latency_sigma: float = 0.4,
+    error_rate: float = 0.0,
+    seed: int = 0,
+):
+    app = FastAPI(title="fake-pinecone")
+    rng = random.Random(seed)
+    app.state.indexes = {}  # name -> (dimension, FakeIndex)
+    app.state.host = ""  # set once the server's port is known
+    state = {"requests": 0, "errors": 0}
+
+    def describe(name: str):
+        dimension, _ = app.state.indexes[name]
+        return {
+            "name": name,
+            "dimension": dimension,
+            "metric": "cosine",
+            "host": f"{app.state.host}/index/{name}",
+            "vector_type": "dense",
+            "deletion_protection": "disabled",
+            "spec": {"serverless": {"cloud": "aws", "region": "us-east-1"}},
+            "status": {"ready": True, "state": "Ready"},
+        }
+
+    async def simulate():
+        state["requests"] += 1
+        await asyncio.sleep(rng.lognormvariate(0, latency_sigma) * latency_ms / 1000)
+        if rng.random() < error_rate:
+            state["errors"] += 1
+            return JSONResponse(status_code=503, content={"error": {"code": "UNAVAILABLE", "message": "injected"}})
+        return None
+
+    # --- Control plane ---
+    @app.get("/indexes")
+    async def list_indexes():
+        return {"indexes": [describe(name) for name in app.state.indexes]}
+
+    @app.get("/indexes/{name}")
+    async def describe_index(name: str):
+        if name not in app.state.indexes:
+            return JSONResponse(status_code=404, content={"error": {"code": "NOT_FOUND", "message": name}})
+        return describe(name)
+
+    @app.post("/indexes")
+    async def create_index(request: Request):
+        body = await request.json()
+        seed_index(app, body["name"], body["dimension"])
+        return JSONResponse(status_code=201, content=describe(body["name"]))
+
+    # --- Data plane ---
+    @app.post("/index/{name}/query")
+    async def query(name: str, request: Request):
+        body = await request.json()
+        if error := await simulate():
+            return error
+        result = app.state.indexes[name][1].query(
+            vector=body.get("vector"),
+            top_k=body.get("topK", 10),
+            include_metadata=body.get("includeMetadata", False),
+            filter=body.get("filter"),
+            namespace=body.get("namespace", ""),
+        )
+        return {"matches": result["matches"], "namespace": body.get("namespace", ""), "usage": {"readUnits": 1}}
+
+    @app.post("/index/{name}/vectors/upsert")
+    async def upsert(name: str, request: Request):
+        body = await request.json()
+        if error := await simulate():
+            return error
+        app.state.indexes[name][1].upsert(body["vectors"], namespace=body.get("namespace", ""))
+        return {"upsertedCount": len(body["vectors"])}
+
+    @app.post("/index/{name}/describe_index_stats")
+    async def describe_index_stats(name: str):
+        if error := await simulate():
+            return error
+        dimension, index = app.state.indexes[name]
+        stats = index.describe_index_stats()
+        return {"namespaces": {ns: {"vectorCount": n["vector_count"]} for ns, n in stats["namespaces"].items()},
+                "dimension": dimension, "indexFullness": 0.0, "totalVectorCount": stats["total_vector_count"]}
+
+    @app.get("/index/{name}/vectors/list")
+    async def list_vectors(name: str, prefix: str = "", namespace: str = ""):
+        if error := await simulate():
+            return error
+        ids = next(app.state.indexes[name][1].list(prefix=prefix, limit=10_000_000, namespace=namespace), [])
+        return {"vectors": [{"id": i} for i in ids], "namespace": namespace, "usage": {"readUnits": 1}}
+
+    @app.get("/index/{name}/vectors/fetch")
+    async def fetch(name: str, request: Request):
+        if error := await simulate():
+            return error
+        namespace = request.query_params.get("namespace", "")
+        store = app.state.indexes[name][1].namespaces.get(namespace, {})
+        ids = request.query_params.getlist("ids")
+        return {"vectors": {i: store[i] for i in ids if i in store}, "namespace": namespace}
+
+    @app.post("/index/{name}/vectors/delete")
+    async def delete(name: str, request: Request):
+        body = await request.json()
+        if error := await simulate():
+            return error
+        app.state.indexes[name][1].delete(
+            body.get("ids", []), namespace=body.get("namespace", ""), delete_all=body.get("deleteAll", False)
+        )
+        return {}
+
+    @app.get("/_stats")
+    async def stats():
+        return {**state, "vectors": {
+            name: idx.describe_index_stats()["total_vector_count"] for name, (_, idx) in app.state.indexes.items()
+        }}
+
+    return app
+
+
+def seed_index(app, name: str, dimension: int, vectors=(), namespace: str = ""):
+    """Create (or fill) ``namespace`` of index ``name`` in a fake-pinecone app."""
+    if name not in app.state.indexes:
+        app.state.indexes[name] = (dimension, FakeIndex(rtt_s=0, bytes_per_s=float("inf")))
+    index = app.state.indexes[name][1]
+    # Straight into the store: seeding is not subject to request size limits
+    index.namespaces.setdefault(namespace, {}).update((v["id"], v) for v in vectors)
+    return index
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8200)
+    parser.add_argument("--latency-ms", type=float, default=20)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+    app = create_app(args.latency_ms, error_rate=args.error_rate)
+    app.state.host = f"http://127.0.0.1:{args.port}"
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import random
+import threading
+import time
+
+import numpy as np
+
+
+class FakeIndex:
+    """
+    In-memory stand-in for a Pinecone ``Index``. ``upsert`` sleeps for a
+    fixed round trip plus a per-byte transfer cost and can fail randomly or
+    reject oversized requests, so batching strategies can be compared offline.
+    Vectors are kept per namespace, as the real client does (``""`` is the
+    default namespace, exposed as ``vectors``).
+    """
+
+    def __init__(
+        self,
+        rtt_s: float = 0.05,
+        bytes_per_s: float = 20e6,
+        max_request_bytes: int = 2_000_000,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        self.rtt_s = rtt_s
+        self.bytes_per_s = bytes_per_s
+        self.max_request_bytes = max_request_bytes
+        self.failure_rate = failure_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.namespaces: dict[str, dict[str, dict]] = {"": {}}
+        self.calls = 0
+
+    @property
+    def vectors(self):
+        return self.namespaces[""]
+
+    def _namespace(self, namespace: str):
+        return self.namespaces.setdefault(namespace or "", {})
+
+    def upsert(self, vectors, namespace: str = "", **kwargs):
+        from app.upsert import vector_size
+
+        size = sum(vector_size(v) for v in vectors)
+        time.sleep(self.rtt_s + size / self.bytes_per_s)
+
+        with self._lock:
+            self.calls += 1
+            if size > self.max_request_bytes:
+                raise ValueError(f"Request size {size} exceeds {self.max_request_bytes} bytes")
+            if self._rng.random() < self.failure_rate:
+                raise ConnectionError("injected upsert failure")
+            store = self._namespace(namespace)
+            for v in vectors:
+                store[v["id"]] = v
+        return {"upserted_count": len(vectors)}
+
+    def list(self, prefix: str = "", limit: int = 100, namespace: str = "", **kwargs):
+        with self._lock:
+            ids = sorted(i for i in self._namespace(namespace) if i.startswith(prefix))
+        for start in range(0, len(ids), limit):
+            yield ids[start:start + limit]
+
+    def fetch(self, ids, namespace: str = "", **kwargs):
+        with self._lock:
+            store = self._namespace(namespace)
+            return {"vectors": {i: store[i] for i in ids if i in store}}
+
+    def delete(self, ids=(), namespace: str = "", delete_all: bool = False, **kwargs):
+        with self._lock:
+            store = self._namespace(namespace)
+            if delete_all:
+                store.clear()
+            for i in ids or ():
+                store.pop(i, None)
+        return {}
+
+    def describe_index_stats(self, **kwargs):
+        with self._lock:
+            counts = {ns: len(store) for ns, store in self.namespaces.items() if store}
+        return {
+            "total_vector_count": sum(counts.values()),
+            "namespaces": {ns: {"vector_count": n} for ns, n in counts.items()},
+        }
+
+    def query(self, vector, top_k=10, include_metadata=True, filter=None, namespace: str = "", **kwargs):
+        items = [
+            v for v in list(self._namespace(namespace).values())
+            if not filter or all(
+                _match(v.get("metadata", {}).get(k), cond) for k, cond in filter.items()
+            )
+        ]
+        if not items:
+            return {"matches": []}
+
+        mat = np.asarray([v["values"] for v in items], dtype=np.float32)
+        q = np.asarray(vector, dtype=np.float32)
+        norms = np.linalg.norm(mat, axis=1) * (np.linalg.norm(q) or 1.0)
+        scores = mat @ q / np.where(norms == 0, 1.0, norms)
+        order = np.argsort(-scores)[:top_k]
+        return {"matches": [
+            {
+                "id": items[i]["id"],
+                "score": float(scores[i]),
+                "metadata": items[i].get("metadata", {}) if include_metadata else {},
+            }
+            for i in order
+        ]}
+
+
+def _match(value, cond):
+    if not isinstance(cond, dict):
+        return value == cond
+    if "$eq" in cond:
+        return value == cond["$eq"]
+    if "$in" in cond:
+        # A list field matches when any element does, as in Pinecone
+        return any(v in cond["$in"] for v in value) if isinstance(value, list) else value in cond["$in"]
+    return True
+
+
+def fake_vectors(n: int, dim: int = 1536, description_bytes: int = 2000, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for i in range(n):
+        yield {
+            "id": f"product-{i}",
+            "values": rng.standard_normal(dim).astype(np.float32).tolist(),
+            "metadata": {
+                "name": f"Product {i}",
+                "description": "x" * int(rng.integers(description_bytes // 4, description_bytes * 4)),
+                "type": "product",
+            },
+        }
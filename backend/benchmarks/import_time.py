@@ -0,0 +1,104 @@
+"""
+Import-time budget check for cold starts.
+
+Imports each entry module in a fresh interpreter under ``python -X importtime``
+with outbound sockets disabled and no API keys set, then fails if
+
+  * importing it costs more than ``--budget-ms`` on top of FastAPI itself,
+  * it opens a network connection, or
+  * it pulls in a heavy dependency that should load lazily.
+
+    python -m benchmarks.import_time --budget-ms 50
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+LAZY_MODULES = [
+    "openai", "pinecone", "langchain_core", "langchain_openai",
+    "numpy", "feedparser", "httpx", "tenacity",
+]
+
+PROBE = """
+import json, socket, sys
+
+def _no_network(*args, **kwargs):
+    raise RuntimeError("network I/O at import time")
+
+socket.socket.connect = _no_network
+socket.create_connection = _no_network
+
+import fastapi
+import {module}
+print(json.dumps(sorted(m for m in sys.modules)))
+"""
+
+
+def cumulative_us(stderr: str, module: str):
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1])
+    return None
+
+
+def measure(module: str, runs: int):
+    env = {k: v for k, v in os.environ.items() if not k.endswith("_API_KEY")}
+    best = None
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE.format(module=module)],
+            cwd=BACKEND, env=env, capture_output=True, text=True,
+        )
+        if proc.returncode != 0:
+            tail = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "no output"
+            return {"module": module, "error": tail}
+        loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+        fastapi_us = cumulative_us(proc.stderr, "fastapi")
+        module_us = cumulative_us(proc.stderr, module.split(".")[0] if module == "handler" else module)
+        # The probe imports fastapi first, so the module's own figure is the extra cost
+        extra_ms = (module_us or 0) / 1000
+        result = {
+            "module": module,
+            "fastapi_ms": round(fastapi_us / 1000, 1),
+            "extra_ms": round(extra_ms, 1),
+            "eager_heavy_imports": [m for m in LAZY_MODULES if m in loaded],
+        }
+        if best is None or result["extra_ms"] < best["extra_ms"]:
+            best = result
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget-ms", type=float, default=50.0)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("modules", nargs="*", default=["app.chat_main", "handler"])
+    args = parser.parse_args()
+
+    failures = []
+    results = []
+    for module in args.modules:
+        r = measure(module, args.runs)
+        results.append(r)
+        if "error" in r:
+            failures.append(f"{module}: import failed ({r['error']})")
+            continue
+        if r["extra_ms"] > args.budget_ms:
+            failures.append(f"{module}: {r['extra_ms']} ms over FastAPI exceeds {args.budget_ms} ms budget")
+        if r["eager_heavy_imports"]:
+            failures.append(f"{module}: imports {', '.join(r['eager_heavy_imports'])} eagerly")
+
+    print(json.dumps(results, indent=2))
+    for f in failures:
+        print(f"❌ {f}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
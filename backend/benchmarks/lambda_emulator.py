@@ -0,0 +1,134 @@
+"""
+Local Lambda emulator: cold-starts ``handler.lambda_handler`` in a fresh
+interpreter (as a new execution environment would), then sends API Gateway
+HTTP API (v2) events through it and reports init vs handler time.
+
+    python -m benchmarks.lambda_emulator --cold-starts 3 --invocations 20
+    python -m benchmarks.lambda_emulator --event my_event.json
+
+By default the local embedding provider is used and the calculator route is
+exercised, which needs no network once the intent snapshot is loaded.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parent.parent
+
+
+def http_event(method: str, path: str, body: dict | None = None):
+    """Minimal API Gateway HTTP API (payload v2.0) event."""
+    return {
+        "version": "2.0",
+        "routeKey": "$default",
+        "rawPath": path,
+        "rawQueryString": "",
+        "headers": {"content-type": "application/json", "host": "localhost"},
+        "requestContext": {
+            "http": {"method": method, "path": path, "protocol": "HTTP/1.1", "sourceIp": "127.0.0.1"},
+            "requestId": "emulated",
+            "stage": "$default",
+        },
+        "body": json.dumps(body) if body is not None else None,
+        "isBase64Encoded": False,
+    }
+
+
+DEFAULT_EVENTS = [
+    http_event("GET", "/health/ready"),
+    http_event("POST", "/api/chat", {"message": "calculate 12 * (3 + 4)", "session_id": "emulator"}),
+]
+
+
+class FakeContext:
+    function_name = "zuscoffee-chatbot"
+    memory_limit_in_mb = 1024
+    aws_request_id = "emulated"
+
+    def get_remaining_time_in_millis(self):
+        return 60_000
+
+
+def child(events: list[dict], invocations: int):
+    """Runs inside the fresh interpreter."""
+    started = time.perf_counter()
+    import handler
+
+    init_ms = (time.perf_counter() - started) * 1000
+    timings, statuses = [], []
+    for i in range(invocations):
+        event = events[i % len(events)]
+        t0 = time.perf_counter()
+        response = handler.lambda_handler(event, FakeContext())
+        timings.append((time.perf_counter() - t0) * 1000)
+        statuses.append(response.get("statusCode"))
+
+    print(json.dumps({
+        "init_ms": round(init_ms, 1),
+        "init_breakdown_ms": {k: round(v, 1) for k, v in handler.INIT_MS.items()},
+        "handler_ms": [round(t, 2) for t in timings],
+        "statuses": statuses,
+    }))
+
+
+def percentile(values: list[float], p: float):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cold-starts", type=int, default=3)
+    parser.add_argument("--invocations", type=int, default=20)
+    parser.add_argument("--event", help="JSON file with one event or a list of events")
+    parser.add_argument("--provider", default="local", help="EMBEDDING_PROVIDER for the emulated function")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    events = DEFAULT_EVENTS
+    if args.event:
+        loaded = json.loads(Path(args.event).read_text())
+        events = loaded if isinstance(loaded, list) else [loaded]
+
+    if args.child:
+        child(events, args.invocations)
+        return
+
+    env = {
+        **os.environ,
+        "AWS_LAMBDA_FUNCTION_NAME": "zuscoffee-chatbot",
+        "EMBEDDING_PROVIDER": args.provider,
+    }
+    cmd = [sys.executable, "-m", "benchmarks.lambda_emulator", "--child", "--invocations", str(args.invocations)]
+    if args.event:
+        cmd += ["--event", str(Path(args.event).resolve())]
+
+    runs = []
+    for _ in range(args.cold_starts):
+        proc = subprocess.run(cmd, cwd=BACKEND, env=env, capture_output=True, text=True)
+        if proc.returncode != 0:
+            sys.exit(f"emulated function crashed:\n{proc.stderr[-2000:]}")
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    cold = [r["handler_ms"][0] for r in runs]
+    warm = [t for r in runs for t in r["handler_ms"][1:]]
+    report = {
+        "cold_starts": args.cold_starts,
+        "invocations_per_start": args.invocations,
+        "init_ms_median": round(statistics.median(r["init_ms"] for r in runs), 1),
+        "init_breakdown_ms": runs[-1]["init_breakdown_ms"],
+        "cold_handler_ms_median": round(statistics.median(cold), 2),
+        "warm_handler_ms_p50": round(percentile(warm, 50), 2) if warm else None,
+        "warm_handler_ms_p95": round(percentile(warm, 95), 2) if warm else None,
+        "statuses": sorted({s for r in runs for s in r["statuses"]}),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,290 @@
+"""
+Offline load test of ``/api/chat``, ``/products/query`` and ``/outlets/query``.
+
+Starts the fake OpenAI and Pinecone servers (benchmarks.fake_openai,
+benchmarks.fake_pinecone) with the given latency and error injection, seeds
+both indexes from the fixtures (padded to ``--outlets`` / ``--products``),
+runs ``serve.py`` against them through ``OPENAI_BASE_URL`` and
+``PINECONE_CONTROLLER_HOST``, and drives a weighted traffic mix with
+``--concurrency`` closed-loop users, each keeping its own chat session.
+Prints a JSON report (``--out`` to save it). With ``--baseline`` a previous
+report is compared and the run exits 1 when a scenario's p95 grows by more
+than ``--max-regression`` or its error rate by more than a point.
+
+The fakes share the machine with the server, so compare reports from the
+same host only.
+
+    python -m benchmarks.load_test --duration 20 --concurrency 16 --out load.json
+    python -m benchmarks.load_test --mix chat_calc=1,outlets_query=3 --baseline load.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from benchmarks import fake_openai, fake_pinecone
+from benchmarks.bench_workers import BACKEND, free_port, tree_memory_mb, wait_live
+from benchmarks.fake_openai import ServerThread, fake_embedding
+
+FIXTURES = Path(__file__).parent / "fixtures"
+
+DEFAULT_MIX = "chat_calc=2,chat_products=3,chat_outlets=3,chat_general=1,products_query=1,outlets_query=1"
+
+PRODUCT_QUESTIONS = [
+    "what products do you have", "show me products under RM50", "price of the all day cup",
+    "calories in a latte", "product list for tumblers", "how many products are there",
+]
+OUTLET_QUESTIONS = [
+    "where is the outlet in shah alam", "find outlet in ampang", "coffee shop near me in cheras",
+    "opening hours of zus coffee sentul", "location of petaling jaya outlets", "how many outlets in kuala lumpur",
+    "which outlets are open now", "is any outlet open at 11pm", "nearest outlet to 47500",
+]
+# Opening hours the seeded outlets cycle through
+HOURS = ["Daily 8:00 AM - 10:00 PM", "Mon-Fri 7am - 11pm; Sat-Sun 8am - 12am", "Open 24 hours", ""]
+GENERAL_QUESTIONS = ["hello there", "tell me a joke about coffee", "who are you", "thanks, bye"]
+
+
+def scenario(name: str, rng: random.Random, session_id: str):
+    """``(method, path, kwargs)`` for one request of scenario ``name``."""
+    if name == "chat_calc":
+        message = f"calculate {rng.randint(1, 999)} * {rng.randint(1, 99)} + {rng.randint(0, 9)}"
+    elif name == "chat_products":
+        message = rng.choice(PRODUCT_QUESTIONS)
+    elif name == "chat_outlets":
+        message = rng.choice(OUTLET_QUESTIONS)
+    elif name == "chat_general":
+        message = rng.choice(GENERAL_QUESTIONS)
+    elif name == "products_query":
+        return "GET", "/products/query", {"params": {"query": rng.choice(PRODUCT_QUESTIONS)}}
+    elif name == "outlets_query":
+        return "GET", "/outlets/query", {"params": {"query": rng.choice(OUTLET_QUESTIONS)}}
+    else:
+        raise ValueError(f"unknown scenario {name}")
+    return "POST", "/api/chat", {"json": {"message": message, "session_id": session_id}}
+
+
+def parse_mix(spec: str):
+    mix = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        scenario(name.strip(), random.Random(), "check")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# ---------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------
+def _grow(items: list, n: int, rng: random.Random):
+    """Pad fixtures to ``n`` with numbered copies (distinct ids and texts)."""
+    out = list(items)
+    while len(out) < n:
+        out.append(dict(rng.choice(items), _copy=len(out)))
+    return out[:max(n, 1)]
+
+
+def seed(app, outlets: int, products: int, seed_: int = 0):
+    from app.api.OutletsAPI import outlet_id
+    from app.catalog import variant_label
+    from app.hours import encode, format_hours, parse_hours
+    from app.geo import locate
+    from app.places import attribute, regions_of
+    from app.embeddings import embedder, index_name_for
+    from app.shopify import flatten_product, product_text
+
+    rng = random.Random(seed_)
+    dim = embedder.dimension
+
+    raw = json.loads((FIXTURES / "products.json").read_text())["products"]
+    vectors = []
+    for p in _grow(raw, products, rng):
+        record = flatten_product({k: v for k, v in p.items() if k != "_copy"})
+        suffix = f" #{p['_copy']}" if "_copy" in p else ""
+        text = product_text(record) + suffix
+        vectors.append({
+            "id": f"product-{record['id']}{suffix.replace(' #', '-')}",
+            "values": fake_embedding(text, dim),
+            "metadata": {
+                "name": record["title"] + suffix, "description": record["body_html"],
+                "price": record["price"], "product_type": record["product_type"], "tags": record["tags"],
+                "variants": [variant_label(v) for v in record["variants"]], "text": text, "type": "product",
+            },
+        })
+    fake_pinecone.seed_index(app, index_name_for("zuscoffee-products"), dim, vectors)
+
+    # Each outlet in its region's namespace, as ingest_outlets shards them
+    shards = {}
+    for i, o in enumerate(_grow(json.loads((FIXTURES / "outlets.json").read_text()), outlets, rng)):
+        outlet = {"name": o["name"] + (f" #{o['_copy']}" if "_copy" in o else ""), "address": o["address"],
+                  **attribute(o["address"])}
+        outlet["region"] = (regions_of([outlet["state"]]) or ["kuala-lumpur-selangor"])[0]
+        text = f"{outlet['name']} - {outlet['address']}"
+        intervals = parse_hours(HOURS[i % len(HOURS)])
+        lat, lon = locate(outlet["address"]) or (3.1478, 101.6953)
+        shards.setdefault(outlet["region"], []).append({
+            "id": outlet_id(outlet),
+            "values": fake_embedding(text, dim),
+            "metadata": {**outlet, "text": text, "type": "outlet", "hours": format_hours(intervals),
+                         "opening_intervals": encode(intervals), "lat": lat, "lon": lon},
+        })
+    for region, vectors in shards.items():
+        fake_pinecone.seed_index(app, index_name_for("zuscoffee-outlets"), dim, vectors, namespace=region)
+
+
+# ---------------------------------------------------------
+# Load
+# ---------------------------------------------------------
+def percentile(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 2) if values else None
+
+
+async def load(url: str, mix: dict, duration: float, concurrency: int, seed_: int = 0):
+    import httpx
+
+    names, weights = list(mix), list(mix.values())
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    deadline = time.perf_counter() + duration
+
+    async def user(client, n):
+        rng = random.Random(seed_ * 1000 + n)
+        session_id = f"load-{n}"
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            method, path, kwargs = scenario(name, rng, session_id)
+            t0 = time.perf_counter()
+            try:
+                r = await client.request(method, f"{url}{path}", **kwargs)
+                ok = r.status_code == 200 and not (path == "/api/chat" and "error" in r.json().get("info", {}))
+            except httpx.HTTPError:
+                ok = False
+            samples[name].append((time.perf_counter() - t0) * 1000)
+            errors[name] += not ok
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=60, limits=limits) as client:
+        await asyncio.gather(*(user(client, n) for n in range(concurrency)))
+    return samples, errors
+
+
+def summarize(latencies: list, errors: int, duration: float):
+    count = len(latencies)
+    return {
+        "count": count,
+        "errors": errors,
+        "error_rate": round(errors / count, 4) if count else 0.0,
+        "rps": round(count / duration, 1),
+        "p50_ms": percentile(latencies, 0.50),
+        "p95_ms": percentile(latencies, 0.95),
+        "p99_ms": percentile(latencies, 0.99),
+        "max_ms": round(max(latencies), 2) if latencies else None,
+    }
+
+
+def compare(report: dict, baseline: dict, max_regression: float):
+    """Regressions of ``report`` against ``baseline``, as readable lines."""
+    out = []
+    for name, now in report["scenarios"].items():
+        before = baseline.get("scenarios", {}).get(name)
+        if not before or not before.get("p95_ms") or not now.get("p95_ms"):
+            continue
+        if now["p95_ms"] > before["p95_ms"] * (1 + max_regression):
+            out.append(f"{name}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+        if now["error_rate"] > before["error_rate"] + 0.01:
+            out.append(f"{name}: error rate {before['error_rate']} -> {now['error_rate']}")
+    return out
+
+
+def run(args):
+    import httpx
+
+    mix = parse_mix(args.mix)
+    openai_app = fake_openai.create_app(args.openai_latency_ms, capacity=args.openai_capacity,
+                                        error_rate=args.openai_error_rate)
+    pinecone_app = fake_pinecone.create_app(args.pinecone_latency_ms, error_rate=args.pinecone_error_rate)
+
+    with ServerThread(openai_app) as openai, ServerThread(pinecone_app) as pinecone:
+        pinecone_app.state.host = pinecone.url
+        seed(pinecone_app, args.outlets, args.products)
+
+        port = free_port()
+        env = {
+            **os.environ,
+            "WEB_CONCURRENCY": str(args.workers),
+            "PORT": str(port),
+            "HOST": "127.0.0.1",
+            "INGEST_ON_STARTUP": "false",
+            "OPENAI_API_KEY": "test",
+            "OPENAI_BASE_URL": f"{openai.url}/v1",
+            "PINECONE_API_KEY": "test",
+            "PINECONE_CONTROLLER_HOST": pinecone.url,
+            "SHARED_DIR": f"/tmp/zus-load-{port}",
+            "SNAPSHOT_CACHE_DIR": f"/tmp/zus-load-{port}-snapshot",
+        }
+        proc = subprocess.Popen([sys.executable, "serve.py"], cwd=BACKEND, env=env,
+                                stdout=subprocess.DEVNULL, stderr=None if args.verbose else subprocess.DEVNULL)
+        url = f"http://127.0.0.1:{port}"
+        try:
+            wait_live(url)
+            asyncio.run(load(url, mix, args.warmup, args.concurrency, seed_=1))
+            samples, errors = asyncio.run(load(url, mix, args.duration, args.concurrency))
+            rss, pss = tree_memory_mb(proc.pid)
+            fakes = {"openai": httpx.get(f"{openai.url}/_stats").json(),
+                     "pinecone": httpx.get(f"{pinecone.url}/_stats").json()}
+        finally:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    everything = [ms for s in samples.values() for ms in s]
+    return {
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "baseline", "verbose")},
+        "cores": len(os.sched_getaffinity(0)),
+        "total": summarize(everything, sum(errors.values()), args.duration),
+        "scenarios": {name: summarize(samples[name], errors[name], args.duration) for name in mix},
+        "server": {"rss_mb": rss, "pss_mb": pss},
+        "fakes": fakes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="scenario=weight,...")
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--warmup", type=float, default=3.0)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--outlets", type=int, default=500)
+    parser.add_argument("--products", type=int, default=100)
+    parser.add_argument("--openai-latency-ms", type=float, default=80)
+    parser.add_argument("--openai-error-rate", type=float, default=0.0)
+    parser.add_argument("--openai-capacity", type=int, default=64)
+    parser.add_argument("--pinecone-latency-ms", type=float, default=20)
+    parser.add_argument("--pinecone-error-rate", type=float, default=0.0)
+    parser.add_argument("--out", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 growth (0.2 = 20%%)")
+    parser.add_argument("--verbose", action="store_true", help="show server logs")
+    args = parser.parse_args()
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+
+    report = run(args)
+    print(json.dumps(report, indent=2))
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+
+    if args.baseline:
+        regressions = compare(report, json.loads(args.baseline.read_text()), args.max_regression)
+        for line in regressions:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,371 @@
+"""
+Micro-benchmarks for the pure-Python hot paths of a chat turn, against
+stored baselines.
+
+Each case times one call over the fixture-based inputs (recorded outlets
+and products, realistic messages), as the best of ``--repeat`` runs of at
+least ``--min-time`` seconds each, so scheduler noise inflates no result.
+The run compares against ``benchmarks/baselines/micro.json`` and exits 1
+when any case is slower than its baseline by more than ``--threshold`` on
+two measurements in a row. ``--save`` stores the median of several
+measurements, so one unusually fast run does not become the baseline.
+Baselines are per machine: refresh them with ``--save`` on the machine
+that runs the gate.
+
+    python -m benchmarks.micro                      # compare
+    python -m benchmarks.micro --save               # record new baselines
+    python -m benchmarks.micro -k memory -k intent  # only matching cases
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Intent scoring runs on the local provider: no network, deterministic
+os.environ.setdefault("EMBEDDING_PROVIDER", "local")
+os.environ.setdefault("EMBEDDING_FALLBACK", "")
+
+FIXTURES = Path(__file__).parent / "fixtures"
+BASELINES = Path(__file__).parent / "baselines" / "micro.json"
+SAVE_ROUNDS = 5
+
+MESSAGES = [
+    "calculate 12 * (7 + 3) / 4", "/calc 2 ** 10 - 1", "what products do you have",
+    "show me drinkware under RM50", "where is the outlet in shah alam", "opening hours for cheras outlets",
+    "how many outlets in petaling jaya", "how many drinks are there", "hello, who are you?",
+    "is zus coffee open at 10pm in kuala lumpur", "what is the price of the all day cup", "thanks!",
+]
+HOURS = ["Daily 8:00 AM - 10:00 PM", "Mon-Fri 7am - 11pm; Sat-Sun 8am - 12am", "Open 24 hours", ""]
+EXPRESSIONS = ["1 + 2", "12 * (7 + 3) / 4", "2 ** 10 - 1", "-(5 % 3) * 8.5", "((1 + 2) * (3 + 4)) / (5 - 6)"]
+
+_cases: dict = {}
+
+
+def case(name: str):
+    """Register a setup function returning the zero-argument callable to time."""
+    def register(setup):
+        _cases[name] = setup
+        return setup
+    return register
+
+
+def _outlets_answer(n: int = 40):
+    """A ``query_outlets`` answer over the recorded outlets, as the endpoint returns it."""
+    outlets = (json.loads((FIXTURES / "outlets.json").read_text()) * n)[:n]
+    return {
+        "query": "outlets in kuala lumpur",
+        "response": "Outlets retrieved successfully.",
+        "matches_found": len(outlets),
+        "cities_detected": ["Kuala Lumpur"],
+        "outlets": [{"name": o["name"], "address": o["address"], "city": "Kuala Lumpur",
+                     "hours": "Not available"} for o in outlets],
+    }
+
+
+def _products_answer(n: int = 50):
+    """A ``query_products`` answer over the recorded products, as the endpoint returns it."""
+    from app.shopify import flatten_product
+
+    products = [flatten_product(p) for p in json.loads((FIXTURES / "products.json").read_text())["products"]]
+    products = (products * n)[:n]
+    return {
+        "query": "what is the price of the all day cup",
+        "response": f"The {products[0]['title']} is RM{products[0]['price']}.",
+        "matches_found": len(products),
+        "products": [{"name": p["title"], "price": p["price"], "description": p["body_html"]}
+                     for p in products],
+    }
+
+
+def _outlet_docs(copies: int = 1):
+    """``(id, text, metadata)`` of the recorded outlets, as ingest_outlets indexes them."""
+    from app.places import attribute
+
+    docs = []
+    for copy in range(copies):
+        for o in json.loads((FIXTURES / "outlets.json").read_text()):
+            text = f"{o['name']} - {o['address']}"
+            docs.append((f"outlet-{copy}-{len(docs)}", text, {
+                "name": o["name"], "address": o["address"], **attribute(o["address"]),
+                "region": "kuala-lumpur-selangor", "text": text, "type": "outlet", "hours": "Not available",
+            }))
+    return docs
+
+
+def _product_docs(copies: int = 1):
+    """``(id, text, metadata)`` of the recorded products, as ingest_products indexes them."""
+    from app.catalog import variant_label
+    from app.shopify import flatten_product, product_text
+
+    docs = []
+    for copy in range(copies):
+        for raw in json.loads((FIXTURES / "products.json").read_text())["products"]:
+            p = flatten_product(raw)
+            text = product_text(p)
+            docs.append((f"product-{copy}-{p['id']}", text, {
+                "name": p["title"], "description": p["body_html"], "price": p["price"],
+                "price_min": p["price_min"] if p["price_min"] is not None else 0.0,
+                "price_max": p["price_max"] if p["price_max"] is not None else 0.0,
+                "collections": p["collections"], "product_type": p["product_type"], "tags": p["tags"],
+                "variants": [variant_label(v) for v in p["variants"]], "available": p["available"],
+                "text": text, "type": "product",
+            }))
+    return docs
+
+
+# ---------------------------------------------------------
+# Cases
+# ---------------------------------------------------------
+@case("safe_eval")
+def _safe_eval():
+    from app.api.Calculator import safe_eval
+
+    exprs = itertools.cycle(EXPRESSIONS)
+    return lambda: safe_eval(next(exprs))
+
+
+@case("extract_cities")
+def _extract_cities():
+    from app.api.OutletsAPI import extract_cities
+
+    messages = itertools.cycle(MESSAGES)
+    return lambda: extract_cities(next(messages))
+
+
+@case("planner.detect_intent")
+def _planner():
+    from app.planner import detect_intent
+
+    messages = itertools.cycle(MESSAGES)
+    return lambda: detect_intent(next(messages))
+
+
+@case("intent_scoring")
+def _intent_scoring():
+    """The per-label scoring in detect_intent_and_type, embedding excluded."""
+    from app.chat_main import best_label, get_intent_examples_embed, get_query_type_examples_embed
+    from app.embeddings import intent_embedder
+
+    intents = get_intent_examples_embed()[intent_embedder.primary.name]
+    types = get_query_type_examples_embed()[intent_embedder.primary.name]
+    queries = itertools.cycle(intent_embedder.primary.embed_sync(MESSAGES))
+
+    def run():
+        q = next(queries)
+        best_label(intents, q)
+        best_label(types, q)
+    return run
+
+
+@case("detect_intent_and_type")
+def _detect_intent_and_type():
+    from app.chat_main import detect_intent_and_type, get_intent_examples_embed, get_query_type_examples_embed
+
+    get_intent_examples_embed()
+    get_query_type_examples_embed()
+    messages = itertools.cycle(MESSAGES)
+    loop = asyncio.new_event_loop()
+    return lambda: loop.run_until_complete(detect_intent_and_type(next(messages)))
+
+
+@case("memory.add_turn")
+def _add_turn():
+    from app.memory import ConversationMemory
+
+    memory = ConversationMemory()
+    sessions = itertools.cycle([f"s{i}" for i in range(1000)])
+    messages = itertools.cycle(MESSAGES)
+    return lambda: memory.add_turn(next(sessions), "user", next(messages))
+
+
+def _filled_memory(turns: int = 40):
+    from app.memory import ConversationMemory
+
+    memory = ConversationMemory()
+    for i in range(1000):
+        for t in range(turns):
+            memory.add_turn(f"s{i}", "user" if t % 2 == 0 else "bot", MESSAGES[t % len(MESSAGES)])
+    return memory
+
+
+@case("memory.get_history")
+def _get_history():
+    memory = _filled_memory()
+    sessions = itertools.cycle([f"s{i}" for i in range(1000)])
+    return lambda: memory.get_history(next(sessions))
+
+
+@case("get_history_for_session")
+def _history_for_session():
+    from app import chat_main
+
+    chat_main.get_history_for_session("warm-up")  # langchain import
+    filled = _filled_memory()
+    sessions = itertools.cycle([f"s{i}" for i in range(1000)])
+
+    def run():
+        saved, chat_main.memory = chat_main.memory, filled
+        try:
+            chat_main.get_history_for_session(next(sessions))
+        finally:
+            chat_main.memory = saved
+    return run
+
+
+@case("format_products_reply")
+def _format_products():
+    from app.chat_main import format_products_reply
+
+    answer = _products_answer()
+    types = itertools.cycle(["count", "attribute", "general"])
+    return lambda: format_products_reply(answer, next(types))
+
+
+@case("format_outlets_reply")
+def _format_outlets():
+    from app.chat_main import format_outlets_reply
+
+    answer = _outlets_answer()
+    types = itertools.cycle(["count", "time", "general"])
+    return lambda: format_outlets_reply(answer, next(types))
+
+
+@case("hours.answer")
+def _hours_answer():
+    from app.hours import HoursTable, encode, parse_hours
+
+    rows = [{**metadata, "opening_intervals": encode(parse_hours(HOURS[i % len(HOURS)]))}
+            for i, (_, _, metadata) in enumerate(_outlet_docs(copies=40))]
+    table = HoursTable(rows)
+    questions = itertools.cycle(["which outlets are open now", "open at 11pm in cheras", "outlets open 24 hours",
+                                 "anything open late tonight", "open early on sunday"])
+    return lambda: table.answer(next(questions), limit=40)
+
+
+@case("geo.answer")
+def _geo_answer():
+    from app.geo import GeoIndex, locate
+
+    # Postcode centroids, as ingest_outlets stores them when a map link has no coordinates
+    metadata = [m for _, _, m in _outlet_docs(copies=40)]
+    index = GeoIndex([{**m, "lat": c[0], "lon": c[1]} for m in metadata if (c := locate(m["address"]))])
+    questions = itertools.cycle([("nearest outlet", 3.15, 101.70), ("coffee shop near me", 3.05, 101.58),
+                                 ("3 closest outlets", 3.10, 101.64), ("outlets within 2 km of 47500", None, None)])
+    return lambda: index.answer(*next(questions), limit=40)
+
+
+@case("outlet_pages.extract")
+def _outlet_pages_extract():
+    from pathlib import Path
+
+    from app.outlet_pages import extract_details
+
+    page = (Path(__file__).parent.parent / "app" / "debug_outlet_page.html").read_text(encoding="utf-8")
+    return lambda: extract_details(page, "ZUS Coffee – Bandar Menjalara")
+
+
+@case("lexical.search")
+def _lexical_search():
+    from app.lexical import LexicalIndex
+
+    index = LexicalIndex(_outlet_docs(copies=40))
+    messages = itertools.cycle(MESSAGES)
+    return lambda: index.search(next(messages), 40)
+
+
+@case("catalog.answer")
+def _catalog_answer():
+    from app.catalog import ProductCatalog
+
+    catalog = ProductCatalog([metadata for _, _, metadata in _product_docs(copies=10)])
+    questions = itertools.cycle(["cheapest tumbler", "products under RM50", "how many items above RM100",
+                                 "ceramic mugs under RM40", "largest bottle", "average price of mugs"])
+    return lambda: catalog.answer(next(questions))
+
+
+# ---------------------------------------------------------
+# Runner
+# ---------------------------------------------------------
+def measure(fn, min_time: float, repeat: int):
+    """Best per-call time in ns over ``repeat`` runs of at least ``min_time`` s."""
+    fn()
+    n = 1
+    while True:
+        t0 = time.perf_counter_ns()
+        for _ in range(n):
+            fn()
+        elapsed = time.perf_counter_ns() - t0
+        if elapsed >= min_time * 1e9:
+            break
+        n *= 2
+    best = elapsed / n
+    for _ in range(repeat - 1):
+        t0 = time.perf_counter_ns()
+        for _ in range(n):
+            fn()
+        best = min(best, (time.perf_counter_ns() - t0) / n)
+    return best
+
+
+def machine():
+    return {"python": platform.python_version(), "machine": platform.machine(),
+            "processor": platform.processor(), "cores": len(os.sched_getaffinity(0))}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-k", dest="filters", action="append", default=[], help="run cases containing this")
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    parser.add_argument("--baselines", type=Path, default=BASELINES)
+    parser.add_argument("--save", action="store_true", help="store results as the new baselines")
+    args = parser.parse_args()
+
+    import logging
+    logging.disable(logging.INFO)
+
+    names = [n for n in _cases if not args.filters or any(f in n for f in args.filters)]
+    stored = json.loads(args.baselines.read_text()) if args.baselines.exists() else {"cases": {}}
+    if stored.get("machine") and stored["machine"] != machine() and not args.save:
+        print(f"⚠️ Baselines were recorded on {stored['machine']}", file=sys.stderr)
+
+    results, regressions = {}, []
+    for name in names:
+        fn = _cases[name]()
+        base = stored["cases"].get(name)
+        if args.save:
+            # A baseline is the median of several measurements, not a lucky one
+            ns = statistics.median(measure(fn, args.min_time, args.repeat) for _ in range(SAVE_ROUNDS))
+        else:
+            ns = measure(fn, args.min_time, args.repeat)
+            # Confirm before reporting: a regression must hold in every one of
+            # SAVE_ROUNDS runs, so a burst of noise cannot fail the gate
+            for _ in range(SAVE_ROUNDS - 1):
+                if not base or ns <= base * (1 + args.threshold):
+                    break
+                ns = min(ns, measure(fn, args.min_time, args.repeat))
+        results[name] = round(ns, 1)
+        change = f"{(ns / base - 1) * 100:+6.1f}%" if base else "    new"
+        print(f"{name:28s} {ns / 1000:10.2f} µs  {change}")
+        if base and ns > base * (1 + args.threshold):
+            regressions.append(name)
+
+    if args.save:
+        args.baselines.parent.mkdir(parents=True, exist_ok=True)
+        args.baselines.write_text(json.dumps(
+            {"machine": machine(), "cases": {**stored["cases"], **results}}, indent=2) + "\n")
+        print(f"Saved {len(results)} baselines to {args.baselines}")
+    elif regressions:
+        print(f"REGRESSION (>{args.threshold:.0%} slower): {', '.join(regressions)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
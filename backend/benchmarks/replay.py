@@ -0,0 +1,125 @@
+"""
+Replay captured chat traffic (see app.capture) against a running build and
+compare it with what was captured.
+
+Requests go out at their original offsets divided by ``--speed`` (2 = twice
+as fast, 0 = back to back with ``--concurrency`` in flight). Sessions keep
+their turn order under a fresh id per run, so memory starts clean. The JSON
+report has latency percentiles per intent for the capture and the replay,
+and how often the replay detected the same intent and gave the same reply.
+LLM replies vary between runs; compare ``same_reply`` for calc and
+retrieval turns. Captured latency is measured in the handler and replayed
+latency at the client, so the replay includes the HTTP round trip.
+
+    python -m benchmarks.replay /data/capture --url http://localhost:8000 --speed 4
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+import uuid
+from collections import defaultdict
+from pathlib import Path
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 2) if values else None
+
+
+def latency_summary(values):
+    return {"count": len(values), "p50_ms": percentile(values, 0.50),
+            "p95_ms": percentile(values, 0.95), "p99_ms": percentile(values, 0.99)}
+
+
+async def replay(entries: list, url: str, speed: float, concurrency: int):
+    import httpx
+
+    run = uuid.uuid4().hex[:8]
+    results = [None] * len(entries)
+    limit = asyncio.Semaphore(concurrency)
+    # One lock per session keeps each conversation's turns in order
+    sessions = defaultdict(asyncio.Lock)
+    t0 = entries[0]["ts"] if entries else 0
+    start = time.perf_counter()
+
+    async def send(i, entry, client):
+        if speed > 0:
+            await asyncio.sleep(max(0.0, (entry["ts"] - t0) / speed - (time.perf_counter() - start)))
+        async with sessions[entry["session_id"]], limit:
+            t = time.perf_counter()
+            try:
+                r = await client.post(f"{url}/api/chat", json={
+                    "message": entry["message"], "session_id": f"replay-{run}-{entry['session_id']}",
+                })
+                body = r.json() if r.status_code == 200 else {}
+            except httpx.HTTPError:
+                body = {}
+            results[i] = {"latency_ms": (time.perf_counter() - t) * 1000,
+                          "reply": body.get("reply"), "info": body.get("info", {})}
+
+    async with httpx.AsyncClient(timeout=60) as client:
+        await asyncio.gather(*(send(i, e, client) for i, e in enumerate(entries)))
+    return results, time.perf_counter() - start
+
+
+def compare(entries: list, results: list, by=lambda entry: entry.get("intent") or "unknown"):
+    """Latency and agreement per group of turns (the captured intent by default)."""
+    by_intent = defaultdict(lambda: {"captured": [], "replayed": [], "same_intent": 0, "same_reply": 0, "errors": 0})
+    for entry, result in zip(entries, results):
+        group = by_intent[by(entry)]
+        group["captured"].append(entry["latency_ms"])
+        group["replayed"].append(result["latency_ms"])
+        group["same_intent"] += result["info"].get("intent") == entry.get("intent")
+        group["same_reply"] += result["reply"] == entry.get("reply")
+        group["errors"] += result["reply"] is None or "error" in result["info"]
+
+    report = {}
+    for intent, g in sorted(by_intent.items()):
+        n = len(g["captured"])
+        report[intent] = {
+            "captured": latency_summary(g["captured"]),
+            "replayed": latency_summary(g["replayed"]),
+            "same_intent": round(g["same_intent"] / n, 3),
+            "same_reply": round(g["same_reply"] / n, 3),
+            "errors": g["errors"],
+        }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("paths", nargs="+", help="capture files or directories")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--speed", type=float, default=1.0, help="time scale; 0 sends back to back")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--limit", type=int, default=0, help="replay only the first N turns")
+    parser.add_argument("--out", type=Path)
+    args = parser.parse_args()
+
+    from app.capture import read
+
+    entries = read(args.paths)
+    if args.limit:
+        entries = entries[:args.limit]
+    if not entries:
+        sys.exit("No captured turns found")
+
+    results, elapsed = asyncio.run(replay(entries, args.url, args.speed, args.concurrency))
+    report = {
+        "turns": len(entries),
+        "sessions": len({e["session_id"] for e in entries}),
+        "captured_span_s": round(entries[-1]["ts"] - entries[0]["ts"], 1),
+        "replay_s": round(elapsed, 1),
+        "speed": args.speed,
+        "overall": compare(entries, results, by=lambda entry: "all")["all"],
+        "intents": compare(entries, results),
+    }
+    print(json.dumps(report, indent=2))
+    if args.out:
+        args.out.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,45 @@
 import os
-from app.chat_main import app
+import time
+import logging
+
+_import_started = time.perf_counter()
+
+from app.chat_main import app, warm_start
 from mangum import Mangum
 
+logger = logging.getLogger("Lambda")
+
+IS_LAMBDA = bool(os.getenv("AWS_LAMBDA_FUNCTION_NAME"))
+
 # Create the Lambda handler (used only in AWS Lambda)
-handler = Mangum(app)
+# Mangum runs the ASGI lifespan on every invocation, so it is off here:
+# ingestion belongs to ingest.py, and warm_start() below prepares the rest
+handler = Mangum(app, lifespan="off")
+
+# Lambda mode: load the snapshot and build clients during the init phase,
+# so they are reused by every warm invocation of this execution environment
+INIT_MS = {"import": (time.perf_counter() - _import_started) * 1000}
+if IS_LAMBDA:
+    _warm_started = time.perf_counter()
+    warm_start()
+    INIT_MS["warm_start"] = (time.perf_counter() - _warm_started) * 1000
+INIT_MS["total"] = (time.perf_counter() - _import_started) * 1000
+
+_cold = True
+
+
+def lambda_handler(event, context):
+    """Entry point configured in the image (CMD handler.lambda_handler)."""
+    global _cold
+    cold, _cold = _cold, False
+    started = time.perf_counter()
+    try:
+        return handler(event, context)
+    finally:
+        handler_ms = (time.perf_counter() - started) * 1000
+        init = " ".join(f"{k}={v:.0f}ms" for k, v in INIT_MS.items())
+        logger.info(f"⏱️ {'cold' if cold else 'warm'} invocation: init[{init}] handler={handler_ms:.0f}ms")
+
 
 # When running locally, use FastAPI's built-in server (Uvicorn)
 if os.getenv("ENV") == "local":
@@ -0,0 +1,93 @@
+"""
+Standalone ingestion worker, for a CLI run or the k8s CronJob.
+
+    python ingest.py                 # products and outlets
+    python ingest.py outlets --fresh # ignore an unfinished checkpoint
+
+Progress is checkpointed under INGEST_CHECKPOINT_DIR (default .ingest), so
+rerunning an interrupted job resumes it: fetched pages are not crawled
+again and items already written unchanged are not embedded again.
+Exits non-zero if any corpus fails.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import sys
+import time
+
+from app.api.ProductsAPI import ingest_products
+from app.api.OutletsAPI import ingest_outlets
+from app.checkpoint import Checkpoint, INGEST_CHECKPOINT_DIR
+from app.ratelimit import governor
+
+logger = logging.getLogger("Ingest")
+
+CORPORA = {
+    "products": ingest_products,
+    "outlets": ingest_outlets,
+}
+
+
+async def run_one(name: str, directory: str, resume: bool):
+    checkpoint = Checkpoint.open(name, directory, resume=resume)
+    t0 = time.perf_counter()
+    try:
+        stats = await CORPORA[name](checkpoint=checkpoint) or {}
+    except Exception as e:
+        logger.error(f"❌ {name} ingest failed: {getattr(e, 'detail', None) or e}")
+        return {"ok": False, "error": str(getattr(e, "detail", None) or e)}
+    finally:
+        # Keep whatever was written before a failure or SIGTERM
+        checkpoint.save(force=True)
+
+    elapsed = time.perf_counter() - t0
+    writer = stats.get("writer", {})
+    written = writer.get("vectors", 0)
+    return {
+        "ok": True,
+        "resumed": checkpoint.resumed,
+        "written": written,
+        "skipped": stats.get("skipped", 0),
+        "pruned": stats.get("pruned", 0),
+        "elapsed_s": round(elapsed, 3),
+        "items_per_s": round(written / elapsed, 1) if elapsed > 0 else 0.0,
+        "stages": {k: v for k, v in stats.items() if isinstance(v, dict) and "items_out" in v},
+        "writer": writer,
+    }
+
+
+async def run(names: list[str], directory: str, resume: bool):
+    results = await asyncio.gather(*(run_one(n, directory, resume) for n in names))
+    report = dict(zip(names, results))
+    report["governor"] = governor.snapshot()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest products and outlets into Pinecone")
+    parser.add_argument("corpora", nargs="*", help=f"any of {', '.join(CORPORA)} (default all)")
+    parser.add_argument("--checkpoint-dir", default=INGEST_CHECKPOINT_DIR)
+    parser.add_argument("--fresh", action="store_true", help="ignore unfinished checkpoints")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    names = args.corpora or list(CORPORA)
+    unknown = [n for n in names if n not in CORPORA]
+    if unknown:
+        parser.error(f"unknown corpus: {', '.join(unknown)}")
+    report = asyncio.run(run(names, args.checkpoint_dir, resume=not args.fresh))
+
+    print(json.dumps(report, indent=2))
+    for name in names:
+        r = report[name]
+        if r["ok"]:
+            print(f"✅ {name}: {r['written']} written, {r['skipped']} unchanged, "
+                  f"{r['pruned']} pruned in {r['elapsed_s']}s ({r['items_per_s']}/s)")
+        else:
+            print(f"❌ {name}: {r['error']}")
+    sys.exit(0 if all(report[n]["ok"] for n in names) else 1)
+
+
+if __name__ == "__main__":
+    main()
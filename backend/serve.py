@@ -0,0 +1,134 @@
+"""
+Multi-process server for one pod or host.
+
+    python serve.py        # WEB_CONCURRENCY workers on HOST:PORT
+
+The parent binds the listening socket and imports the app (import has no
+side effects, so nothing network- or thread-related is inherited), then
+forks ``WEB_CONCURRENCY`` uvicorn workers onto that one socket. Forked
+workers share the imported modules copy-on-write, and the intent matrices
+are built once, by a short-lived helper, into memory-mapped files every
+worker attaches to (see app.shared), so memory grows much slower than the
+worker count. Conversation memory lives in a SQLite file next to them
+(``SESSION_DB``), so a session's turns are visible to whichever worker
+serves the next request. Only worker 0 runs background ingestion; the rest
+probe the indexes for readiness. Crashed workers are replaced.
+"""
+import logging
+import os
+import signal
+import socket
+import sys
+import time
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8000"))
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", "0")) or len(os.sched_getaffinity(0))
+
+logger = logging.getLogger("Serve")
+
+
+def bind(host: str, port: int):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def prepare_shared():
+    """Build and publish the shared intent matrices in a throwaway child."""
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            from app.chat_main import get_intent_examples_embed, get_query_type_examples_embed
+
+            get_intent_examples_embed()
+            get_query_type_examples_embed()
+        except Exception as e:
+            # Workers fall back to building their own copy on first use
+            logger.warning(f"⚠️ Could not prepare shared intent matrices: {e}")
+            code = 1
+        os._exit(code)
+    os.waitpid(pid, 0)
+
+
+def run_worker(index: int, sock: socket.socket):
+    import uvicorn
+    from app.chat_main import app, supervisor
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+
+    # One ingesting worker per pod
+    supervisor.ingest = supervisor.ingest and index == 0
+    config = uvicorn.Config(app, lifespan="on", log_level="info")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(index: int, sock: socket.socket):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            run_worker(index, sock)
+        except BaseException:
+            logger.exception(f"Worker {index} crashed")
+            code = 1
+        os._exit(code)
+    logger.info(f"🚀 Worker {index} started (pid {pid})")
+    return pid
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+    sock = bind(HOST, PORT)
+
+    if WEB_CONCURRENCY > 1:
+        from app.shared import SHARED_DIR
+
+        # Sessions must survive a request landing on a different worker
+        os.environ.setdefault("SESSION_DB", os.path.join(SHARED_DIR, "sessions.sqlite3"))
+
+    import app.chat_main  # noqa: F401  (imported once, shared copy-on-write)
+
+    t0 = time.perf_counter()
+    prepare_shared()
+    logger.info(f"📦 Shared intent matrices ready in {time.perf_counter() - t0:.2f}s")
+
+    workers = {spawn(i, sock): i for i in range(WEB_CONCURRENCY)}
+    logger.info(f"✅ Serving on http://{HOST}:{PORT} with {len(workers)} workers")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        index = workers.pop(pid, None)
+        if index is None or stopping:
+            continue
+        logger.warning(f"⚠️ Worker {index} (pid {pid}) exited with {os.waitstatus_to_exitcode(status)}; restarting")
+        time.sleep(1)
+        workers[spawn(index, sock)] = index
+
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()